@@ -5,6 +5,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 from predict import MalariaPredictor
 from data_loader import MalariaDataLoader
+from model_cache import model_cache
+from prediction_cache import prediction_cache, explanation_cache
+from risk_surface import RiskSurface
+from scenarios import ScenarioEngine, Range, Normal
+from drift import DriftMonitor, shared_monitor
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -39,8 +45,30 @@ st.markdown("""
 
 class MalariaPredictionApp:
     def __init__(self):
-        self.predictor = MalariaPredictor()
+        # The model is loaded once per process and shared across reruns and sessions,
+        # and repeated slider combinations are answered from the result cache
+        self.predictor = MalariaPredictor(use_cache=True, result_cache=prediction_cache,
+                                          risk_surface=self.load_risk_surface(),
+                                          explanation_cache=explanation_cache)
         self.regions = ['Region_A', 'Region_B', 'Region_C']
+        if self.predictor.trainer is not None:
+            # One monitor and background thread for every rerun and session
+            profile = getattr(self.predictor.trainer, 'reference_profile', None)
+            if profile is not None:
+                self.predictor.monitor = shared_monitor(profile)
+            # Offer exactly the regions the model was trained on
+            self.regions = self.predictor.schema.regions
+    
+    def load_risk_surface(self, path='risk_surface.npz'):
+        """
+        Load the precomputed risk surface (python risk_surface.py) if present
+        
+        Shared through the process-wide cache like the model, so reruns and
+        sessions reuse one copy and a rebuilt surface is picked up.
+        """
+        if not os.path.exists(path):
+            return None
+        return model_cache.get(path, loader=RiskSurface.load)
     
     def render_sidebar(self):
         """Render the sidebar with input controls"""
@@ -93,26 +121,13 @@ class MalariaPredictionApp:
         }
     
     def prepare_input_data(self, user_input):
-        """Prepare user input for model prediction"""
-        input_data = user_input.copy()
-        region = input_data.pop('region')
-        
-        # Convert to feature format
-        features = {
-            'avg_temperature': input_data['avg_temperature'],
-            'rainfall': input_data['rainfall'],
-            'humidity': input_data['humidity'],
-            'population_density': input_data['population_density'],
-            'healthcare_access': input_data['healthcare_access'],
-            'historical_cases': input_data['historical_cases'],
-            'month': input_data['month'],
-        }
+        """
+        Prepare user input for model prediction
         
-        # Add region one-hot encoding
-        for r in self.regions:
-            features[f'region_{r}'] = 1 if r == region else 0
-            
-        return features
+        The raw record is passed through with its region name; the predictor's
+        FeatureSchema builds the region one-hot and the float32 feature row.
+        """
+        return dict(user_input)
     
     def render_risk_display(self, prediction_result):
         """Display risk prediction results"""
@@ -180,6 +195,98 @@ class MalariaPredictionApp:
             </div>
             """, unsafe_allow_html=True)
     
+    def render_explanation(self, input_features):
+        """Bar chart of how each input pushed the predicted risk level up or down"""
+        explanation = self.predictor.explain_risk(input_features)
+        contributions = explanation['contributions']
+        
+        st.subheader("🔎 What Drives This Prediction")
+        fig = go.Figure(data=[
+            go.Bar(x=list(contributions.values()), y=list(contributions.keys()), orientation='h',
+                   marker_color=['red' if value > 0 else 'green' for value in contributions.values()])
+        ])
+        fig.update_layout(
+            title=f"Contributions to P({explanation['level']}) = {explanation['probability']:.1%} "
+                  f"(baseline {explanation['bias']:.1%})",
+            xaxis_title="Change in probability",
+            yaxis={'autorange': 'reversed'},
+            xaxis_tickformat="+.0%"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    def render_risk_map(self, user_input):
+        """Heatmap of outbreak probability over temperature and rainfall, read from the risk surface"""
+        if self.predictor.risk_surface is None or self.predictor.trainer is None:
+            return
+        surface = self.predictor.active_risk_surface()
+        if surface is None or not {'avg_temperature', 'rainfall'} <= set(surface.axes):
+            return
+        
+        at = {name: user_input[name] for name in surface.axes
+              if name not in ('avg_temperature', 'rainfall')}
+        try:
+            grid = surface.heatmap('rainfall', 'avg_temperature', level='High', **at)
+        except ValueError:
+            # Selected region or month is not on the precomputed grid
+            return
+        
+        st.subheader("🗺️ Outbreak Risk Map")
+        fig = px.imshow(
+            grid, origin='lower', aspect='auto', zmin=0, zmax=1,
+            color_continuous_scale=['green', 'orange', 'red'],
+            labels={'x': 'Monthly Rainfall (mm)', 'y': 'Average Temperature (°C)',
+                    'color': 'P(High)'},
+            title=f"Probability of High Risk ({', '.join(f'{k}={v}' for k, v in at.items())})"
+        )
+        fig.add_scatter(x=[user_input['rainfall']], y=[user_input['avg_temperature']],
+                        mode='markers', marker=dict(color='black', size=10, symbol='x'),
+                        name='Current input')
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Other inputs held at " + ", ".join(f"{k}={v}" for k, v in surface.fixed.items()))
+    
+    def render_scenarios(self, user_input):
+        """What-if sweep over rainfall and temperature changes, scored as one batch"""
+        with st.expander("🔮 What-if Scenarios"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                rainfall_change = st.slider("Rainfall change (±%)", 0, 100, 30, step=10)
+            with col2:
+                temperature_change = st.slider("Temperature change (±°C)", 0, 5, 2)
+            with col3:
+                access_uncertainty = st.slider("Healthcare access uncertainty (std)", 0.0, 0.3, 0.05)
+            
+            if not st.button("Run Scenarios"):
+                return
+            perturbations = {
+                'rainfall': Range(-rainfall_change / 100, rainfall_change / 100, 11, mode='relative'),
+                'avg_temperature': Range(-temperature_change, temperature_change, 11),
+                'healthcare_access': Normal(0, access_uncertainty)
+            }
+            with st.spinner("Scoring scenarios..."):
+                result = ScenarioEngine(self.predictor).run(user_input, perturbations, n_draws=30)
+            
+            summary = result['summary'].reset_index()
+            grid = summary.pivot(index='avg_temperature', columns='rainfall', values='shift_High')
+            fig = px.imshow(
+                grid, origin='lower', aspect='auto', color_continuous_scale='RdYlGn_r',
+                color_continuous_midpoint=0,
+                x=[f"{value:+.0%}" for value in grid.columns],
+                y=[f"{value:+.1f}" for value in grid.index],
+                labels={'x': 'Rainfall change', 'y': 'Temperature change (°C)',
+                        'color': 'Δ P(High)'},
+                title="Change in Probability of High Risk"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            
+            worst = summary.loc[summary['shift_High'].idxmax()]
+            st.caption(
+                f"{len(result['scenarios'])} scenarios scored in one batch. Largest increase: "
+                f"{worst['shift_High']:+.1%} at rainfall {worst['rainfall']:+.0%}, "
+                f"temperature {worst['avg_temperature']:+.1f}°C "
+                f"(90% range {worst['shift_High_p5']:+.1%} to {worst['shift_High_p95']:+.1%}); "
+                f"risk level escalates in {result['scenarios']['escalated'].mean():.0%} of scenarios."
+            )
+    
     def render_data_insights(self):
         """Show sample data insights"""
         st.sidebar.markdown("---")
@@ -204,6 +311,31 @@ class MalariaPredictionApp:
                                  title='Temperature Distribution by Risk Level')
                     st.plotly_chart(fig2, use_container_width=True)
     
+    def render_model_stats(self):
+        """Show model load and prediction cache counters for this process"""
+        stats = model_cache.stats()
+        if stats['last_load_time'] is not None:
+            st.sidebar.caption(
+                f"Model loads in this process: {stats['load_count']} "
+                f"(last load {stats['last_load_time'] * 1000:.0f} ms)"
+            )
+        
+        cache_stats = prediction_cache.stats()
+        st.sidebar.caption(
+            f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['size']} cached)"
+        )
+        
+        # Scored by the monitor's background thread; reading it costs nothing here
+        monitor = self.predictor.monitor
+        report = monitor.report() if isinstance(monitor, DriftMonitor) else None
+        if report is not None:
+            drifted = report.index[report['drifted']].tolist()
+            st.sidebar.caption(
+                f"Input drift (PSI, last {monitor.history[-1]['n']} inputs): "
+                + (f"⚠️ {', '.join(drifted)}" if drifted else f"stable, max {report['psi'].max():.2f}")
+            )
+    
     def run(self):
         """Main application runner"""
         # Header
@@ -224,10 +356,16 @@ class MalariaPredictionApp:
                     
                     # Display results
                     self.render_risk_display(prediction_result)
+                    self.render_explanation(input_features)
                     self.render_recommendations(prediction_result['risk_level'])
             
+            # Precomputed heatmap; no model calls
+            self.render_risk_map(user_input)
+            self.render_scenarios(user_input)
+            
             # Data insights
             self.render_data_insights()
+            self.render_model_stats()
             
             # Ethical considerations
             with st.expander("🔍 Ethical Considerations & Limitations"):
@@ -0,0 +1,518 @@
+"""
+Latency benchmarks for the malaria prediction system.
+
+Run with: python benchmark.py
+
+The end-to-end suite times every pipeline stage (data generation,
+preprocessing, training, save/load, single-row and batch inference),
+writes wall time, throughput and peak memory to JSON and can compare the
+run against a stored baseline:
+
+    python benchmark.py --suite --output baseline.json
+    python benchmark.py --suite --output current.json --baseline baseline.json --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from data_loader import MalariaDataLoader
+from model_trainer import MalariaModelTrainer
+from predict import MalariaPredictor
+from forest_engine import CompiledForest, load_forest_arrays
+from model_io import read_model_data
+from parallel_scoring import ParallelScorer
+from instrumentation import instrumentation
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_INPUT = {
+    'avg_temperature': 30,
+    'rainfall': 120,
+    'humidity': 85,
+    'population_density': 200,
+    'healthcare_access': 0.3,
+    'historical_cases': 75,
+    'month': 6,
+    'region_Region_A': 1,
+    'region_Region_B': 0,
+    'region_Region_C': 0
+}
+
+
+def build_predictor(n_samples=1000):
+    """Train an in-memory model and wrap it in a predictor (nothing is written to disk)"""
+    loader = MalariaDataLoader()
+    loader.generate_sample_data(n_samples)
+    loader.preprocess_data()
+    X_train, X_test, y_train, y_test = loader.train_test_split()
+
+    trainer = MalariaModelTrainer()
+    trainer.train_model(X_train, y_train)
+
+    predictor = MalariaPredictor(model_path=None)
+    predictor.trainer = trainer
+    return predictor, X_test
+
+
+def time_call(func, repeats=100, warmup=5):
+    """Return latency statistics in milliseconds for repeated calls of func"""
+    for _ in range(warmup):
+        func()
+
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings[i] = time.perf_counter() - start
+
+    timings *= 1000
+    return {
+        'mean_ms': float(timings.mean()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95))
+    }
+
+
+def benchmark_single_pass(predictor, repeats=100):
+    """Compare the old predict + predict_proba path with the single-pass predict_risk"""
+    model = predictor.trainer.model
+    features = predictor._align_features(SAMPLE_INPUT)
+    if hasattr(model, 'feature_names_in_'):
+        import pandas as pd
+        features = pd.DataFrame(features, columns=model.feature_names_in_)
+
+    def two_pass():
+        # The old path's two sklearn calls on the aligned row
+        model.predict(features)[0]
+        model.predict_proba(features)
+
+    results = {
+        'two_pass': time_call(two_pass, repeats),
+        'single_pass': time_call(lambda: predictor.predict_risk(SAMPLE_INPUT), repeats)
+    }
+    results['speedup'] = results['two_pass']['p50_ms'] / results['single_pass']['p50_ms']
+    return results
+
+
+def benchmark_feature_preparation(predictor, repeats=1000):
+    """Compare per-request DataFrame construction with the precompiled FeatureSchema"""
+    import pandas as pd
+
+    feature_names = predictor.trainer.feature_names
+    schema = predictor.schema
+    raw_input = {key: value for key, value in SAMPLE_INPUT.items() if not key.startswith('region_')}
+    raw_input['region'] = 'Region_A'
+    row = np.empty(schema.n_features, dtype=np.float32)
+
+    def dataframe_path():
+        input_df = pd.DataFrame([SAMPLE_INPUT])
+        for feature in feature_names:
+            if feature not in input_df.columns:
+                input_df[feature] = 0
+        return input_df[feature_names]
+
+    results = {
+        'dataframe': time_call(dataframe_path, repeats),
+        'schema': time_call(lambda: schema.transform_record(raw_input, out=row), repeats)
+    }
+    results['speedup'] = results['dataframe']['p50_ms'] / results['schema']['p50_ms']
+    return results
+
+
+def benchmark_compiled_forest(predictor, X_test, batch_size=10000, repeats=50):
+    """Compare sklearn predict_proba with the flat-array engine for one row and a batch"""
+    model = predictor.trainer.model
+    forest = CompiledForest.from_sklearn(model)
+
+    row = X_test.iloc[0:1]
+    batch = X_test.sample(batch_size, replace=True, random_state=0)
+    batch_matrix = batch.to_numpy(dtype=np.float32)
+
+    results = {
+        'sklearn_row': time_call(lambda: model.predict_proba(row), repeats),
+        'compiled_row': time_call(lambda: forest.predict_proba(row.to_numpy(dtype=np.float32)), repeats),
+        'sklearn_batch': time_call(lambda: model.predict_proba(batch), max(repeats // 10, 3)),
+        'compiled_batch': time_call(lambda: forest.predict_proba(batch_matrix), max(repeats // 10, 3))
+    }
+    results['row_speedup'] = results['sklearn_row']['p50_ms'] / results['compiled_row']['p50_ms']
+    results['batch_speedup'] = results['sklearn_batch']['p50_ms'] / results['compiled_batch']['p50_ms']
+    return results
+
+
+def benchmark_import_time(module='predict', repeats=5,
+                          heavy_modules=('pandas', 'sklearn', 'matplotlib', 'seaborn')):
+    """
+    Measure the cold import time of a module with python -X importtime
+
+    Each run is a fresh interpreter, so nothing is cached between repeats.
+    Also reports which heavy dependencies the import pulls in.
+    """
+    timings = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, check=True
+        )
+        # Lines look like "import time:  self [us] | cumulative | name"
+        for line in completed.stderr.splitlines():
+            fields = [field.strip() for field in line.split('|')]
+            if len(fields) == 3 and fields[2] == module:
+                timings.append(int(fields[1]) / 1000)
+
+    check = subprocess.run(
+        [sys.executable, '-c',
+         f'import sys, {module}; print(" ".join(m for m in {list(heavy_modules)!r} if m in sys.modules))'],
+        capture_output=True, text=True, check=True
+    )
+
+    return {
+        'import_ms': {'min_ms': min(timings), 'p50_ms': float(np.median(timings))},
+        'heavy_modules': check.stdout.split()
+    }
+
+
+def benchmark_model_load(predictor, repeats=20):
+    """Compare loading the joblib pickle with opening the memory-mapped artifact"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = f"{tmp}/model.pkl"
+        mmap_path = f"{tmp}/model"
+        predictor.trainer.save_model(pickle_path)
+        predictor.trainer.save_model(mmap_path, format='mmap')
+
+        return {
+            'pickle': time_call(lambda: read_model_data(pickle_path), repeats, warmup=1),
+            'mmap_verified': time_call(lambda: read_model_data(mmap_path), repeats, warmup=1),
+            'mmap_unverified': time_call(lambda: load_forest_arrays(mmap_path, verify=False),
+                                         repeats, warmup=1)
+        }
+
+
+def benchmark_parallel_scaling(predictor, X_test, n_rows=100000, worker_counts=None,
+                               chunk_size=10000):
+    """Measure batch throughput of ParallelScorer for increasing worker counts"""
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    batch = X_test.sample(n_rows, replace=True, random_state=0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Workers map the artifact instead of each unpickling their own copy
+        model_path = f"{tmp}/model"
+        predictor.trainer.save_model(model_path, format='mmap')
+        for n_workers in worker_counts:
+            with ParallelScorer(model_path, n_workers=n_workers, chunk_size=chunk_size,
+                                engine='sklearn') as scorer:
+                scorer.score(batch.iloc[:chunk_size * n_workers])  # start the workers
+                start = time.perf_counter()
+                scorer.score(batch)
+                elapsed = time.perf_counter() - start
+            results[f'{n_workers}_workers'] = {'seconds': elapsed, 'rows_per_sec': n_rows / elapsed}
+    return results
+
+
+def benchmark_instrumentation_overhead(predictor, repeats=2000):
+    """
+    Cost of the instrumentation in predict_risk on the compiled engine
+
+    'noop_hooks' times the span/counter/profile hooks of one predict_risk
+    call on their own while instrumentation is disabled.
+    """
+    record = {key: value for key, value in SAMPLE_INPUT.items() if not key.startswith('region_')}
+    record['region'] = 'Region_A'
+    compiled = MalariaPredictor(model_path=None, engine='compiled')
+    compiled.trainer = predictor.trainer
+
+    def noop_hooks():
+        with instrumentation.profiled('predict_risk'), instrumentation.span('predict_risk'):
+            instrumentation.inc('malaria_predictions_total', method='predict_risk')
+            for stage in ('align', 'forest', 'format'):
+                with instrumentation.span(stage):
+                    pass
+
+    was_enabled = instrumentation.enabled
+    try:
+        instrumentation.configure(enabled=False)
+        results = {
+            'disabled': time_call(lambda: compiled.predict_risk(record), repeats),
+            'noop_hooks': time_call(noop_hooks, repeats)
+        }
+        instrumentation.configure(enabled=True)
+        results['enabled'] = time_call(lambda: compiled.predict_risk(record), repeats)
+    finally:
+        instrumentation.configure(enabled=was_enabled)
+    results['disabled_overhead_pct'] = 100 * results['noop_hooks']['p50_ms'] / results['disabled']['p50_ms']
+    results['enabled_overhead_pct'] = (100 * (results['enabled']['p50_ms'] - results['disabled']['p50_ms'])
+                                       / results['disabled']['p50_ms'])
+    return results
+
+
+def _training_run(mode, n_samples, chunk_size, trees_per_chunk, test_size, seed):
+    """Train one way from the synthetic stream and report accuracy, time and peak memory"""
+    import pandas as pd
+    from data_loader import calibrate_risk_thresholds
+    from sklearn.metrics import accuracy_score, f1_score
+    from score_cli import peak_rss_mb
+
+    thresholds = calibrate_risk_thresholds(seed)
+    test_loader = MalariaDataLoader(compact=True)
+    X_test, y_test = next(test_loader.preprocess_chunks(
+        test_loader.generate_sample_chunks(test_size, test_size, seed + 1, thresholds)))
+    # Calibration and the test set are shared overhead, not training memory.
+    # tracemalloc sees the NumPy/pandas buffers, whose peak the RSS high-water
+    # mark would hide behind the calibration sample.
+    tracemalloc.start()
+
+    trainer = MalariaModelTrainer()
+    n_chunks = -(-n_samples // chunk_size)
+    start = time.perf_counter()
+    if mode == 'incremental':
+        loader = MalariaDataLoader(compact=True)
+        chunks = loader.generate_sample_chunks(n_samples, chunk_size, seed, thresholds)
+        trainer.train_incremental(loader.preprocess_chunks(chunks), trees_per_chunk)
+    else:
+        loader = MalariaDataLoader()
+        loader.data = pd.concat(loader.generate_sample_chunks(n_samples, chunk_size, seed,
+                                                              thresholds),
+                                ignore_index=True)
+        features, target = loader.preprocess_data()
+        trainer.train_model(features, target, n_estimators=trees_per_chunk * n_chunks)
+    seconds = time.perf_counter() - start
+    training_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+
+    y_pred = trainer.model.predict(X_test)
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1_score': f1_score(y_test, y_pred, average='weighted'),
+        'seconds': seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'training_mb': training_mb
+    }
+
+
+def benchmark_incremental_training(n_samples=300000, chunk_size=30000, trees_per_chunk=10,
+                                   test_size=50000, seed=42):
+    """
+    Compare full in-memory training with chunked incremental training
+
+    Both forests get the same number of trees and are scored on the same
+    held-out stream chunk. Each run happens in a freshly spawned process so
+    its peak RSS is not inflated by the other run.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for mode in ('full', 'incremental'):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[mode] = executor.submit(_training_run, mode, n_samples, chunk_size,
+                                            trees_per_chunk, test_size, seed).result()
+    results['memory_ratio'] = results['full']['training_mb'] / results['incremental']['training_mb']
+    return results
+
+
+def measure(func, rows=1, repeats=5, warmup=1):
+    """
+    Wall time, throughput and peak memory of func
+
+    Timing and memory are taken in separate passes, since tracemalloc slows
+    down the allocations it traces. peak_mb is the peak of NumPy/pandas and
+    Python allocations made during one call; buffers malloc'ed inside
+    sklearn's compiled tree builder are not traced (the process-wide peak
+    RSS is recorded in the suite metadata).
+    """
+    stats = time_call(func, repeats, warmup)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    stats['rows_per_sec'] = rows / (stats['p50_ms'] / 1000) if stats['p50_ms'] > 0 else 0.0
+    stats['peak_mb'] = peak / (1024 * 1024)
+    return stats
+
+
+def run_suite(n_samples=5000, batch_sizes=(100, 10000), repeats=5, train_repeats=3):
+    """
+    Benchmark every stage of the pipeline end to end
+
+    Returns:
+        dict with run metadata (versions, CPU count, process peak RSS) and
+        per-stage mean/p50/p95 milliseconds, rows_per_sec and peak_mb
+    """
+    import pandas as pd
+    import sklearn
+    from score_cli import peak_rss_mb
+
+    # Keep per-call log lines out of the timings and the output
+    logging.disable(logging.INFO)
+    try:
+        results = _run_stages(n_samples, batch_sizes, repeats, train_repeats)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'n_samples': n_samples,
+            'peak_rss_mb': peak_rss_mb()
+        },
+        'results': results
+    }
+
+
+def _run_stages(n_samples, batch_sizes, repeats, train_repeats):
+    """Measure each pipeline stage in order, reusing the previous stage's output"""
+    results = {}
+    loader = MalariaDataLoader()
+    results['generate_sample_data'] = measure(lambda: loader.generate_sample_data(n_samples),
+                                              n_samples, repeats)
+    results['preprocess_data'] = measure(loader.preprocess_data, n_samples, repeats)
+    X_train, X_test, y_train, y_test = loader.train_test_split()
+
+    trainer = MalariaModelTrainer()
+    results['train_model'] = measure(lambda: trainer.train_model(X_train, y_train),
+                                     len(X_train), train_repeats, warmup=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'malaria_model.pkl')
+        results['save_model'] = measure(lambda: trainer.save_model(model_path), 1, repeats)
+        results['load_model'] = measure(lambda: MalariaModelTrainer().load_model(model_path),
+                                        1, repeats)
+        predictor = MalariaPredictor(model_path)
+
+    record = {key: value for key, value in SAMPLE_INPUT.items() if not key.startswith('region_')}
+    record['region'] = 'Region_A'
+    results['predict_risk_1'] = measure(lambda: predictor.predict_risk(record), 1,
+                                        repeats * 20, warmup=5)
+    for batch_size in batch_sizes:
+        batch = X_test.sample(batch_size, replace=True, random_state=0)
+        results[f'predict_batch_{batch_size}'] = measure(lambda: predictor.predict_batch(batch),
+                                                         batch_size, repeats)
+    return results
+
+
+def compare_to_baseline(current, baseline, threshold=0.2, min_ms=1.0, min_mb=1.0):
+    """
+    Compare a suite run with a baseline run
+
+    A stage regresses when its median time or peak memory grows by more
+    than `threshold` (0.2 = 20%) and by more than the noise floor (min_ms
+    milliseconds, min_mb MB). Stages missing from either run are skipped.
+
+    Returns:
+        list of dicts with stage, metric, baseline, current, change and regressed
+    """
+    rows = []
+    for stage, stats in current['results'].items():
+        reference = baseline['results'].get(stage)
+        if reference is None:
+            continue
+        for metric, floor in (('p50_ms', min_ms), ('peak_mb', min_mb)):
+            before, after = reference[metric], stats[metric]
+            change = (after - before) / before if before > 0 else 0.0
+            rows.append({
+                'stage': stage,
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': change,
+                'regressed': change > threshold and after - before > floor
+            })
+    return rows
+
+
+def print_comparison(rows, threshold):
+    """Pretty-print a baseline comparison"""
+    print(f"\n📈 Comparison with baseline (threshold {threshold:.0%})")
+    for row in rows:
+        flag = '❌ REGRESSION' if row['regressed'] else ''
+        print(f"  {row['stage']:<22} {row['metric']:<8} {row['baseline']:>10.3f} -> "
+              f"{row['current']:>10.3f}  {row['change']:+7.1%}  {flag}")
+
+
+def print_results(title, results):
+    """Pretty-print one benchmark result block"""
+    print(f"\n⏱  {title}")
+    width = max([16] + [len(name) for name in results])
+    for name, stats in results.items():
+        if isinstance(stats, dict):
+            print(f"  {name:<{width}} " + "  ".join(f"{k}={v:.3f}" for k, v in stats.items()))
+        elif isinstance(stats, list):
+            print(f"  {name:<{width}} {', '.join(stats) or 'none'}")
+        else:
+            print(f"  {name:<{width}} {stats:.2f}")
+
+
+def run_latency_benchmarks():
+    """Run all latency comparisons"""
+    predictor, X_test = build_predictor()
+    print_results("Single-row inference: two forest passes vs one",
+                  benchmark_single_pass(predictor))
+    print_results("Feature preparation: DataFrame per request vs FeatureSchema",
+                  benchmark_feature_preparation(predictor))
+    print_results("sklearn predict_proba vs compiled flat-array forest",
+                  benchmark_compiled_forest(predictor, X_test))
+    print_results("Model load: joblib pickle vs memory-mapped arrays",
+                  benchmark_model_load(predictor))
+    print_results("Parallel batch scoring throughput by worker count",
+                  benchmark_parallel_scaling(predictor, X_test))
+    print_results("Instrumentation overhead in predict_risk (compiled engine)",
+                  benchmark_instrumentation_overhead(predictor))
+    print_results("Cold import time of the inference module",
+                  benchmark_import_time('predict'))
+    print_results("Training: full in-memory vs incremental chunks",
+                  benchmark_incremental_training())
+
+
+def main(argv=None):
+    """Command-line entry point; returns 1 if the suite regressed against the baseline"""
+    parser = argparse.ArgumentParser(description="Malaria prediction benchmarks")
+    parser.add_argument('--suite', action='store_true',
+                        help="run the end-to-end stage suite instead of the latency comparisons")
+    parser.add_argument('--samples', type=int, default=5000, help="rows generated for the suite")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help="JSON file to write suite results to")
+    parser.add_argument('--baseline', help="suite JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed relative slowdown or memory growth (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if not args.suite:
+        run_latency_benchmarks()
+        return 0
+
+    suite = run_suite(args.samples, repeats=args.repeats)
+    print_results(f"End-to-end suite ({args.samples} samples)", suite['results'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(suite, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare_to_baseline(suite, baseline, args.threshold)
+    print_comparison(rows, args.threshold)
+    return 1 if any(row['regressed'] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Chunked CSV/Parquet reading and writing.
+
+Shared by the batch scorer and the streaming data generator so large files
+are only ever held in memory one chunk at a time. pyarrow is only imported
+for Parquet files.
+"""
+import os
+import pandas as pd
+
+
+def file_format(path):
+    """Infer 'csv' or 'parquet' from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.csv', '.txt'):
+        return 'csv'
+    raise ValueError(f"Unsupported file type: {path} (expected .csv or .parquet)")
+
+
+def _import_pyarrow():
+    """Import pyarrow for Parquet I/O, which is an optional dependency"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet support requires pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def iter_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file"""
+    if file_format(path) == 'parquet':
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=chunk_size) as reader:
+            yield from reader
+
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV or Parquet file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        self._parquet_writer = None
+        self._started = False
+
+    def write(self, chunk):
+        if self.format == 'parquet':
+            pa = _import_pyarrow()
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pa.parquet.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='a' if self._started else 'w',
+                         header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,18 +1,399 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor
 import logging
+from chunked_io import ChunkWriter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REGIONS = ['Region_A', 'Region_B', 'Region_C']
+RISK_LEVELS = ['Low', 'Medium', 'High']
+
+# Narrowest dtypes that hold the simulated value ranges (see compact_dtypes)
+COMPACT_DTYPES = {
+    'avg_temperature': np.float32,
+    'rainfall': np.float32,
+    'humidity': np.float32,
+    'population_density': np.float32,
+    'healthcare_access': np.float32,
+    'historical_cases': np.int16,
+    'month': np.int8
+}
+CATEGORICAL_COLUMNS = ('region', 'outbreak_risk')
+
+
+def _fits(column, dtype):
+    """Whether a numeric column can be cast to dtype without overflow or losing NaNs"""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return column.dtype.kind in 'fiu'
+    if column.dtype.kind not in 'iu':
+        return False
+    info = np.iinfo(dtype)
+    return len(column) == 0 or (column.min() >= info.min and column.max() <= info.max)
+
+
+def compact_dtypes(frame):
+    """
+    Return a copy of frame with categorical labels and narrow numeric dtypes
+    
+    Region and risk become categoricals, the known numeric columns take the
+    dtypes in COMPACT_DTYPES when their values fit, and any other float64
+    column becomes float32 (the precision the forest splits on anyway).
+    Columns are converted one at a time, so the peak overhead is one column.
+    """
+    columns = {}
+    for name in frame.columns:
+        column = frame[name]
+        if name in CATEGORICAL_COLUMNS or column.dtype == object:
+            column = column.astype('category')
+        elif name in COMPACT_DTYPES and _fits(column, COMPACT_DTYPES[name]):
+            column = column.astype(COMPACT_DTYPES[name])
+        elif column.dtype == np.float64:
+            column = column.astype(np.float32)
+        columns[name] = column
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def memory_mb(frame):
+    """Deep memory footprint of a DataFrame or Series in MB"""
+    usage = frame.memory_usage(deep=True)
+    return float(usage.sum() if hasattr(usage, 'sum') else usage) / (1024 * 1024)
+
+
+def _chunk_seed(seed, index):
+    """
+    Seed for stream chunk `index`
+    
+    Chunk i always gets spawn key (i + 1,) of the root seed (key 0 is the
+    calibration sample), so the data does not depend on chunk scheduling
+    or the number of worker processes.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(index + 1,))
+
+
+def _simulate_features(rng, n_samples):
+    """Draw raw climate/health features and their noisy risk score"""
+    data = {
+        'region': rng.choice(REGIONS, n_samples),
+        'avg_temperature': rng.normal(28, 5, n_samples),  # Celsius
+        'rainfall': rng.gamma(2, 50, n_samples),  # mm/month
+        'humidity': rng.normal(75, 15, n_samples),  # Percentage
+        'population_density': rng.lognormal(5, 1, n_samples),  # People per sq km
+        'healthcare_access': rng.uniform(0, 1, n_samples),  # Index 0-1
+        'historical_cases': rng.poisson(50, n_samples),  # Previous cases
+        'month': rng.integers(1, 13, n_samples)  # Month of year
+    }
+    
+    risk_score = (
+        data['avg_temperature'] * 0.3 +
+        data['rainfall'] * 0.2 +
+        data['humidity'] * 0.25 +
+        data['historical_cases'] * 0.15 +
+        (1 - data['healthcare_access']) * 0.1 +
+        rng.normal(0, 2, n_samples)
+    )
+    return data, risk_score
+
+
+def calibrate_risk_thresholds(seed=42, calibration_size=1_000_000):
+    """
+    Estimate the 33rd/67th percentile risk-score thresholds from a calibration sample
+    
+    Only calibration_size scores are held in memory, however large the
+    stream is; the quantile error shrinks like 1/sqrt(calibration_size).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(0,)))
+    _, risk_score = _simulate_features(rng, calibration_size)
+    low_threshold, high_threshold = np.percentile(risk_score, [33, 67])
+    return float(low_threshold), float(high_threshold)
+
+
+def generate_chunk(seed, index, n_samples, thresholds):
+    """Generate stream chunk `index` with fixed class thresholds"""
+    rng = np.random.default_rng(_chunk_seed(seed, index))
+    data, risk_score = _simulate_features(rng, n_samples)
+    
+    # Same bins as pd.cut(..., bins=[-inf, low, high, inf]): right-inclusive
+    codes = np.searchsorted(thresholds, risk_score, side='left')
+    data['outbreak_risk'] = pd.Categorical.from_codes(codes, categories=RISK_LEVELS)
+    return pd.DataFrame(data)
+
+
+def _generate_chunk_args(args):
+    """ProcessPoolExecutor.map helper"""
+    return generate_chunk(*args)
+
+
+# Panel mode: region x month series (see PanelFeatureEngine)
+PANEL_COVARIATES = ['avg_temperature', 'rainfall', 'humidity', 'population_density',
+                    'healthcare_access', 'month']
+DEFAULT_LAGS = {'cases': (1, 2, 3, 12), 'rainfall': (1, 2)}
+DEFAULT_WINDOWS = {'rainfall': (3, 6), 'avg_temperature': (3,), 'cases': (3, 12)}
+
+
+def simulate_panel(regions=REGIONS, n_years=10, start='2010-01', seed=42):
+    """
+    Simulate a monthly region x month panel with seasonal climate and lagged case dynamics
+    
+    Cases respond to the previous two months of rainfall and to temperature,
+    and carry over from the previous month, so lags and rolling windows are
+    informative. outbreak_risk bins the month's cases relative to population
+    density into terciles over the whole panel.
+    """
+    rng = np.random.default_rng(seed)
+    n_regions, n_months = len(regions), n_years * 12
+    dates = pd.date_range(start, periods=n_months, freq='MS')
+    month = dates.month.to_numpy()
+    season = 2 * np.pi * (month - 1) / 12
+    
+    # Per-region climate offsets, population and healthcare trends
+    temp_base = rng.normal(27, 2, n_regions)[:, None]
+    rain_base = rng.uniform(60, 140, n_regions)[:, None]
+    population = rng.lognormal(5, 0.6, n_regions)[:, None] * (1 + 0.002 * np.arange(n_months))
+    access = np.clip(rng.uniform(0.2, 0.7, n_regions)[:, None]
+                     + 0.002 * np.arange(n_months) + rng.normal(0, 0.02, (n_regions, n_months)), 0, 1)
+    
+    temperature = temp_base + 3 * np.sin(season) + rng.normal(0, 1, (n_regions, n_months))
+    rainfall = rain_base * (1 + 0.8 * np.sin(season - np.pi / 3)) \
+        * rng.gamma(4, 0.25, (n_regions, n_months))
+    humidity = np.clip(60 + 0.1 * rainfall + rng.normal(0, 5, (n_regions, n_months)), 30, 100)
+    
+    cases = np.zeros((n_regions, n_months))
+    previous = rng.poisson(50, n_regions).astype(float)
+    for t in range(n_months):
+        rain_lag = (rainfall[:, t - 1] + rainfall[:, t - 2]) / 2 if t >= 2 else rain_base[:, 0]
+        rate = (0.6 * previous + 20 * (rain_lag / rain_base[:, 0])
+                * np.exp(0.08 * (temperature[:, t] - 27)) * (1.5 - access[:, t])
+                * population[:, t] / 150)
+        cases[:, t] = previous = rng.poisson(np.maximum(rate, 1))
+    
+    incidence = cases / population
+    low, high = np.percentile(incidence, [33, 67])
+    codes = np.searchsorted([low, high], incidence.ravel(), side='left')
+    
+    return pd.DataFrame({
+        'region': np.repeat(regions, n_months),
+        'date': np.tile(dates, n_regions),
+        'month': np.tile(month, n_regions),
+        'avg_temperature': temperature.ravel(),
+        'rainfall': rainfall.ravel(),
+        'humidity': humidity.ravel(),
+        'population_density': population.ravel(),
+        'healthcare_access': access.ravel(),
+        'cases': cases.ravel(),
+        'outbreak_risk': pd.Categorical.from_codes(codes, categories=RISK_LEVELS)
+    })
+
+
+def _grouped_shift(values, position, k):
+    """values[i - k] within each group, NaN for the first k rows of a group"""
+    out = np.full(len(values), np.nan)
+    if k < len(values):
+        out[k:] = values[:len(values) - k]
+    out[position < k] = np.nan
+    return out
+
+
+def _grouped_rolling_mean(values, position, window, offset=0):
+    """
+    Mean of values[i - offset - window + 1 : i - offset + 1] within each group
+    
+    Missing values are skipped, so a gap only affects the windows that
+    contain it; a window with no readings is NaN.
+    """
+    present = ~np.isnan(values)
+    cumulative = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(present)])
+    end = np.arange(len(values)) - offset + 1
+    start = end - window
+    out = np.full(len(values), np.nan)
+    valid = position >= offset + window - 1
+    n = counts[end[valid]] - counts[start[valid]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[valid] = np.where(n > 0, (cumulative[end[valid]] - cumulative[start[valid]]) / n, np.nan)
+    return out
+
+
+class PanelFeatureEngine:
+    """
+    Lag, rolling-window and seasonal features for a region x month panel
+    
+    All features are computed with vectorized operations over the panel
+    sorted by (region, date): a lag is one shifted array and a rolling mean
+    one difference of a cumulative sum, masked where the window would cross
+    into another region. Lags and windows of the outcome column only look
+    at earlier months. fit_transform keeps the last max_lookback months of
+    each region, so append() can featurize newly arrived months from that
+    tail without recomputing history.
+    
+    The output has region_* one-hot columns and float32 features, ready for
+    MalariaModelTrainer.train_model and MalariaPredictor.predict_batch.
+    """
+    
+    def __init__(self, lags=None, windows=None, seasonal=True, covariates=PANEL_COVARIATES,
+                 outcome='cases', group_column='region', time_column='date', regions=None):
+        """
+        Args:
+            lags: dict of column -> lags in months, defaults to DEFAULT_LAGS
+            windows: dict of column -> rolling-mean window lengths in months,
+                defaults to DEFAULT_WINDOWS
+            seasonal: add month_sin/month_cos encodings
+            covariates: current-month columns passed through unchanged
+            outcome: column that is only ever used lagged (windows end a month earlier)
+            group_column, time_column: region and month-start date columns
+            regions: region one-hot columns, defaults to the regions seen by fit_transform
+        """
+        self.lags = DEFAULT_LAGS if lags is None else lags
+        self.windows = DEFAULT_WINDOWS if windows is None else windows
+        self.seasonal = seasonal
+        self.covariates = list(covariates)
+        self.outcome = outcome
+        self.group_column = group_column
+        self.time_column = time_column
+        self.regions = sorted(regions) if regions is not None else None
+        self.history = None
+    
+    @property
+    def max_lookback(self):
+        """Months of history a row's features depend on"""
+        lookbacks = [max(lags) for lags in self.lags.values() if lags]
+        lookbacks += [max(windows) - 1 + (column == self.outcome)
+                      for column, windows in self.windows.items() if windows]
+        return max(lookbacks, default=0)
+    
+    @property
+    def source_columns(self):
+        """Raw columns the features are computed from"""
+        columns = [self.group_column, self.time_column] + self.covariates
+        for column in list(self.lags) + list(self.windows):
+            if column not in columns:
+                columns.append(column)
+        return columns
+    
+    @property
+    def feature_names(self):
+        """Output columns, in order"""
+        names = list(self.covariates)
+        if self.seasonal:
+            names += ['month_sin', 'month_cos']
+        for column, lags in self.lags.items():
+            names += [f'{column}_lag_{k}' for k in lags]
+        for column, windows in self.windows.items():
+            names += [f'{column}_mean_{w}' for w in windows]
+        return names + [f'region_{region}' for region in self.regions or []]
+    
+    def transform(self, panel):
+        """
+        Compute features for every row of a panel
+        
+        Each region must have one row per month with no gaps. Rows whose
+        lags or windows reach before the start of their region's series get
+        NaN in those features.
+        
+        Returns:
+            feature DataFrame indexed like panel, sorted by (region, date)
+        """
+        if self.regions is None:
+            self.regions = sorted(panel[self.group_column].unique())
+        frame = panel.sort_values([self.group_column, self.time_column], kind='stable')
+        
+        dates = pd.DatetimeIndex(frame[self.time_column])
+        period = dates.year.to_numpy() * 12 + dates.month.to_numpy()
+        group, _ = pd.factorize(frame[self.group_column])
+        starts = np.ones(len(frame), dtype=bool)
+        starts[1:] = group[1:] != group[:-1]
+        
+        steps = np.diff(period)[~starts[1:]]
+        if (steps != 1).any():
+            raise ValueError("Panel must have exactly one row per region and month, "
+                             "with no gaps")
+        
+        # Row position within its region's series
+        row = np.arange(len(frame))
+        position = row - np.maximum.accumulate(np.where(starts, row, 0))
+        
+        columns = {name: frame[name].to_numpy(dtype=np.float32) for name in self.covariates}
+        if self.seasonal:
+            angle = 2 * np.pi * (frame['month'].to_numpy(dtype=np.float64) - 1) / 12
+            columns['month_sin'] = np.sin(angle).astype(np.float32)
+            columns['month_cos'] = np.cos(angle).astype(np.float32)
+        
+        for column, lags in self.lags.items():
+            values = frame[column].to_numpy(dtype=np.float64)
+            for k in lags:
+                columns[f'{column}_lag_{k}'] = _grouped_shift(values, position, k).astype(np.float32)
+        
+        for column, windows in self.windows.items():
+            values = frame[column].to_numpy(dtype=np.float64)
+            offset = int(column == self.outcome)
+            for w in windows:
+                columns[f'{column}_mean_{w}'] = _grouped_rolling_mean(
+                    values, position, w, offset).astype(np.float32)
+        
+        # Unknown regions leave every region column at 0
+        region_codes = pd.Categorical(frame[self.group_column], categories=self.regions).codes
+        for code, region in enumerate(self.regions):
+            columns[f'region_{region}'] = region_codes == code
+        return pd.DataFrame(columns, index=frame.index)
+    
+    def _keep_history(self, frame):
+        """Keep the last max_lookback months of each region"""
+        frame = frame[self.source_columns].sort_values([self.group_column, self.time_column],
+                                                       kind='stable')
+        self.history = frame.groupby(self.group_column, sort=False).tail(
+            max(self.max_lookback, 1)).reset_index(drop=True)
+    
+    def fit_transform(self, panel):
+        """transform() the panel and keep each region's recent months for append()"""
+        features = self.transform(panel)
+        self._keep_history(panel)
+        return features
+    
+    def append(self, rows):
+        """
+        Compute features for newly arrived months from the kept history
+        
+        Args:
+            rows: raw panel rows for months following the last kept month of
+                their region (new regions start a fresh series)
+        
+        Returns:
+            feature DataFrame indexed and ordered like rows
+        """
+        if self.history is None:
+            raise ValueError("No history. Call fit_transform() first.")
+        
+        new = rows[self.source_columns].reset_index(drop=True)
+        new.index = new.index + len(self.history)
+        combined = pd.concat([self.history, new])
+        features = self.transform(combined).loc[new.index]
+        features.index = rows.index
+        
+        self._keep_history(combined)
+        return features
+
+
 class MalariaDataLoader:
     """Data loader for malaria outbreak prediction"""
     
-    def __init__(self):
+    def __init__(self, compact=False):
+        """
+        Args:
+            compact: store categorical labels and float32/int16/int8 numerics
+                (see compact_dtypes) and one-hot encode from category codes,
+                cutting the training data footprint several times over
+        """
+        self.compact = compact
         self.data = None
         self.features = None
         self.target = None
+        self.risk_thresholds = None
+        self.memory_report = None
+        self.feature_engine = None
+        self.dates = None
         
     def generate_sample_data(self, n_samples=1000):
         """
@@ -55,11 +436,85 @@ class MalariaDataLoader:
                                      labels=['Low', 'Medium', 'High'])
         
         self.data = pd.DataFrame(data)
+        if self.compact:
+            self._compact_data()
         logger.info(f"Generated {n_samples} samples")
         logger.info(f"Risk distribution:\n{self.data['outbreak_risk'].value_counts()}")
         
         return self.data
     
+    def generate_sample_chunks(self, n_samples, chunk_size=1_000_000, seed=42,
+                               thresholds=None, calibration_size=1_000_000, n_jobs=1):
+        """
+        Yield synthetic data in chunks without holding the full dataset in memory
+        
+        Each chunk uses its own numpy.random.Generator spawned from `seed`, so
+        the stream is reproducible and chunks can be generated in parallel.
+        Risk classes use thresholds from a calibration pass (see
+        calibrate_risk_thresholds) instead of percentiles of the full array.
+        
+        Args:
+            n_samples: total number of rows
+            chunk_size: rows per chunk
+            seed: root seed of the stream
+            thresholds: (low, high) risk-score thresholds, calibrated if None
+            calibration_size: sample size used to calibrate the thresholds
+            n_jobs: worker processes generating chunks
+        """
+        if thresholds is None:
+            thresholds = calibrate_risk_thresholds(seed, calibration_size)
+        self.risk_thresholds = thresholds
+        
+        tasks = [(seed, index, min(chunk_size, n_samples - start), thresholds)
+                 for index, start in enumerate(range(0, n_samples, chunk_size))]
+        
+        if n_jobs == 1:
+            chunks = (generate_chunk(*task) for task in tasks)
+        else:
+            chunks = self._generate_parallel(tasks, n_jobs)
+        
+        for chunk in chunks:
+            yield compact_dtypes(chunk) if self.compact else chunk
+    
+    def _generate_parallel(self, tasks, n_jobs):
+        """Generate chunks across a process pool, in order"""
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            # Keep at most two chunks per worker in flight to bound memory
+            window = 2 * n_jobs
+            for start in range(0, len(tasks), window):
+                yield from executor.map(_generate_chunk_args, tasks[start:start + window])
+    
+    def stream_sample_data(self, path, n_samples, chunk_size=1_000_000, seed=42,
+                           n_jobs=1, calibration_size=1_000_000):
+        """
+        Stream a large synthetic dataset to a CSV or Parquet file chunk by chunk
+        
+        Returns:
+            dict with rows, chunks, risk_distribution and thresholds
+        """
+        logger.info(f"Streaming {n_samples} synthetic samples to {path}...")
+        
+        rows = chunks = 0
+        risk_counts = pd.Series(0, index=RISK_LEVELS)
+        with ChunkWriter(path) as writer:
+            for chunk in self.generate_sample_chunks(n_samples, chunk_size, seed,
+                                                     calibration_size=calibration_size,
+                                                     n_jobs=n_jobs):
+                writer.write(chunk)
+                risk_counts += chunk['outbreak_risk'].value_counts().reindex(RISK_LEVELS)
+                rows += len(chunk)
+                chunks += 1
+        
+        logger.info(f"Wrote {rows} samples in {chunks} chunks")
+        logger.info(f"Risk distribution:\n{risk_counts}")
+        
+        return {
+            'rows': rows,
+            'chunks': chunks,
+            'risk_distribution': risk_counts.to_dict(),
+            'thresholds': self.risk_thresholds
+        }
+    
     def preprocess_data(self):
         """Preprocess data for model training"""
         if self.data is None:
@@ -67,27 +522,141 @@ class MalariaDataLoader:
         
         logger.info("Preprocessing data...")
         
-        # Handle missing values
-        self.data = self.data.dropna()
+        # Handle missing values (dropna copies the frame even when nothing is dropped)
+        if self.data.isna().to_numpy().any():
+            self.data = self.data.dropna()
         
         # Separate features and target
         self.target = self.data['outbreak_risk']
         
         # One-hot encode categorical features
-        self.features = pd.get_dummies(self.data.drop('outbreak_risk', axis=1), 
-                                       columns=['region'], 
-                                       drop_first=False)
+        if self.compact:
+            self.features = self._one_hot_compact(self.data)
+        else:
+            self.features = pd.get_dummies(self.data.drop('outbreak_risk', axis=1), 
+                                           columns=['region'], 
+                                           drop_first=False)
         
         logger.info(f"Features shape: {self.features.shape}")
         logger.info(f"Feature columns: {list(self.features.columns)}")
+        logger.info(f"Features memory: {memory_mb(self.features):.1f} MB")
         
         return self.features, self.target
     
-    def train_test_split(self, test_size=0.2, random_state=42):
-        """Split data into training and testing sets"""
+    def generate_panel_data(self, n_years=10, regions=REGIONS, start='2010-01', seed=42):
+        """
+        Generate a synthetic multi-year monthly panel, one row per region and month
+        
+        Unlike generate_sample_data, rows form time series: see simulate_panel.
+        """
+        logger.info(f"Generating {n_years}-year malaria panel for {len(regions)} regions...")
+        self.data = simulate_panel(regions, n_years, start, seed)
+        logger.info(f"Generated {len(self.data)} region-months")
+        return self.data
+    
+    def preprocess_panel(self, engine=None):
+        """
+        Build lag/rolling/seasonal panel features for model training
+        
+        Rows whose lags or windows reach before the start of the panel are
+        dropped. The engine keeps each region's latest months, so new months
+        can be featurized later with engine.append().
+        
+        Args:
+            engine: PanelFeatureEngine, defaults to one with DEFAULT_LAGS and
+                DEFAULT_WINDOWS
+        """
+        if self.data is None:
+            raise ValueError("No data loaded. Call generate_panel_data() first.")
+        
+        logger.info("Computing panel features...")
+        self.feature_engine = engine or PanelFeatureEngine()
+        features = self.feature_engine.fit_transform(self.data)
+        
+        complete = features.notna().all(axis=1).to_numpy()
+        self.features = features[complete]
+        self.target = self.data.loc[self.features.index, 'outbreak_risk']
+        self.dates = self.data.loc[self.features.index, self.feature_engine.time_column]
+        
+        logger.info(f"Features shape: {self.features.shape} "
+                    f"({(~complete).sum()} warm-up rows dropped)")
+        logger.info(f"Feature columns: {list(self.features.columns)}")
+        
+        return self.features, self.target
+    
+    def preprocess_chunks(self, chunks, regions=REGIONS):
+        """
+        Preprocess a stream of raw chunks into (features, target) pairs
+        
+        Every chunk gets the same region one-hot columns, in the order
+        preprocess_data produces them, even when a region is absent from it.
+        Regions outside `regions` leave all region columns at 0.
+        
+        Args:
+            chunks: iterable of raw DataFrames, e.g. from generate_sample_chunks
+            regions: every region the model should have a column for
+        """
+        region_dtype = pd.CategoricalDtype(sorted(regions))
+        for chunk in chunks:
+            if chunk.isna().to_numpy().any():
+                chunk = chunk.dropna()
+            chunk = chunk.assign(region=chunk['region'].astype(region_dtype))
+            yield self._one_hot_compact(chunk), chunk['outbreak_risk']
+    
+    def _compact_data(self):
+        """Convert self.data to compact dtypes and record the memory saved"""
+        before = memory_mb(self.data)
+        self.data = compact_dtypes(self.data)
+        after = memory_mb(self.data)
+        
+        self.memory_report = {
+            'before_mb': before,
+            'after_mb': after,
+            'reduction': before / after if after else 1.0
+        }
+        logger.info(f"Compact dtypes: {before:.1f} MB -> {after:.1f} MB "
+                    f"({self.memory_report['reduction']:.1f}x smaller)")
+    
+    def _one_hot_compact(self, frame):
+        """
+        One-hot encode region straight from its category codes
+        
+        Produces the same columns, order and boolean dtype as pd.get_dummies,
+        without the dropped-target copy or get_dummies' intermediate frames.
+        """
+        region = frame['region']
+        if not isinstance(region.dtype, pd.CategoricalDtype):
+            region = region.astype('category')
+        codes = region.cat.codes.to_numpy()
+        
+        columns = {name: frame[name] for name in frame.columns
+                   if name not in CATEGORICAL_COLUMNS}
+        for code, name in enumerate(region.cat.categories):
+            columns[f'region_{name}'] = codes == code
+        return pd.DataFrame(columns, index=frame.index)
+    
+    def train_test_split(self, test_size=0.2, random_state=42, time_ordered=False):
+        """
+        Split data into training and testing sets
+        
+        Args:
+            time_ordered: after preprocess_panel, test on the latest test_size
+                fraction of months instead of a random stratified sample
+        """
         if self.features is None or self.target is None:
             raise ValueError("Data not preprocessed. Call preprocess_data() first.")
         
+        if time_ordered:
+            if self.dates is None:
+                raise ValueError("time_ordered splits need panel data. Call preprocess_panel() first.")
+            months = np.sort(self.dates.unique())
+            cutoff = months[int(len(months) * (1 - test_size))]
+            test = (self.dates >= cutoff).to_numpy()
+            logger.info(f"Training on months before {pd.Timestamp(cutoff):%Y-%m}, "
+                        f"testing on {test.sum()} later rows")
+            return (self.features[~test], self.features[test],
+                    self.target[~test], self.target[test])
+        
         X_train, X_test, y_train, y_test = train_test_split(
             self.features, self.target, 
             test_size=test_size, 
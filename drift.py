@@ -0,0 +1,402 @@
+"""
+Input-drift and prediction-distribution monitoring with streaming histograms.
+
+A DriftProfile is captured from the training data by MalariaModelTrainer: for
+every numeric feature it stores quantile bin edges and the reference count in
+each bin, the region mix, the predicted-class mix and a histogram of each
+class probability. A DriftSketch holds the same counts for live traffic. Its
+size depends only on the number of bins, never on the number of rows, and
+two sketches merge by adding their counts.
+
+MalariaPredictor(monitor=DriftMonitor(...)) hands every scored feature
+matrix to DriftMonitor.observe, which only appends a reference to a bounded
+queue. A background thread folds the queue into the sketches with one
+searchsorted/bincount per feature and, on a schedule, scores the current
+window against the reference with the population stability index (PSI) and
+a binned Kolmogorov-Smirnov distance.
+
+Usage:
+    predictor = MalariaPredictor(monitor=True)
+    predictor.monitor.report()
+
+Processes that build many predictors (Streamlit reruns every session) share
+one monitor per model from shared_monitor() instead.
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMAT_VERSION = 1
+
+# Class-probability histograms use fixed edges on [0, 1]
+PROBABILITY_EDGES = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+
+# Conventional PSI reading: < 0.1 stable, 0.1-0.2 moderate shift, > 0.2 drift
+PSI_THRESHOLD = 0.2
+
+
+def quantile_edges(values, n_bins=10):
+    """Interior bin edges at the quantiles of values, with duplicates removed"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+
+
+def psi(expected, actual, eps=1e-4):
+    """Population stability index between two count vectors over the same bins"""
+    p = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), eps)
+    q = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_distance(expected, actual):
+    """Largest gap between the cumulative distributions of two binned count vectors"""
+    p = np.cumsum(expected) / max(np.sum(expected), 1)
+    q = np.cumsum(actual) / max(np.sum(actual), 1)
+    return float(np.max(np.abs(p - q)))
+
+
+class DriftProfile:
+    """Bin layout and reference counts of every monitored signal"""
+
+    def __init__(self, feature_names, edges, classes, reference, region_prefix='region_'):
+        """
+        Args:
+            feature_names: training columns in model order
+            edges: dict of numeric feature -> interior bin edges
+            classes: model classes, in probability column order
+            reference: DriftSketch counts of the reference data
+        """
+        self.feature_names = list(feature_names)
+        self.edges = {name: np.asarray(values, dtype=np.float64) for name, values in edges.items()}
+        self.classes = [str(c) for c in classes]
+        self.region_prefix = region_prefix
+        self.numeric_columns = [(name, self.feature_names.index(name)) for name in self.edges]
+        self.region_columns = np.array([i for i, name in enumerate(self.feature_names)
+                                        if name.startswith(region_prefix)], dtype=np.intp)
+        self.regions = [self.feature_names[i][len(region_prefix):] for i in self.region_columns]
+        self.reference = reference
+        self._fingerprint = None
+
+    @classmethod
+    def capture(cls, feature_names, features, probability, classes, n_bins=10):
+        """
+        Profile reference data, e.g. the training set and the model's probabilities for it
+
+        Args:
+            feature_names: training columns in model order
+            features: encoded feature matrix (DataFrame or array)
+            probability: class probabilities for features
+            classes: model classes, in probability column order
+            n_bins: quantile bins per numeric feature
+        """
+        feature_names = list(feature_names)
+        features = np.asarray(features, dtype=np.float32)
+        edges = {name: quantile_edges(features[:, i], n_bins)
+                 for i, name in enumerate(feature_names) if not name.startswith('region_')}
+        profile = cls(feature_names, edges, classes, reference=None)
+        profile.reference = profile.new_sketch()
+        profile.reference.update(features, probability)
+        return profile
+
+    @property
+    def fingerprint(self):
+        """Hash of the profile's bins and reference counts; equal for reloads of one model"""
+        if self._fingerprint is None:
+            payload = json.dumps(self.to_dict(), sort_keys=True).encode()
+            self._fingerprint = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        return self._fingerprint
+
+    def new_sketch(self):
+        """Empty sketch with this profile's bins"""
+        return DriftSketch(self)
+
+    def to_dict(self):
+        """JSON-serializable form, stored with the model by save_model"""
+        return {
+            'format_version': PROFILE_FORMAT_VERSION,
+            'feature_names': self.feature_names,
+            'edges': {name: values.tolist() for name, values in self.edges.items()},
+            'classes': self.classes,
+            'region_prefix': self.region_prefix,
+            'reference': self.reference.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a profile written by to_dict"""
+        if data.get('format_version') != PROFILE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported drift profile format: {data.get('format_version')}")
+        profile = cls(data['feature_names'], data['edges'], data['classes'], reference=None,
+                      region_prefix=data['region_prefix'])
+        profile.reference = DriftSketch.from_dict(profile, data['reference'])
+        return profile
+
+
+class DriftSketch:
+    """Mergeable fixed-size histograms of features, regions, predicted classes and probabilities"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.n = 0
+        self.features = {name: np.zeros(len(edges) + 1)
+                         for name, edges in profile.edges.items()}
+        # Last bucket counts rows without a known region
+        self.regions = np.zeros(len(profile.regions) + 1)
+        self.n_predictions = 0
+        self.classes = np.zeros(len(profile.classes))
+        self.probabilities = np.zeros((len(profile.classes), len(PROBABILITY_EDGES) + 1))
+
+    def update(self, features, probability=None):
+        """
+        Add encoded feature rows and, if known, their class probabilities
+
+        Args:
+            features: float32 matrix in feature_names order
+            probability: matrix of class probabilities for the rows, or None
+                for rows answered without one (e.g. from a result cache)
+        """
+        features = np.atleast_2d(features)
+        self.n += len(features)
+        for name, column in self.profile.numeric_columns:
+            bins = np.searchsorted(self.profile.edges[name], features[:, column], side='right')
+            self.features[name] += np.bincount(bins, minlength=len(self.features[name]))
+
+        columns = self.profile.region_columns
+        if len(columns):
+            block = features[:, columns]
+            codes = np.where(block.max(axis=1) > 0, block.argmax(axis=1), len(columns))
+            self.regions += np.bincount(codes, minlength=len(self.regions))
+
+        if probability is not None:
+            probability = np.atleast_2d(probability)
+            self.n_predictions += len(probability)
+            self.classes += np.bincount(probability.argmax(axis=1), minlength=len(self.classes))
+            bins = np.searchsorted(PROBABILITY_EDGES, probability, side='right')
+            for c in range(len(self.classes)):
+                self.probabilities[c] += np.bincount(bins[:, c],
+                                                     minlength=self.probabilities.shape[1])
+        return self
+
+    def merge(self, other):
+        """Add another sketch's counts (same profile) into this one"""
+        self.n += other.n
+        self.n_predictions += other.n_predictions
+        for name in self.features:
+            self.features[name] += other.features[name]
+        self.regions += other.regions
+        self.classes += other.classes
+        self.probabilities += other.probabilities
+        return self
+
+    def signals(self):
+        """(signal name, counts) of every monitored histogram"""
+        signals = list(self.features.items())
+        if len(self.profile.region_columns):
+            signals.append(('region', self.regions))
+        signals.append(('predicted_class', self.classes))
+        signals += [(f'prob_{level}', self.probabilities[c])
+                    for c, level in enumerate(self.profile.classes)]
+        return signals
+
+    def compare(self, reference=None, threshold=PSI_THRESHOLD):
+        """
+        Drift of this sketch against the reference counts
+
+        Returns:
+            DataFrame indexed by signal with n, psi, ks (numeric and
+            probability histograms only) and drifted (psi > threshold)
+        """
+        import pandas as pd
+
+        reference = reference or self.profile.reference
+        ordered = {'region', 'predicted_class'}
+        rows = []
+        for (name, expected), (_, actual) in zip(reference.signals(), self.signals()):
+            rows.append({
+                'signal': name,
+                'n': int(actual.sum()),
+                'psi': psi(expected, actual) if actual.sum() else np.nan,
+                'ks': ks_distance(expected, actual) if actual.sum() and name not in ordered
+                      else np.nan
+            })
+        scores = pd.DataFrame(rows).set_index('signal')
+        scores['drifted'] = scores['psi'] > threshold
+        return scores
+
+    def to_dict(self):
+        return {
+            'n': self.n,
+            'n_predictions': self.n_predictions,
+            'features': {name: counts.tolist() for name, counts in self.features.items()},
+            'regions': self.regions.tolist(),
+            'classes': self.classes.tolist(),
+            'probabilities': self.probabilities.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, profile, data):
+        sketch = cls(profile)
+        sketch.n, sketch.n_predictions = data['n'], data['n_predictions']
+        sketch.features = {name: np.asarray(counts, dtype=np.float64)
+                           for name, counts in data['features'].items()}
+        sketch.regions = np.asarray(data['regions'], dtype=np.float64)
+        sketch.classes = np.asarray(data['classes'], dtype=np.float64)
+        sketch.probabilities = np.asarray(data['probabilities'], dtype=np.float64)
+        return sketch
+
+
+class DriftMonitor:
+    """Collects live traffic into sketches and scores drift on a schedule"""
+
+    def __init__(self, profile, interval=60.0, min_samples=500, max_pending=10000,
+                 history=100, threshold=PSI_THRESHOLD, start=True):
+        """
+        Args:
+            profile: DriftProfile of the served model
+            interval: seconds between scheduled checks, or None to only check on check()
+            min_samples: rows a window needs before it is scored; smaller
+                windows keep accumulating into the next check
+            max_pending: observe() calls queued between checks; older calls
+                are dropped beyond this (counted in dropped)
+            history: scored windows kept in memory
+            threshold: PSI above which a signal is reported as drifted
+            start: start the background thread
+        """
+        self.profile = profile
+        self.interval = interval
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self.history = deque(maxlen=history)
+        self.dropped = 0
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._window = profile.new_sketch()
+        self._total = profile.new_sketch()
+        self._stop = threading.Event()
+        self._thread = None
+        # Set by shared_monitor; shared monitors stay bound to their profile
+        self.shared = False
+        if start and interval is not None:
+            self.start()
+
+    def observe(self, features, probability=None):
+        """
+        Queue scored rows for the next check; never waits on the sketches
+
+        The arrays are held by reference until the background thread bins
+        them, so callers must not modify them afterwards.
+        """
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append((features, probability))
+
+    def set_profile(self, profile):
+        """Start comparing against a new model's profile, discarding the current window"""
+        with self._lock:
+            self._pending.clear()
+            self.profile = profile
+            self._window = profile.new_sketch()
+            self._total = profile.new_sketch()
+
+    def _drain(self):
+        """Bin every queued observation into the window and lifetime sketches"""
+        batch = self.profile.new_sketch()
+        while True:
+            try:
+                features, probability = self._pending.popleft()
+            except IndexError:
+                break
+            batch.update(features, probability)
+        self._window.merge(batch)
+        self._total.merge(batch)
+
+    def check(self, force=False):
+        """
+        Fold queued traffic into the sketches and score the window if it is large enough
+
+        Args:
+            force: score the window even below min_samples
+
+        Returns:
+            drift scores DataFrame (see DriftSketch.compare), or None if the
+            window is still too small
+        """
+        with self._lock:
+            self._drain()
+            if self._window.n == 0 or (self._window.n < self.min_samples and not force):
+                return None
+            scores = self._window.compare(threshold=self.threshold)
+            self.history.append({'time': time.time(), 'n': self._window.n, 'scores': scores})
+            self._window = self.profile.new_sketch()
+
+        drifted = scores.index[scores['drifted']].tolist()
+        if drifted:
+            logger.warning(f"Drift detected in {drifted} (PSI > {self.threshold})")
+        return scores
+
+    def report(self):
+        """Scores of the latest scored window, or None before the first one"""
+        return self.history[-1]['scores'] if self.history else None
+
+    def lifetime_scores(self):
+        """Scores of all traffic seen since the monitor (or profile) started"""
+        with self._lock:
+            self._drain()
+            return self._total.compare(threshold=self.threshold)
+
+    def start(self):
+        """Run check() every interval seconds on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='drift-monitor')
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Drift check failed")
+
+    def stop(self):
+        """Stop the background thread"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+# One monitor (and one background thread) per model profile, see shared_monitor
+_shared_monitors = {}
+_shared_monitor_lock = threading.Lock()
+
+
+def shared_monitor(profile, **options):
+    """
+    Process-wide DriftMonitor for profile
+
+    Every caller passing the same model's profile gets the same monitor, so
+    traffic from all predictors and sessions serving that model lands in one
+    window; reloads of the model are recognised by fingerprint. Different
+    models (e.g. the old and new versions during a registry hot swap, or two
+    models served side by side) get separate monitors, and monitors live as
+    long as the process.
+
+    Args:
+        profile: DriftProfile of the served model
+        **options: DriftMonitor arguments, used when the monitor is created
+    """
+    with _shared_monitor_lock:
+        monitor = _shared_monitors.get(profile.fingerprint)
+        if monitor is None:
+            monitor = DriftMonitor(profile, **options)
+            monitor.shared = True
+            _shared_monitors[profile.fingerprint] = monitor
+        return monitor
@@ -0,0 +1,272 @@
+"""
+Vectorized evaluation and bias audit engine.
+
+The test set is scored once. Every group's confusion matrix (by region, by
+month, or overall) then comes from a single np.bincount over
+(group, actual, predicted) cells, and accuracy, weighted/macro F1 and
+per-class precision/recall are derived from those matrices for all groups
+at once. Bootstrap confidence intervals reweight the same cells with
+Poisson(1) row weights, so each replicate is one weighted bincount;
+replicates are spread across a process pool.
+
+Results are returned as dicts of DataFrames and arrays rather than printed.
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+GROUP_METRICS = ('accuracy', 'f1_score', 'f1_macro')
+
+# Per-worker bootstrap state, set up once by _init_worker
+_worker_cells = None
+
+
+def confusion_matrices(y_true, y_pred, groups, n_classes, n_groups, weights=None):
+    """
+    Confusion matrix of every group in one bincount
+
+    Args:
+        y_true, y_pred: integer class codes
+        groups: integer group codes
+        weights: optional per-row weights (e.g. bootstrap draws)
+
+    Returns:
+        array of shape (n_groups, n_classes, n_classes), rows = actual
+    """
+    cells = (groups * n_classes + y_true) * n_classes + y_pred
+    counts = np.bincount(cells, weights=weights, minlength=n_groups * n_classes * n_classes)
+    return counts.reshape(n_groups, n_classes, n_classes)
+
+
+def metrics_from_confusion(cm):
+    """
+    Accuracy, F1 and per-class precision/recall from confusion matrices
+
+    Works on any leading shape (..., n_classes, n_classes). Weighted F1
+    matches f1_score(average='weighted'); macro F1 averages the classes
+    that occur in the group's labels or predictions, like sklearn.
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    n = support.sum(axis=-1)
+    present = (support + predicted) > 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.nan_to_num(tp / predicted)
+        recall = np.nan_to_num(tp / support)
+        f1 = np.nan_to_num(2 * tp / (support + predicted))
+        accuracy = tp.sum(axis=-1) / n
+        f1_weighted = (f1 * support).sum(axis=-1) / n
+        f1_macro = (f1 * present).sum(axis=-1) / present.sum(axis=-1)
+
+    return {
+        'n': n,
+        'accuracy': accuracy,
+        'f1_score': f1_weighted,
+        'f1_macro': f1_macro,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'support': support
+    }
+
+
+def group_codes(X, name, region_prefix='region_'):
+    """
+    Integer group codes and labels for one grouping of the rows of X
+
+    'region' is recovered from the one-hot region_* columns (rows with no
+    region set are grouped as 'unknown'); any other name is a column of X.
+    """
+    if name == 'region' and 'region' not in X.columns:
+        columns = [column for column in X.columns if column.startswith(region_prefix)]
+        one_hot = X[columns].to_numpy(dtype=np.float32)
+        codes = one_hot.argmax(axis=1)
+        labels = [column[len(region_prefix):] for column in columns]
+        unknown = one_hot.max(axis=1) == 0
+        if unknown.any():
+            codes[unknown] = len(labels)
+            labels.append('unknown')
+        return codes, labels
+
+    categorical = pd.Categorical(X[name])
+    codes = categorical.codes.astype(np.intp)
+    labels = list(categorical.categories)
+    if (codes < 0).any():
+        codes[codes < 0] = len(labels)
+        labels.append('missing')
+    return codes, labels
+
+
+def _init_worker(cells):
+    """Receive the (group, actual, predicted) cell index of every row once per worker"""
+    global _worker_cells
+    _worker_cells = cells
+
+
+def _bootstrap_counts(seeds):
+    """Poisson-bootstrap cell counts, one replicate per seed"""
+    n_rows = len(next(iter(_worker_cells.values()))[0])
+    counts = {name: np.empty((len(seeds), size)) for name, (_, size) in _worker_cells.items()}
+    for replicate, seed in enumerate(seeds):
+        weights = np.random.default_rng(seed).poisson(1.0, n_rows)
+        for name, (cells, size) in _worker_cells.items():
+            counts[name][replicate] = np.bincount(cells, weights=weights, minlength=size)
+    return counts
+
+
+def bootstrap_confusion(cells, n_bootstrap, seed=42, n_jobs=1):
+    """
+    Bootstrap replicates of every grouping's confusion-matrix cell counts
+
+    Args:
+        cells: dict of name -> (cell index per row, number of cells)
+        n_bootstrap: number of replicates
+        seed: root seed; each replicate gets its own spawned stream, so
+            results don't depend on n_jobs
+        n_jobs: worker processes (1 runs in this process)
+
+    Returns:
+        dict of name -> array (n_bootstrap, number of cells)
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_bootstrap)
+    n_tasks = min(n_bootstrap, max(n_jobs, 1) * 4)
+    tasks = [list(part) for part in np.array_split(np.array(seeds, dtype=object), n_tasks)]
+
+    if n_jobs == 1:
+        _init_worker(cells)
+        parts = [_bootstrap_counts(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(cells,)) as executor:
+            parts = list(executor.map(_bootstrap_counts, tasks))
+
+    return {name: np.concatenate([part[name] for part in parts]) for name in cells}
+
+
+def evaluate_predictions(y_true, y_pred, classes=None, groups=None, n_bootstrap=0,
+                         confidence=0.95, n_jobs=1, seed=42):
+    """
+    Overall and per-group metrics for one set of predictions
+
+    Args:
+        y_true, y_pred: actual and predicted labels
+        classes: label order, defaults to the sorted union of both
+        groups: dict of grouping name -> (integer codes per row, group labels)
+        n_bootstrap: bootstrap replicates for confidence intervals (0 = none)
+        confidence: confidence level of the intervals
+        n_jobs: worker processes for the bootstrap, -1 for all CPUs
+        seed: bootstrap seed
+
+    Returns:
+        dict with 'overall' metrics (including the confusion matrix and a
+        per-class report DataFrame), 'groups' (one DataFrame per grouping
+        with n, accuracy, f1_score, f1_macro and, with bootstrapping,
+        *_low/*_high interval columns) and 'confusion_matrices' (one
+        {group label: matrix} dict per grouping)
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    if classes is None:
+        classes = np.union1d(y_true, y_pred)
+    classes = np.asarray(classes)
+    n_classes = len(classes)
+    true_codes = np.searchsorted(classes, y_true)
+    pred_codes = np.searchsorted(classes, y_pred)
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    groupings = {'overall': (np.zeros(len(y_true), dtype=np.intp), ['all'])}
+    groupings.update(groups or {})
+
+    cells, matrices = {}, {}
+    for name, (codes, labels) in groupings.items():
+        n_groups = len(labels)
+        size = n_groups * n_classes * n_classes
+        cells[name] = ((np.asarray(codes) * n_classes + true_codes) * n_classes + pred_codes, size)
+        matrices[name] = confusion_matrices(true_codes, pred_codes, np.asarray(codes),
+                                            n_classes, n_groups)
+
+    intervals = {}
+    if n_bootstrap:
+        replicates = bootstrap_confusion(cells, n_bootstrap, seed, n_jobs)
+        tail = (1 - confidence) / 2 * 100
+        for name, (codes, labels) in groupings.items():
+            metrics = metrics_from_confusion(
+                replicates[name].reshape(n_bootstrap, len(labels), n_classes, n_classes))
+            intervals[name] = {
+                metric: np.nanpercentile(metrics[metric], [tail, 100 - tail], axis=0)
+                for metric in GROUP_METRICS
+            }
+
+    tables = {}
+    for name, (codes, labels) in groupings.items():
+        metrics = metrics_from_confusion(matrices[name])
+        table = pd.DataFrame({'n': metrics['n'].astype(np.int64)}, index=pd.Index(labels, name=name))
+        for metric in GROUP_METRICS:
+            table[metric] = metrics[metric]
+            if name in intervals:
+                table[f'{metric}_low'], table[f'{metric}_high'] = intervals[name][metric]
+        tables[name] = table
+
+    overall_cm = matrices['overall'][0]
+    metrics = metrics_from_confusion(overall_cm)
+    overall = {
+        'n': int(metrics['n']),
+        'accuracy': float(metrics['accuracy']),
+        'f1_score': float(metrics['f1_score']),
+        'f1_macro': float(metrics['f1_macro']),
+        'confusion_matrix': overall_cm.astype(np.int64),
+        'report': pd.DataFrame({
+            'precision': metrics['precision'],
+            'recall': metrics['recall'],
+            'f1': metrics['f1'],
+            'support': metrics['support'].astype(np.int64)
+        }, index=pd.Index(classes, name='class'))
+    }
+    if n_bootstrap:
+        row = tables['overall'].iloc[0]
+        overall['intervals'] = {metric: (float(row[f'{metric}_low']), float(row[f'{metric}_high']))
+                                for metric in GROUP_METRICS}
+
+    return {
+        'classes': list(classes),
+        'overall': overall,
+        'groups': {name: table for name, table in tables.items() if name != 'overall'},
+        'confusion_matrices': {
+            name: dict(zip(labels, matrices[name].astype(np.int64)))
+            for name, (_, labels) in groupings.items() if name != 'overall'
+        }
+    }
+
+
+def evaluate_model(model, X, y, group_by=('region', 'month'), n_bootstrap=0, confidence=0.95,
+                   n_jobs=1, seed=42, y_pred=None):
+    """
+    Score X once and evaluate the predictions overall and per group
+
+    Args:
+        model: fitted classifier (sklearn forest, CompiledForest, ...)
+        X: encoded feature DataFrame, as from MalariaDataLoader.preprocess_data
+        y: actual labels
+        group_by: groupings to report ('region' is read from the one-hot columns)
+        y_pred: precomputed predictions, to skip scoring
+
+    Returns:
+        evaluate_predictions() result plus 'predictions'
+    """
+    if y_pred is None:
+        y_pred = model.predict(X)
+
+    groups = {name: group_codes(X, name) for name in group_by}
+    results = evaluate_predictions(y, y_pred, classes=getattr(model, 'classes_', None),
+                                   groups=groups, n_bootstrap=n_bootstrap,
+                                   confidence=confidence, n_jobs=n_jobs, seed=seed)
+    results['predictions'] = y_pred
+    return results
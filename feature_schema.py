@@ -0,0 +1,154 @@
+"""
+Precompiled mapping from raw records to the model's feature layout.
+
+Built once from the saved feature_names, a FeatureSchema writes raw records
+(with a 'region' string) or already-encoded rows straight into preallocated
+float32 NumPy rows, without building a DataFrame per request. The region
+one-hot columns follow preprocess_data's 'region_<name>' naming. It is
+shared by the dashboard, MalariaPredictor and the batch scorers.
+"""
+import numpy as np
+
+MISSING_POLICIES = ('zero', 'error')
+UNKNOWN_REGION_POLICIES = ('error', 'ignore')
+
+
+class FeatureSchema:
+    """Column index and encoding rules for one trained model"""
+
+    def __init__(self, feature_names, missing='zero', unknown_region='error',
+                 region_prefix='region_'):
+        """
+        Args:
+            feature_names: training columns in model order
+            missing: 'zero' fills absent or NaN fields with 0 (what reindexing
+                used to do); 'error' raises ValueError naming the fields
+            unknown_region: 'error' raises ValueError for regions the model was
+                not trained on; 'ignore' leaves every region column at 0
+            region_prefix: prefix of the one-hot region columns
+        """
+        if missing not in MISSING_POLICIES:
+            raise ValueError(f"missing must be one of {MISSING_POLICIES}")
+        if unknown_region not in UNKNOWN_REGION_POLICIES:
+            raise ValueError(f"unknown_region must be one of {UNKNOWN_REGION_POLICIES}")
+
+        self.feature_names = list(feature_names)
+        self.missing = missing
+        self.unknown_region = unknown_region
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        self.region_columns = {
+            name[len(region_prefix):]: i for i, name in enumerate(self.feature_names)
+            if name.startswith(region_prefix)
+        }
+        self.regions = list(self.region_columns)
+        self.numeric_columns = [(name, i) for i, name in enumerate(self.feature_names)
+                                if not name.startswith(region_prefix)]
+        self._region_column_names = [(name, i) for i, name in enumerate(self.feature_names)
+                                     if name.startswith(region_prefix)]
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def _missing(self, fields):
+        """Apply the missing-field policy"""
+        if fields and self.missing == 'error':
+            raise ValueError(f"Missing feature values: {sorted(set(fields))}")
+
+    def _unknown(self, regions):
+        """Apply the unknown-region policy"""
+        if regions and self.unknown_region == 'error':
+            raise ValueError(f"Unknown region(s) {sorted(set(map(str, regions)))}; "
+                             f"expected one of {self.regions}")
+
+    def transform_record(self, record, out=None):
+        """
+        Encode one record into a float32 row
+
+        Args:
+            record: dict of raw fields with a 'region' name, or with the
+                region_* one-hot columns already encoded
+            out: optional preallocated float32 row to write into
+        """
+        row = np.zeros(self.n_features, dtype=np.float32) if out is None else out
+        row[:] = 0
+        missing = []
+
+        columns = self.numeric_columns
+        region = record.get('region')
+        if region is None:
+            # Fall back to pre-encoded one-hot columns
+            columns = columns + self._region_column_names
+            if 'region' in record:
+                missing.append('region')
+        elif region in self.region_columns:
+            row[self.region_columns[region]] = 1
+        else:
+            self._unknown([region])
+
+        for name, i in columns:
+            value = record.get(name)
+            if value is None or value != value:
+                missing.append(name)
+            else:
+                row[i] = value
+
+        self._missing(missing)
+        return row
+
+    def transform_records(self, records):
+        """Encode a list of records into a float32 matrix"""
+        matrix = np.empty((len(records), self.n_features), dtype=np.float32)
+        for record, row in zip(records, matrix):
+            self.transform_record(record, out=row)
+        return matrix
+
+    def transform_frame(self, frame):
+        """Encode a DataFrame column by column into a float32 matrix"""
+        matrix = np.zeros((len(frame), self.n_features), dtype=np.float32)
+        missing = []
+
+        columns = self.numeric_columns
+        if 'region' in frame.columns:
+            regions = frame['region']
+            known = regions.isin(self.regions).to_numpy()
+            if not known.all():
+                unknown = regions[~known]
+                if unknown.isna().any():
+                    missing.append('region')
+                self._unknown(list(unknown.dropna().unique()))
+            rows = np.flatnonzero(known)
+            matrix[rows, regions[known].map(self.region_columns).to_numpy(dtype=np.intp)] = 1
+        else:
+            columns = columns + self._region_column_names
+
+        for name, i in columns:
+            if name not in frame.columns:
+                missing.append(name)
+                continue
+            values = frame[name].to_numpy(dtype=np.float32, na_value=np.nan)
+            nan_mask = np.isnan(values)
+            if nan_mask.any():
+                missing.append(name)
+                values = np.where(nan_mask, 0, values)
+            matrix[:, i] = values
+
+        self._missing(missing)
+        return matrix
+
+    def transform(self, data):
+        """Encode a dict, list of dicts, DataFrame or 2D array into a float32 matrix"""
+        if isinstance(data, dict):
+            return self.transform_record(data)[None, :]
+        if isinstance(data, (list, tuple)):
+            return self.transform_records(data)
+        if isinstance(data, np.ndarray):
+            matrix = np.atleast_2d(data)
+            if matrix.shape[1] != self.n_features:
+                raise ValueError(
+                    f"Expected {self.n_features} feature columns, got {matrix.shape[1]}"
+                )
+            return np.ascontiguousarray(matrix, dtype=np.float32)
+        if hasattr(data, 'columns'):
+            return self.transform_frame(data)
+        raise TypeError(f"Unsupported input type: {type(data).__name__}")
@@ -0,0 +1,423 @@
+"""
+Flat-array inference engine for fitted RandomForestClassifier models.
+
+All trees of the forest are concatenated into one set of NumPy node arrays
+(feature, threshold, children, leaf values) so that a whole batch can be
+pushed through every tree at once with vectorized indexing, skipping
+sklearn's per-call validation, joblib dispatch and per-tree Python loops.
+"""
+import os
+import json
+import hashlib
+import numpy as np
+import joblib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Version of the memory-mappable artifact layout written by save_forest_arrays;
+# version 1 artifacts lack the derived lookup tables, which are rebuilt on load
+ARTIFACT_FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+MANIFEST_NAME = 'manifest.json'
+ARRAY_NAMES = ('feature', 'threshold', 'children_left', 'children_right', 'value', 'roots')
+# Lookup tables derived from the node arrays, stored so workers map them too
+DERIVED_ARRAY_NAMES = ('children', 'threshold32')
+
+
+class CompiledForest:
+    """Random forest flattened into NumPy node arrays for vectorized inference"""
+
+    def __init__(self, feature, threshold, children_left, children_right, value,
+                 roots, classes, n_features, max_depth, chunk_size=1024,
+                 children=None, threshold32=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.max_depth = int(max_depth)
+        self.chunk_size = chunk_size
+        self._prepare(children, threshold32)
+
+    def _prepare(self, children=None, threshold32=None):
+        """
+        Set up the derived lookup tables used by apply
+
+        Tables passed in (e.g. mapped from an artifact) are used as they are,
+        so processes mapping the same files share their pages; only missing
+        ones are built here.
+        """
+        if children is None:
+            # Interleaved (left, right) table: one gather per level instead of two plus np.where
+            children = np.stack([self.children_left, self.children_right], axis=1).ravel()
+        self._children = children
+
+        if threshold32 is None:
+            # Inputs are float32, so x <= t is equivalent to x <= (largest float32 <= t);
+            # comparing in float32 avoids upcasting every gathered value
+            threshold = self.threshold
+            threshold32 = threshold.astype(np.float32)
+            rounded_up = threshold32.astype(np.float64) > threshold
+            threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+        self._threshold32 = threshold32
+
+        # Per-leaf path contributions, built on the first contributions() call
+        self._path_contributions = None
+
+    def __getstate__(self):
+        # The lookup tables are cheap to rebuild, so keep them out of pickles
+        state = dict(self.__dict__)
+        del state['_children'], state['_threshold32'], state['_path_contributions']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._prepare()
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model, chunk_size=1024):
+        """
+        Flatten a fitted RandomForestClassifier
+
+        Leaves point back to themselves, so every sample can take exactly
+        max_depth steps without branching on whether it already reached a leaf.
+        """
+        if hasattr(model, 'estimators_'):
+            estimators = model.estimators_
+        elif hasattr(model, 'tree_'):
+            # A single DecisionTreeClassifier compiles as a one-tree forest
+            estimators = [model]
+        else:
+            raise TypeError(f"Cannot compile {type(model).__name__}; "
+                            f"expected a fitted random forest or decision tree")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+
+            left = np.where(is_leaf, node_ids, tree.children_left + offset)
+            right = np.where(is_leaf, node_ids, tree.children_right + offset)
+
+            # Per-node class distribution, normalized like DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            value /= value.sum(axis=1, keepdims=True)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children_left=np.concatenate(lefts).astype(np.int32),
+            children_right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_,
+            max_depth=max(estimator.tree_.max_depth for estimator in estimators),
+            chunk_size=chunk_size
+        )
+
+    def apply(self, X, depth=None):
+        """
+        Return the leaf node index reached in every tree, shape (n_samples, n_trees)
+
+        With depth, stop after that many levels and return the node reached
+        there, as if every tree had been cut at that depth.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_samples) * n_features)[:, None]
+        nodes = np.repeat(self.roots[None, :], n_samples, axis=0)
+
+        for _ in range(self.max_depth if depth is None else min(depth, self.max_depth)):
+            go_right = flat_X[row_offsets + self.feature[nodes]] > self._threshold32[nodes]
+            nodes = self._children[2 * nodes + go_right]
+
+        return nodes
+
+    def predict_proba(self, X):
+        """Average the leaf class distributions over all trees"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        probability = np.empty((X.shape[0], len(self.classes_)))
+
+        for start in range(0, X.shape[0], self.chunk_size):
+            stop = start + self.chunk_size
+            leaves = self.apply(X[start:stop])
+            probability[start:stop] = self.value[leaves].mean(axis=1)
+
+        return probability
+
+    def predict(self, X):
+        """Predict class labels as the argmax of predict_proba"""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def _leaf_contributions(self):
+        """
+        Feature contributions accumulated from each tree's root to every leaf
+
+        Walking down a split on feature f from node n to child c adds
+        value[c] - value[n] to f's contribution (Saabas' decomposition), so
+        a leaf's table row sums to value[leaf] - value[root]. The tables are
+        built one tree level at a time for all trees together.
+
+        Returns:
+            (row of each node in the table, -1 for internal nodes;
+            table of shape (n_leaves, n_features, n_classes))
+        """
+        if self._path_contributions is not None:
+            return self._path_contributions
+
+        node_ids = np.arange(self.n_nodes)
+        is_leaf = self.children_left == node_ids
+        leaf_row = np.full(self.n_nodes, -1, dtype=np.int64)
+        leaf_row[is_leaf] = np.arange(is_leaf.sum())
+        table = np.zeros((is_leaf.sum(), self.n_features_in_, len(self.classes_)))
+
+        level = np.asarray(self.roots, dtype=np.int64)
+        contribution = np.zeros((len(level), self.n_features_in_, len(self.classes_)))
+        while len(level):
+            at_leaf = is_leaf[level]
+            table[leaf_row[level[at_leaf]]] = contribution[at_leaf]
+
+            parents = level[~at_leaf]
+            inherited = contribution[~at_leaf]
+            level = np.concatenate([self.children_left[parents], self.children_right[parents]])
+            parents = np.concatenate([parents, parents])
+            contribution = np.concatenate([inherited, inherited])
+            contribution[np.arange(len(level)), self.feature[parents]] += \
+                self.value[level] - self.value[parents]
+
+        self._path_contributions = (leaf_row, table)
+        return self._path_contributions
+
+    def contributions(self, X):
+        """
+        Decompose every prediction into a bias and per-feature contributions
+
+        For each tree, the leaf's class distribution equals the root's plus
+        the changes made by each split on the path to it; grouping those
+        changes by split feature and averaging over the trees gives, for
+        every row, bias + contributions.sum(axis=1) == predict_proba(X).
+        Rows are processed in chunks with one apply() and one table gather
+        each.
+
+        Returns:
+            (bias of shape (n_classes,), contributions of shape
+            (n_samples, n_features, n_classes))
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        leaf_row, table = self._leaf_contributions()
+        bias = np.asarray(self.value[self.roots]).mean(axis=0)
+        contributions = np.empty((X.shape[0], self.n_features_in_, len(self.classes_)))
+
+        for start in range(0, X.shape[0], self.chunk_size):
+            stop = start + self.chunk_size
+            rows = leaf_row[self.apply(X[start:stop])]
+            contributions[start:stop] = table[rows].sum(axis=1) / self.n_estimators
+
+        return bias, contributions
+
+    def node_depths(self):
+        """Depth of every node below its tree's root"""
+        depth = np.full(self.n_nodes, -1, dtype=np.int32)
+        level = np.asarray(self.roots)
+        for d in range(self.max_depth + 1):
+            depth[level] = d
+            level = level[self.children_left[level] != level]
+            level = np.concatenate([self.children_left[level], self.children_right[level]])
+        return depth
+
+    def split_frequencies(self):
+        """Share of split nodes that test each feature; leaves are not counted"""
+        split = self.children_left != np.arange(self.n_nodes)
+        counts = np.bincount(self.feature[split], minlength=self.n_features_in_)
+        return counts / max(counts.sum(), 1)
+
+    def subset(self, trees=None, max_depth=None):
+        """
+        Return a smaller forest with only some trees, each cut at max_depth
+
+        Nodes at the cut depth become leaves predicting their own class
+        distribution, and nodes below it are dropped from the arrays.
+
+        Args:
+            trees: indices of the trees to keep, in order (all if None)
+            max_depth: depth at which to cut every tree (no cut if None)
+        """
+        trees = np.arange(self.n_estimators) if trees is None else np.asarray(trees)
+        max_depth = self.max_depth if max_depth is None else min(max_depth, self.max_depth)
+
+        depth = self.node_depths()
+        tree_of_node = np.repeat(np.arange(self.n_estimators),
+                                 np.diff(np.append(self.roots, self.n_nodes)))
+        keep = depth <= max_depth
+        # Old node indices, grouped by tree in the requested order
+        old = np.concatenate([np.flatnonzero(keep & (tree_of_node == t)) for t in trees])
+
+        new_index = np.full(self.n_nodes, -1, dtype=np.int32)
+        new_index[old] = np.arange(len(old), dtype=np.int32)
+        node_ids = new_index[old]
+        left = new_index[self.children_left[old]]
+        right = new_index[self.children_right[old]]
+        feature = self.feature[old].copy()
+
+        cut = left < 0
+        left[cut] = right[cut] = node_ids[cut]
+        feature[cut] = 0
+
+        return CompiledForest(
+            feature=feature,
+            threshold=np.asarray(self.threshold[old]),
+            children_left=left,
+            children_right=right,
+            value=np.asarray(self.value[old]),
+            roots=new_index[self.roots[trees]],
+            classes=self.classes_,
+            n_features=self.n_features_in_,
+            max_depth=depth[old].max() if len(old) else 0,
+            chunk_size=self.chunk_size
+        )
+
+
+def load_compiled_forest(filepath='malaria_model.pkl', chunk_size=1024):
+    """
+    Load a model saved by MalariaModelTrainer.save_model and compile it
+
+    Returns:
+        (CompiledForest, feature_names, risk_levels)
+    """
+    model_data = joblib.load(filepath)
+    forest = CompiledForest.from_sklearn(model_data['model'], chunk_size=chunk_size)
+    logger.info(f"Compiled {forest.n_estimators} trees "
+                f"({len(forest.feature)} nodes) from {filepath}")
+    return forest, model_data['feature_names'], model_data['risk_levels']
+
+
+def _file_sha256(path):
+    """Return the hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _replace_atomically(path, write):
+    """Write through a temporary file and rename it over path"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def save_forest_arrays(forest, dirpath, feature_names, risk_levels, reference_profile=None):
+    """
+    Save a CompiledForest as uncompressed .npy arrays plus a JSON manifest
+
+    The arrays can be opened with mmap_mode='r', so worker processes share
+    the pages through the OS page cache instead of each unpickling a copy.
+    Every file is written under a temporary name and renamed into place,
+    with the manifest last, so processes that still map the previous arrays
+    keep reading the old files. The derived lookup tables apply() walks are
+    saved alongside the node arrays, so they are shared the same way rather
+    than rebuilt on each worker's heap. An optional drift reference profile
+    (DriftProfile.to_dict) is stored in the manifest.
+    """
+    os.makedirs(dirpath, exist_ok=True)
+
+    derived = {'children': forest._children, 'threshold32': forest._threshold32}
+    arrays = {}
+    for name in ARRAY_NAMES + DERIVED_ARRAY_NAMES:
+        array = np.ascontiguousarray(derived[name] if name in derived else getattr(forest, name))
+        filename = f"{name}.npy"
+        path = os.path.join(dirpath, filename)
+        _replace_atomically(path, lambda f: np.save(f, array, allow_pickle=False))
+        arrays[name] = {
+            'file': filename,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'sha256': _file_sha256(path)
+        }
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'feature_names': list(feature_names),
+        'risk_levels': list(risk_levels),
+        'classes': [str(c) for c in forest.classes_],
+        'n_features': forest.n_features_in_,
+        'max_depth': forest.max_depth,
+        'reference_profile': reference_profile,
+        'arrays': arrays,
+        'checksum': hashlib.sha256(
+            ''.join(arrays[name]['sha256'] for name in ARRAY_NAMES + DERIVED_ARRAY_NAMES).encode()
+        ).hexdigest()
+    }
+    _replace_atomically(os.path.join(dirpath, MANIFEST_NAME),
+                        lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    logger.info(f"Saved memory-mappable forest to {dirpath}")
+    return manifest
+
+
+def load_forest_arrays(dirpath, mmap_mode='r', verify=True, chunk_size=1024):
+    """
+    Open a forest written by save_forest_arrays
+
+    Args:
+        dirpath: artifact directory containing manifest.json
+        mmap_mode: passed to np.load; 'r' maps the arrays read-only, None reads them
+        verify: check the format version, array checksums and shapes before mapping
+
+    Returns:
+        (CompiledForest, manifest)
+    """
+    with open(os.path.join(dirpath, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported model artifact format: {manifest.get('format_version')}")
+
+    # Version 1 artifacts have no derived tables; CompiledForest builds them
+    names = ARRAY_NAMES + (DERIVED_ARRAY_NAMES if manifest['format_version'] >= 2 else ())
+    arrays = {}
+    for name in names:
+        spec = manifest['arrays'][name]
+        path = os.path.join(dirpath, spec['file'])
+        if verify and _file_sha256(path) != spec['sha256']:
+            raise ValueError(f"Checksum mismatch for {path}; the artifact is corrupt or incomplete")
+
+        arrays[name] = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        if verify and (list(arrays[name].shape) != spec['shape']
+                       or arrays[name].dtype.str != spec['dtype']):
+            raise ValueError(f"{path} does not match the manifest")
+
+    forest = CompiledForest(
+        classes=np.asarray(manifest['classes']),
+        n_features=manifest['n_features'],
+        max_depth=manifest['max_depth'],
+        chunk_size=chunk_size,
+        **arrays
+    )
+    return forest, manifest
@@ -0,0 +1,263 @@
+"""
+Lightweight instrumentation for the predictor, trainer and scoring service.
+
+Timing spans feed per-stage latency histograms, counters track call volume,
+and both export in the Prometheus text format. cProfile can be switched on
+for a single call or for a random sample of calls. Instrumentation is off
+by default: span() then returns a shared no-op context manager, so an
+instrumented hot path costs one attribute check per stage.
+
+Enable it with the MALARIA_INSTRUMENTATION=1 environment variable or
+instrumentation.configure(enabled=True).
+"""
+import os
+import io
+import time
+import random
+import bisect
+import cProfile
+import pstats
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans range from microsecond feature encoding to minute-long fits
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+SPAN_METRIC = 'malaria_span_seconds'
+
+_NULL_CONTEXT = nullcontext()
+
+
+def _label_text(labels):
+    """Render a sorted label tuple as {name="value",...}"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Thread-safe counters and fixed-bucket histograms"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        """Set the # HELP line of a metric"""
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record one value in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        """Return counters and histogram count/sum/mean as a JSON-serializable dict"""
+        with self._lock:
+            counters = {name + _label_text(labels): value
+                        for (name, labels), value in self._counters.items()}
+            histograms = {
+                name + _label_text(labels): {'count': count, 'sum': total,
+                                             'mean': total / count if count else 0.0}
+                for (name, labels), (_, total, count) in self._histograms.items()
+            }
+        return {'counters': counters, 'histograms': histograms}
+
+    def export_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), total, count))
+                                for key, (counts, total, count) in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (('le', bound),)
+                lines.append(f"{name}_bucket{_label_text(bucket_labels)} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class _Span:
+    """Times a block into the span histogram"""
+
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(SPAN_METRIC, time.perf_counter() - self.start, span=self.name)
+        return False
+
+
+class _Profile:
+    """Runs cProfile around a block and hands the result to the Instrumentation"""
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            self.profiler = None
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self.profiler is not None:
+                self.profiler.disable()
+                self.owner._record_profile(self.name, self.profiler)
+        finally:
+            # A failed export must not leave sampling off for the rest of the process
+            self.owner._profile_lock.release()
+        return False
+
+
+class Instrumentation:
+    """Spans, counters and sampled cProfile runs, all no-ops while disabled"""
+
+    def __init__(self, enabled=False, profile_rate=0.0, profile_dir=None, max_profiles=20,
+                 registry=None, seed=None):
+        """
+        Args:
+            enabled: record spans and counters
+            profile_rate: fraction of profiled() calls to run under cProfile
+                while enabled (0 = only calls made with force=True)
+            profile_dir: optional directory receiving a .prof file per profile
+            max_profiles: number of recent profile summaries kept in memory
+            registry: MetricsRegistry to record into
+            seed: seed of the profile sampler
+        """
+        self.registry = registry or MetricsRegistry()
+        self.registry.describe(SPAN_METRIC, "Time spent in instrumented stages")
+        self.enabled = enabled
+        self.profile_rate = profile_rate
+        self.profile_dir = profile_dir
+        self.profiles = deque(maxlen=max_profiles)
+        self._random = random.Random(seed)
+        # cProfile supports one active profiler per process on recent Pythons
+        self._profile_lock = threading.Lock()
+        self._profile_count = 0
+
+    def configure(self, enabled=None, profile_rate=None, profile_dir=None):
+        """Change settings at runtime; None leaves a setting unchanged"""
+        if enabled is not None:
+            self.enabled = enabled
+        if profile_rate is not None:
+            self.profile_rate = profile_rate
+        if profile_dir is not None:
+            self.profile_dir = profile_dir
+
+    def span(self, name):
+        """Context manager timing a stage into malaria_span_seconds{span=name}"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Span(self.registry, name)
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if self.enabled:
+            self.registry.inc(name, amount, **labels)
+
+    def profiled(self, name, force=False):
+        """
+        Context manager running cProfile around a call
+
+        Profiles when force is True, or for a profile_rate sample of calls
+        while enabled. Calls that overlap a running profile are not profiled.
+        """
+        if not force and not (self.enabled and self.profile_rate
+                              and self._random.random() < self.profile_rate):
+            return _NULL_CONTEXT
+        if not self._profile_lock.acquire(blocking=False):
+            return _NULL_CONTEXT
+        return _Profile(self, name)
+
+    def _record_profile(self, name, profiler, top=20):
+        """Keep a text summary of a finished profile and optionally dump it"""
+        self._profile_count += 1
+        path = None
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir,
+                                f"{name}-{int(time.time())}-{self._profile_count}.prof")
+            profiler.dump_stats(path)
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        self.profiles.append({'name': name, 'time': time.time(), 'path': path,
+                              'summary': out.getvalue()})
+        if self.enabled:
+            self.registry.inc('malaria_profiles_total', span=name)
+
+    def export_prometheus(self):
+        return self.registry.export_prometheus()
+
+    def snapshot(self):
+        return self.registry.snapshot()
+
+    def clear(self):
+        self.registry.clear()
+        self.profiles.clear()
+
+
+# Process-wide instrumentation shared by the predictor, trainer and service
+instrumentation = Instrumentation(
+    enabled=os.environ.get('MALARIA_INSTRUMENTATION', '') not in ('', '0'),
+    profile_rate=float(os.environ.get('MALARIA_PROFILE_RATE', 0) or 0),
+    profile_dir=os.environ.get('MALARIA_PROFILE_DIR') or None
+)
@@ -0,0 +1,146 @@
+"""
+Local load test for the scoring service.
+
+Opens a number of keep-alive connections to a running scoring_service.py and
+sends single-record /predict requests as fast as each connection allows,
+then reports client-side latency, throughput and the service's own metrics.
+
+Usage:
+    python scoring_service.py --port 8080 &
+    python load_test.py --port 8080 --requests 5000 --concurrency 64
+"""
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+SAMPLE_RECORD = {
+    'avg_temperature': 30,
+    'rainfall': 120,
+    'humidity': 85,
+    'population_density': 200,
+    'healthcare_access': 0.3,
+    'historical_cases': 75,
+    'month': 6,
+    'region': 'Region_A'
+}
+
+
+class HttpConnection:
+    """Tiny keep-alive HTTP/1.1 JSON client"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, payload=None):
+        """Send one request and return (status, decoded JSON body or text)"""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        body = b'' if payload is None else json.dumps(payload).encode()
+        self._writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        response = await self._reader.readexactly(int(headers['content-length']))
+
+        if headers.get('connection') == 'close':
+            await self.close()
+        if headers.get('content-type', '').startswith('application/json'):
+            return status, json.loads(response)
+        return status, response.decode()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def run_load_test(host='127.0.0.1', port=8080, n_requests=2000, concurrency=32,
+                        record=None, seed=0):
+    """
+    Fire n_requests single-record predictions over `concurrency` connections
+
+    Records are jittered around SAMPLE_RECORD so the service scores real
+    batches of distinct rows.
+
+    Returns:
+        dict with client latency percentiles, throughput, errors and the
+        service's /metrics snapshot
+    """
+    record = record or SAMPLE_RECORD
+    rng = np.random.default_rng(seed)
+    latencies = []
+    errors = 0
+    remaining = iter(range(n_requests))
+
+    async def client():
+        nonlocal errors
+        connection = HttpConnection(host, port)
+        try:
+            for _ in remaining:
+                payload = dict(record,
+                               avg_temperature=float(record['avg_temperature'] + rng.normal(0, 3)),
+                               rainfall=float(max(record['rainfall'] + rng.normal(0, 30), 0)))
+                start = time.perf_counter()
+                status, _ = await connection.request('POST', '/predict', payload)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            await connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    metrics_connection = HttpConnection(host, port)
+    _, service_metrics = await metrics_connection.request('GET', '/metrics')
+    await metrics_connection.close()
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': elapsed,
+        'requests_per_sec': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'service': service_metrics
+    }
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Load test a running scoring service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_load_test(args.host, args.port, args.requests, args.concurrency))
+
+    print(f"\n🚀 {results['requests']} requests, {results['errors']} errors "
+          f"in {results['seconds']:.2f}s ({results['requests_per_sec']:,.0f} req/s)")
+    print(f"Client latency: p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms")
+    print(f"Service metrics: {json.dumps(results['service'], indent=2)}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
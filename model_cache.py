@@ -0,0 +1,83 @@
+"""
+Process-wide cache of loaded model files.
+
+Streamlit reruns the whole script on every widget change and every session
+builds its own app object, so without a shared cache each slider move would
+unpickle the model again. Entries are keyed on the absolute path and the
+file's modification time, so a retrained model is picked up on the next
+lookup without restarting the process.
+"""
+import os
+import time
+import threading
+import logging
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """Thread-safe cache of model files keyed on path and modification time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.load_count = 0
+        self.total_load_time = 0.0
+        self.last_load_time = None
+
+    def get(self, filepath, loader=joblib.load):
+        """
+        Return the model data stored at filepath, loading it only when needed
+
+        Args:
+            filepath: model file, or artifact directory
+            loader: function reading the model data from the path
+
+        Raises:
+            FileNotFoundError: if filepath does not exist
+        """
+        path = os.path.abspath(filepath)
+        mtime = os.stat(path).st_mtime_ns
+
+        # Loading under the lock means concurrent sessions wait for one load
+        # instead of each unpickling their own copy
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                return entry[1]
+
+            start = time.perf_counter()
+            model_data = loader(path)
+            elapsed = time.perf_counter() - start
+
+            self._entries[path] = (mtime, model_data)
+            self.load_count += 1
+            self.total_load_time += elapsed
+            self.last_load_time = elapsed
+
+        logger.info(f"Loaded model from {path} in {elapsed * 1000:.1f} ms "
+                    f"(load #{self.load_count} in this process)")
+        return model_data
+
+    def stats(self):
+        """Return load count and timings for this process"""
+        with self._lock:
+            return {
+                'load_count': self.load_count,
+                'total_load_time': self.total_load_time,
+                'last_load_time': self.last_load_time,
+                'cached_models': len(self._entries)
+            }
+
+    def clear(self):
+        """Drop all cached models and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.load_count = 0
+            self.total_load_time = 0.0
+            self.last_load_time = None
+
+
+# Shared by every predictor and Streamlit session in the process
+model_cache = ModelCache()
@@ -0,0 +1,60 @@
+"""
+Lightweight model loading for inference.
+
+Only needs numpy and joblib, so prediction workers and batch jobs can load a
+trained model without importing the training stack (pandas, matplotlib,
+seaborn). Two formats are supported: the joblib pickle written by
+MalariaModelTrainer.save_model, and the memory-mappable artifact directory
+written by save_model(format='mmap').
+"""
+import os
+import logging
+import joblib
+from model_cache import model_cache
+from forest_engine import load_forest_arrays
+from drift import DriftProfile
+
+logger = logging.getLogger(__name__)
+
+
+def read_model_data(filepath, mmap_mode='r', verify=True):
+    """Read model data from a pickle file or a memory-mappable artifact directory"""
+    if os.path.isdir(filepath):
+        forest, manifest = load_forest_arrays(filepath, mmap_mode=mmap_mode, verify=verify)
+        return {
+            'model': forest,
+            'feature_names': manifest['feature_names'],
+            'risk_levels': manifest['risk_levels'],
+            'reference_profile': manifest.get('reference_profile')
+        }
+    return joblib.load(filepath)
+
+
+def load_model_data(filepath='malaria_model.pkl', use_cache=False):
+    """Load the model data written by MalariaModelTrainer.save_model"""
+    if use_cache:
+        return model_cache.get(filepath, loader=read_model_data)
+    return read_model_data(filepath)
+
+
+class ModelBundle:
+    """Trained model with its feature names and risk levels, ready for inference"""
+
+    def __init__(self, model=None, feature_names=None, risk_levels=None, version=None,
+                 reference_profile=None):
+        self.model = model
+        self.feature_names = feature_names
+        self.risk_levels = risk_levels or ['Low', 'Medium', 'High']
+        # Registry version name, set by ModelRegistry.load
+        self.version = version
+        # Drift-monitoring DriftProfile, None for models saved without one
+        self.reference_profile = reference_profile
+
+    @classmethod
+    def load(cls, filepath='malaria_model.pkl', use_cache=False):
+        """Load a model saved by MalariaModelTrainer.save_model"""
+        model_data = load_model_data(filepath, use_cache=use_cache)
+        logger.info(f"Model loaded from {filepath}")
+        profile = model_data.get('reference_profile')
+        return cls(model_data['model'], model_data['feature_names'], model_data['risk_levels'],
+                   reference_profile=DriftProfile.from_dict(profile) if profile else None)
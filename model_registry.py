@@ -0,0 +1,272 @@
+"""
+Versioned model registry with atomic publish and rollback.
+
+Every published model gets its own immutable directory under
+<root>/versions/<version>/, holding the artifact written by
+MalariaModelTrainer.save_model and a metadata.json. A version is assembled
+in a staging directory and renamed into place, so readers never see a half
+written artifact. The active version is named by the small CURRENT pointer
+file, which is swapped with os.replace; activating, publishing and rolling
+back only ever rewrite that pointer, and every change is appended to
+history.jsonl for auditing.
+
+MalariaPredictor(registry=...) follows CURRENT and hot-swaps models (see
+predict.py).
+
+Usage:
+    python model_registry.py publish --model malaria_model.pkl
+    python model_registry.py list
+    python model_registry.py rollback
+"""
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from model_io import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+POINTER_NAME = 'CURRENT'
+HISTORY_NAME = 'history.jsonl'
+METADATA_NAME = 'metadata.json'
+ARTIFACT_NAMES = {'pickle': 'model.pkl', 'mmap': 'model'}
+VERSION_PATTERN = re.compile(r'^v(\d+)$')
+
+
+def _write_json_atomically(path, payload):
+    """Write JSON through a temporary file in the same directory and rename it over path"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(payload, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _artifact_sha256(path):
+    """SHA-256 over an artifact file, or over every file of an artifact directory"""
+    digest = hashlib.sha256()
+    paths = [path] if os.path.isfile(path) else sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(path) for name in names)
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Directory of immutable model versions plus a pointer to the active one"""
+
+    def __init__(self, root='model_registry'):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.pointer_path = os.path.join(root, POINTER_NAME)
+        self.history_path = os.path.join(root, HISTORY_NAME)
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    def _version_numbers(self):
+        numbers = []
+        for name in os.listdir(self.versions_dir):
+            match = VERSION_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def versions(self):
+        """Published versions, oldest first"""
+        return [f"v{number:04d}" for number in self._version_numbers()]
+
+    def metadata(self, version):
+        """metadata.json of a published version"""
+        with open(os.path.join(self.versions_dir, version, METADATA_NAME)) as f:
+            return json.load(f)
+
+    def artifact_path(self, version):
+        """Path of the model artifact of a published version"""
+        return os.path.join(self.versions_dir, version,
+                            ARTIFACT_NAMES[self.metadata(version)['format']])
+
+    def current(self):
+        """Active version, or None if nothing was activated yet"""
+        try:
+            with open(self.pointer_path) as f:
+                return json.load(f)['version']
+        except FileNotFoundError:
+            return None
+
+    def pointer_token(self):
+        """Cheap change marker for CURRENT; os.replace gives the pointer a new inode"""
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _log(self, action, version, **details):
+        entry = {'time': time.time(), 'action': action, 'version': version, **details}
+        with open(self.history_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def history(self):
+        """Every publish/activate/rollback, oldest first"""
+        try:
+            with open(self.history_path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _publish(self, write, format, metrics, activate, **details):
+        """Write an artifact into a staging directory and rename it to the next version"""
+        if format not in ARTIFACT_NAMES:
+            raise ValueError(f"Unknown model format: {format}")
+
+        staging = tempfile.mkdtemp(dir=self.root, prefix='.staging-')
+        try:
+            artifact = os.path.join(staging, ARTIFACT_NAMES[format])
+            write(artifact)
+            metadata = {
+                'format': format,
+                'created': time.time(),
+                'sha256': _artifact_sha256(artifact),
+                'metrics': metrics or {},
+                'parent': self.current(),
+                **details
+            }
+
+            # Another publisher may take the same number; renaming onto an
+            # existing non-empty directory fails, so move on to the next one
+            while True:
+                numbers = self._version_numbers()
+                version = f"v{(numbers[-1] if numbers else 0) + 1:04d}"
+                metadata['version'] = version
+                _write_json_atomically(os.path.join(staging, METADATA_NAME), metadata)
+                try:
+                    os.rename(staging, os.path.join(self.versions_dir, version))
+                    break
+                except OSError:
+                    if not os.path.exists(os.path.join(self.versions_dir, version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self._log('publish', version, sha256=metadata['sha256'])
+        logger.info(f"Published model version {version}")
+        if activate:
+            self.activate(version)
+        return version
+
+    def publish(self, trainer, metrics=None, format='pickle', activate=True):
+        """
+        Publish a trained MalariaModelTrainer as a new version
+
+        Args:
+            trainer: trainer with a fitted model
+            metrics: optional evaluation metrics stored in the metadata
+            format: 'pickle' or 'mmap' (see MalariaModelTrainer.save_model)
+            activate: point CURRENT at the new version
+
+        Returns:
+            the new version name
+        """
+        return self._publish(lambda path: trainer.save_model(path, format=format),
+                             format, metrics, activate)
+
+    def publish_file(self, filepath, metrics=None, activate=True):
+        """Publish an existing model pickle or mmap artifact directory"""
+        if os.path.isdir(filepath):
+            return self._publish(lambda path: shutil.copytree(filepath, path), 'mmap',
+                                 metrics, activate, source=os.path.abspath(filepath))
+        return self._publish(lambda path: shutil.copyfile(filepath, path), 'pickle',
+                             metrics, activate, source=os.path.abspath(filepath))
+
+    def activate(self, version, action='activate'):
+        """Atomically point CURRENT at a published version"""
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version: {version}")
+        previous = self.current()
+        _write_json_atomically(self.pointer_path, {'version': version, 'time': time.time()})
+        self._log(action, version, previous=previous)
+        logger.info(f"Active model version: {version} (was {previous})")
+
+    def rollback(self, version=None):
+        """
+        Reactivate an earlier version
+
+        Args:
+            version: version to return to; defaults to the newest version
+                older than the active one
+
+        Returns:
+            the version now active
+        """
+        current = self.current()
+        if version is None:
+            versions = self.versions()
+            older = versions[:versions.index(current)] if current in versions else []
+            if not older:
+                raise ValueError(f"No version older than {current} to roll back to")
+            version = older[-1]
+        self.activate(version, action='rollback')
+        return version
+
+    def load(self, version=None, use_cache=False):
+        """
+        Load a version (the active one by default) as a ModelBundle
+
+        The bundle's version attribute is set to the version name. Versions
+        never change once published and a hot-swapping predictor keeps the
+        bundle it loaded, so the process-wide model cache (which never
+        evicts) is off by default.
+        """
+        version = version or self.current()
+        if version is None:
+            raise ValueError(f"No active model version in {self.root}")
+        bundle = ModelBundle.load(self.artifact_path(version), use_cache=use_cache)
+        bundle.version = version
+        return bundle
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Versioned model registry")
+    parser.add_argument('--root', default='model_registry')
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish = commands.add_parser('publish', help="publish a model file as a new version")
+    publish.add_argument('--model', default='malaria_model.pkl')
+    publish.add_argument('--no-activate', action='store_true')
+    commands.add_parser('list', help="list versions")
+    activate = commands.add_parser('activate', help="activate a version")
+    activate.add_argument('version')
+    rollback = commands.add_parser('rollback', help="reactivate an earlier version")
+    rollback.add_argument('version', nargs='?')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    registry = ModelRegistry(args.root)
+    if args.command == 'publish':
+        print(registry.publish_file(args.model, activate=not args.no_activate))
+    elif args.command == 'activate':
+        registry.activate(args.version)
+    elif args.command == 'rollback':
+        print(registry.rollback(args.version))
+    else:
+        current = registry.current()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(metadata['created']))
+            marker = '*' if version == current else ' '
+            print(f"{marker} {version}  {created}  {metadata['format']:6}  {metadata['metrics']}")
+    return registry
+
+
+if __name__ == "__main__":
+    main()
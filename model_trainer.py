@@ -1,16 +1,32 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, f1_score
+from sklearn.metrics import accuracy_score, f1_score
+import os
+import time
+import pickle
 import joblib
 import logging
-import matplotlib.pyplot as plt
-import seaborn as sns
+import warnings
 from data_loader import MalariaDataLoader
+from model_io import load_model_data
+from forest_engine import CompiledForest, save_forest_arrays
+from instrumentation import instrumentation
+from drift import DriftProfile
+import evaluation
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Forest hyperparameters used unless others are passed in (see tuning.py)
+FOREST_PARAMS = {
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'class_weight': 'balanced',
+    'n_jobs': -1
+}
+
 class MalariaModelTrainer:
     """Model trainer for malaria outbreak risk prediction"""
     
@@ -18,9 +34,19 @@ class MalariaModelTrainer:
         self.model = None
         self.feature_names = None
         self.risk_levels = ['Low', 'Medium', 'High']
+        # Training-data histograms that DriftMonitor compares live traffic to
+        self.reference_profile = None
+        
+    def train_model(self, X_train, y_train, n_estimators=100, random_state=42,
+                    capture_profile=True, **params):
+        """
+        Train Random Forest classifier
         
-    def train_model(self, X_train, y_train, n_estimators=100, random_state=42):
-        """Train Random Forest classifier"""
+        Extra keyword arguments override FOREST_PARAMS, e.g. tuned values
+        from tuning.SuccessiveHalvingSearch.best_params_. capture_profile
+        records the drift reference profile from X_train; throwaway fits
+        such as tuning folds skip it.
+        """
         logger.info("Training Random Forest model...")
         
         self.feature_names = X_train.columns.tolist()
@@ -28,98 +54,426 @@ class MalariaModelTrainer:
         # Initialize and train model
         self.model = RandomForestClassifier(
             n_estimators=n_estimators,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
             random_state=random_state,
-            class_weight='balanced',
-            n_jobs=-1
+            **{**FOREST_PARAMS, **params}
         )
         
-        self.model.fit(X_train, y_train)
+        with instrumentation.span('train_model.fit'):
+            self.model.fit(X_train, y_train)
+        instrumentation.inc('malaria_training_rows_total', len(X_train), method='train_model')
+        
+        self.reference_profile = None
+        if capture_profile:
+            with instrumentation.span('train_model.profile'):
+                self.capture_reference_profile(X_train, out_of_bag=True)
         
         logger.info("Model training completed!")
         
         return self.model
     
-    def evaluate_model(self, X_test, y_test):
-        """Evaluate model performance"""
+    def train_incremental(self, chunks, trees_per_chunk=10, random_state=42, **params):
+        """
+        Train the Random Forest chunk by chunk for datasets larger than memory
+        
+        Each chunk grows trees_per_chunk new trees on that chunk alone
+        (warm_start), so peak memory is one chunk plus the fitted trees, not
+        the whole training set. Chunks should be shuffled samples of the same
+        distribution, large enough to contain every risk class.
+        
+        Args:
+            chunks: iterable of (X, y) pairs, e.g. from MalariaDataLoader.preprocess_chunks
+            trees_per_chunk: trees added for every chunk
+            random_state: random seed of the forest
+            **params: overrides of FOREST_PARAMS
+        """
+        logger.info("Training Random Forest model incrementally...")
+        
+        self.model = RandomForestClassifier(
+            n_estimators=trees_per_chunk,
+            random_state=random_state,
+            warm_start=True,
+            **{**FOREST_PARAMS, **params}
+        )
+        
+        self.feature_names = None
+        # Earlier chunks were scored by a smaller forest; call
+        # capture_reference_profile on a held-out sample afterwards
+        self.reference_profile = None
+        classes = None
+        n_rows = 0
+        for i, (X_chunk, y_chunk) in enumerate(chunks):
+            chunk_classes = sorted(pd.unique(np.asarray(y_chunk)))
+            if self.feature_names is None:
+                self.feature_names = X_chunk.columns.tolist()
+                classes = chunk_classes
+            elif X_chunk.columns.tolist() != self.feature_names:
+                raise ValueError(f"Chunk {i} columns {X_chunk.columns.tolist()} "
+                                 f"do not match {self.feature_names}")
+            if chunk_classes != classes:
+                raise ValueError(f"Chunk {i} has classes {chunk_classes}, expected {classes}; "
+                                 f"use larger chunks")
+            
+            self.model.set_params(n_estimators=trees_per_chunk * (i + 1))
+            with warnings.catch_warnings(), instrumentation.span('train_incremental.fit'):
+                # 'balanced' weights per chunk are fine for i.i.d. chunks
+                warnings.filterwarnings('ignore', message='class_weight presets')
+                self.model.fit(X_chunk, y_chunk)
+            instrumentation.inc('malaria_training_rows_total', len(X_chunk),
+                                method='train_incremental')
+            n_rows += len(X_chunk)
+            logger.info(f"Chunk {i}: {len(X_chunk)} rows, {len(self.model.estimators_)} trees")
+        
+        if self.feature_names is None:
+            raise ValueError("No training chunks were provided")
+        
+        # Further fit() calls should start a new forest
+        self.model.set_params(warm_start=False)
+        logger.info(f"Incremental training completed on {n_rows} rows!")
+        
+        return self.model
+    
+    def capture_reference_profile(self, X, out_of_bag=False, n_bins=10):
+        """
+        Record the drift-monitoring reference profile (see drift.py)
+        
+        Quantile bins of every numeric feature, the region mix and the
+        model's class probabilities for X.
+        
+        Args:
+            X: encoded reference rows, e.g. the training set or a held-out sample
+            out_of_bag: X is the training set of the forest; score each row
+                only with the trees that did not see it, since in-sample
+                probabilities are overconfident and would read as drift
+            n_bins: quantile bins per numeric feature
+        """
+        if self.model is None:
+            raise ValueError("Model not trained. Call train_model() first.")
+        
+        probability = self._oob_probability(X) if out_of_bag else self.model.predict_proba(X)
+        self.reference_profile = DriftProfile.capture(
+            self.feature_names, X, probability, self.model.classes_, n_bins=n_bins)
+        return self.reference_profile
+    
+    def _oob_probability(self, X):
+        """Out-of-bag class probabilities for the training rows X"""
+        probability = self.model.predict_proba(X)
+        if not getattr(self.model, 'bootstrap', False):
+            return probability
+        
+        features = np.asarray(X, dtype=np.float32)
+        totals = np.zeros_like(probability)
+        counts = np.zeros(len(features))
+        for tree, in_bag in zip(self.model.estimators_, self.model.estimators_samples_):
+            out_of_bag = np.ones(len(features), dtype=bool)
+            out_of_bag[in_bag] = False
+            totals[out_of_bag] += tree.predict_proba(features[out_of_bag])
+            counts[out_of_bag] += 1
+        # Rows every tree saw keep their in-sample probabilities
+        seen = counts > 0
+        probability[seen] = totals[seen] / counts[seen, None]
+        return probability
+    
+    def evaluate_model(self, X_test, y_test, group_by=(), n_bootstrap=0, n_jobs=1, verbose=True):
+        """
+        Evaluate model performance
+        
+        The test set is scored once and every metric comes from the
+        evaluation engine's confusion matrices (see evaluation.py).
+        
+        Args:
+            X_test, y_test: encoded test features and labels
+            group_by: groupings for per-group tables, e.g. ('region', 'month')
+            n_bootstrap: bootstrap replicates for confidence intervals
+            n_jobs: worker processes for the bootstrap
+            verbose: print the classification report and confusion matrix
+        
+        Returns:
+            dict with accuracy, f1_score, confusion_matrix, predictions, the
+            per-class report DataFrame and the per-group tables
+        """
         if self.model is None:
             raise ValueError("Model not trained. Call train_model() first.")
         
         logger.info("Evaluating model...")
         
         # Make predictions
-        y_pred = self.model.predict(X_test)
+        with instrumentation.span('evaluate_model.predict'):
+            y_pred = self.model.predict(X_test)
         
         # Calculate metrics
-        accuracy = accuracy_score(y_test, y_pred)
-        f1 = f1_score(y_test, y_pred, average='weighted')
+        with instrumentation.span('evaluate_model.metrics'):
+            results = evaluation.evaluate_model(self.model, X_test, y_test, group_by=group_by,
+                                                n_bootstrap=n_bootstrap, n_jobs=n_jobs,
+                                                y_pred=y_pred)
+        overall = results['overall']
         
-        logger.info(f"Accuracy: {accuracy:.3f}")
-        logger.info(f"F1 Score (weighted): {f1:.3f}")
+        logger.info(f"Accuracy: {overall['accuracy']:.3f}")
+        logger.info(f"F1 Score (weighted): {overall['f1_score']:.3f}")
         
-        # Classification report
-        print("\n📊 Classification Report:")
-        print(classification_report(y_test, y_pred))
+        if verbose:
+            print("\n📊 Classification Report:")
+            print(overall['report'].to_string(float_format=lambda v: f"{v:.2f}"))
+            print("\n🔍 Confusion Matrix:")
+            print(overall['confusion_matrix'])
         
-        # Confusion matrix
-        cm = confusion_matrix(y_test, y_pred)
-        print("\n🔍 Confusion Matrix:")
-        print(cm)
+        return {
+            'accuracy': overall['accuracy'],
+            'f1_score': overall['f1_score'],
+            'confusion_matrix': overall['confusion_matrix'],
+            'predictions': y_pred,
+            'report': overall['report'],
+            'groups': results['groups']
+        }
+    
+    def compress_model(self, X_val, y_val, f1_tolerance=0.01, depths=None, distill=None,
+                       X_train=None, distill_depth=8, verbose=True):
+        """
+        Replace the model with the smallest variant within f1_tolerance of its F1
+        
+        Every depth cut and tree count is scored on held-out data using the
+        compiled forest, so no tree is retrained. Trees are kept in their
+        original (bootstrap, hence interchangeable) order; ranking them by
+        validation F1 overfits the validation set. For each depth the tree
+        count is the smallest after which F1 never leaves the tolerance again,
+        and the variant with the fewest nodes wins, the original on a tie.
+        X_val should not be the final test set, since the selection is fit
+        to it. A replaced model gets a new drift reference profile from X_val.
+        
+        Args:
+            X_val, y_val: held-out features and labels
+            f1_tolerance: largest allowed drop in weighted F1
+            depths: depth cuts to consider, defaults to every depth
+            distill: optionally also fit 'tree' (one DecisionTreeClassifier)
+                or 'gbm' (small HistGradientBoostingClassifier) on the forest's
+                predictions for X_train; 'gbm' is reported for comparison but
+                never selected, since mmap artifacts, the compiled engine,
+                explanations and risk surfaces all need a tree model
+            X_train: training features for distillation
+            distill_depth: depth of the distilled tree
+            verbose: print the compression report
+        
+        Returns:
+            dict with the selected variant, the baseline F1 and a report
+            DataFrame of accuracy, F1, latency, size, node count and
+            servability per variant
+        """
+        if self.model is None:
+            raise ValueError("Model not trained. Call train_model() first.")
+        if distill not in (None, 'tree', 'gbm'):
+            raise ValueError(f"Unknown distillation target: {distill}")
+        if distill is not None and X_train is None:
+            raise ValueError("Distillation needs X_train")
+        
+        logger.info("Compressing model...")
+        
+        forest = self.model
+        if not isinstance(forest, CompiledForest):
+            forest = CompiledForest.from_sklearn(self.model)
+        features = np.ascontiguousarray(X_val, dtype=np.float32)
+        y_true = np.searchsorted(forest.classes_, np.asarray(y_val))
+        
+        n_classes = len(forest.classes_)
+        support = np.bincount(y_true, minlength=n_classes)
+        
+        def weighted_f1(probability):
+            # Same as f1_score(average='weighted'), via one bincount per call
+            y_pred = probability.argmax(axis=-1)
+            cm = np.bincount(y_true * n_classes + y_pred,
+                             minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+            tp = np.diag(cm)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                f1 = np.nan_to_num(2 * tp / (cm.sum(axis=0) + cm.sum(axis=1)))
+            return float(f1 @ support / support.sum())
+        
+        baseline_f1 = weighted_f1(forest.predict_proba(features))
+        threshold = baseline_f1 - f1_tolerance
+        node_depths = forest.node_depths()
+        tree_of_node = np.repeat(np.arange(forest.n_estimators),
+                                 np.diff(np.append(forest.roots, forest.n_nodes)))
+        
+        # Smallest (nodes, depth, trees) that stays within tolerance
+        best = (forest.n_nodes, forest.max_depth, np.arange(forest.n_estimators))
+        for depth in depths or range(1, forest.max_depth + 1):
+            tree_proba = forest.value[forest.apply(features, depth=depth)]
+            tree_nodes = np.bincount(tree_of_node[node_depths <= depth],
+                                     minlength=forest.n_estimators)
+            
+            prefix_f1 = np.array([weighted_f1(summed) for summed
+                                  in np.cumsum(tree_proba, axis=1).transpose(1, 0, 2)])
+            # Take the smallest prefix after which F1 never drops out of
+            # tolerance again, rather than the first lucky crossing
+            failing = np.flatnonzero(prefix_f1 < threshold)
+            k = failing[-1] + 2 if len(failing) else 1
+            if k <= forest.n_estimators and tree_nodes[:k].sum() < best[0]:
+                best = (tree_nodes[:k].sum(), depth, np.arange(k))
+        
+        n_nodes, depth, trees = best
+        variants = {'original': self.model, 'pruned': forest.subset(trees, depth)}
+        
+        if distill is not None:
+            from sklearn.tree import DecisionTreeClassifier
+            from sklearn.ensemble import HistGradientBoostingClassifier
+            
+            if distill == 'tree':
+                student = DecisionTreeClassifier(max_depth=distill_depth, random_state=42)
+            else:
+                student = HistGradientBoostingClassifier(max_iter=50, max_depth=3,
+                                                         random_state=42)
+            student.fit(X_train, forest.predict(np.ascontiguousarray(X_train, dtype=np.float32)))
+            variants[f'distilled_{distill}'] = student
+        
+        rows = []
+        for name, model in variants.items():
+            row = _compression_stats(model, X_val, y_val)
+            row['variant'] = name
+            row['within_tolerance'] = name == 'original' or row['f1_score'] >= threshold
+            # Only tree models compile to the flat layout the predictor relies on
+            row['servable'] = (isinstance(model, CompiledForest) or hasattr(model, 'estimators_')
+                               or hasattr(model, 'tree_'))
+            rows.append(row)
+        report = pd.DataFrame(rows).set_index('variant')
+        
+        # Fewest nodes wins; ties keep the earlier variant, so the sklearn
+        # forest stays unless pruning actually removes nodes
+        selected = report[report['within_tolerance'] & report['servable']]['n_nodes'].idxmin()
+        self.model = variants[selected]
+        if selected != 'original' and self.reference_profile is not None:
+            # The drift baseline must describe the model that is actually served
+            self.capture_reference_profile(X_val)
+        
+        if verbose:
+            print("\n🗜  Compression Report:")
+            print(report.to_string(float_format=lambda v: f"{v:.3f}"))
+        logger.info(f"Selected '{selected}' model (baseline F1 {baseline_f1:.3f})")
         
         return {
-            'accuracy': accuracy,
-            'f1_score': f1,
-            'confusion_matrix': cm,
-            'predictions': y_pred
+            'selected': selected,
+            'baseline_f1': baseline_f1,
+            'report': report
         }
     
-    def plot_feature_importance(self, top_n=10):
-        """Plot feature importance"""
+    def plot_feature_importance(self, top_n=10, filepath='feature_importance.png'):
+        """
+        Plot global feature importances and save them to filepath
+        
+        Per-prediction contributions are available from
+        MalariaPredictor.explain_batch.
+        """
         if self.model is None:
             raise ValueError("Model not trained. Call train_model() first.")
         
-        # Get feature importances
-        importances = self.model.feature_importances_
+        # Plotting libraries are only needed here, so keep them off the import path
+        import matplotlib.pyplot as plt
+        
+        # Get feature importances; compiled forests keep no impurity statistics,
+        # so they report each feature's share of the split nodes instead
+        if isinstance(self.model, CompiledForest):
+            importances = self.model.split_frequencies()
+        else:
+            importances = self.model.feature_importances_
         indices = np.argsort(importances)[::-1][:top_n]
+        positions = range(len(indices))
         
         # Create plot
         plt.figure(figsize=(10, 6))
         plt.title("Top Feature Importances")
-        plt.bar(range(top_n), importances[indices])
-        plt.xticks(range(top_n), [self.feature_names[i] for i in indices], rotation=45, ha='right')
+        plt.bar(positions, importances[indices])
+        plt.xticks(positions, [self.feature_names[i] for i in indices], rotation=45, ha='right')
         plt.xlabel("Features")
         plt.ylabel("Importance")
         plt.tight_layout()
-        plt.savefig('/home/ubuntu/malaria-risk-predictor/feature_importance.png', dpi=150)
-        logger.info("Feature importance plot saved!")
+        plt.savefig(filepath, dpi=150)
+        logger.info(f"Feature importance plot saved to {filepath}")
         plt.close()
         
         return importances
     
-    def save_model(self, filepath='malaria_model.pkl'):
-        """Save trained model to disk"""
+    def save_model(self, filepath='malaria_model.pkl', format='pickle'):
+        """
+        Save trained model to disk
+        
+        Args:
+            filepath: pickle file, or artifact directory for format='mmap'
+            format: 'pickle' for a joblib pickle, or 'mmap' for uncompressed
+                forest arrays plus a manifest that workers open with mmap_mode='r'
+        """
         if self.model is None:
             raise ValueError("Model not trained. Call train_model() first.")
         
+        if format == 'mmap':
+            # Random forests and single decision trees compile to the flat layout
+            forest = self.model
+            if not isinstance(forest, CompiledForest):
+                forest = CompiledForest.from_sklearn(self.model)
+            save_forest_arrays(forest, filepath, self.feature_names, self.risk_levels,
+                               reference_profile=self._profile_data())
+            logger.info(f"Model saved to {filepath}")
+            return
+        if format != 'pickle':
+            raise ValueError(f"Unknown model format: {format}")
+        
         model_data = {
             'model': self.model,
             'feature_names': self.feature_names,
-            'risk_levels': self.risk_levels
+            'risk_levels': self.risk_levels,
+            'reference_profile': self._profile_data()
         }
         
-        joblib.dump(model_data, filepath)
+        # Write then rename, so a predictor loading filepath never reads half a file
+        tmp_path = f"{filepath}.tmp"
+        joblib.dump(model_data, tmp_path)
+        os.replace(tmp_path, filepath)
         logger.info(f"Model saved to {filepath}")
     
-    def load_model(self, filepath='malaria_model.pkl'):
-        """Load trained model from disk"""
-        model_data = joblib.load(filepath)
+    def _profile_data(self):
+        """Reference profile as stored in model files, or None"""
+        return self.reference_profile.to_dict() if self.reference_profile is not None else None
+    
+    def load_model(self, filepath='malaria_model.pkl', use_cache=False):
+        """Load trained model from disk, optionally through the process-wide model cache"""
+        model_data = load_model_data(filepath, use_cache=use_cache)
         self.model = model_data['model']
         self.feature_names = model_data['feature_names']
         self.risk_levels = model_data['risk_levels']
+        profile = model_data.get('reference_profile')
+        self.reference_profile = DriftProfile.from_dict(profile) if profile else None
         logger.info(f"Model loaded from {filepath}")
 
+def _compression_stats(model, X, y, repeats=50):
+    """
+    Accuracy, F1, single-row latency, size and shape of one model variant
+    
+    Tree models are timed and sized in compiled form, so the sklearn forest
+    and its pruned copies differ only by what pruning removed.
+    """
+    features = np.ascontiguousarray(X, dtype=np.float32)
+    # sklearn models score the DataFrame they were trained with
+    inputs = features if isinstance(model, CompiledForest) else X
+    y_pred = model.predict(inputs)
+    
+    engine, row, n_nodes = model, X.iloc[:1], None
+    if isinstance(model, CompiledForest) or hasattr(model, 'estimators_') or hasattr(model, 'tree_'):
+        engine = model if isinstance(model, CompiledForest) else CompiledForest.from_sklearn(model)
+        row, n_nodes = features[:1], engine.n_nodes
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    
+    n_trees = getattr(model, 'n_estimators', None)
+    if hasattr(model, 'tree_'):
+        n_trees = 1
+    return {
+        'accuracy': accuracy_score(y, y_pred),
+        'f1_score': f1_score(y, y_pred, average='weighted'),
+        'latency_ms': float(np.median(timings)) * 1000,
+        'size_kb': len(pickle.dumps(engine, protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+        'n_nodes': n_nodes,
+        'n_trees': n_trees,
+        'max_depth': getattr(model, 'max_depth', None)
+    }
+
 def main():
     """Main training pipeline"""
     # Load and prepare data
@@ -0,0 +1,137 @@
+"""
+Multi-process batch scoring for large national runs.
+
+Worker processes load the model once in the pool initializer. The aligned
+float32 feature matrix is placed in shared memory, and workers write their
+class probabilities into a shared output matrix. Tasks only carry row
+ranges, so no DataFrames or result arrays are pickled between processes.
+Results are assembled in input order.
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from predict import MalariaPredictor, _input_index
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set up once by _init_worker
+_worker_predictor = None
+_worker_buffers = {}
+
+
+def _init_worker(model_path, engine):
+    """Load the model once per worker process"""
+    global _worker_predictor
+    _worker_predictor = MalariaPredictor(model_path, engine=engine)
+    model = _worker_predictor.trainer.model
+    # One process per core already; don't let each worker spawn its own joblib threads
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = 1
+
+
+def _shared_array(name, shape, dtype):
+    """View a shared memory block as an array, attaching on first use"""
+    block = _worker_buffers.get(name)
+    if block is None:
+        # Pool workers share the parent's resource tracker, and only the parent unlinks
+        block = _worker_buffers[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _score_range(input_name, output_name, n_rows, n_features, n_classes, start, stop):
+    """Score rows [start, stop) of the shared input matrix into the shared output matrix"""
+    # Release blocks left over from earlier batches
+    for name in [name for name in _worker_buffers if name not in (input_name, output_name)]:
+        _worker_buffers.pop(name).close()
+
+    features = _shared_array(input_name, (n_rows, n_features), np.float32)
+    probability = _shared_array(output_name, (n_rows, n_classes), np.float64)
+    probability[start:stop] = _worker_predictor._predict_proba(features[start:stop])
+    return start, stop
+
+
+class ParallelScorer:
+    """Process pool that scores large batches with a shared, preloaded model"""
+
+    def __init__(self, model_path='malaria_model.pkl', n_workers=None, chunk_size=50000,
+                 engine='sklearn'):
+        """
+        Args:
+            model_path: model pickle or mmap artifact directory (mmap artifacts
+                let workers share the model pages through the OS page cache)
+            n_workers: number of worker processes, defaults to the CPU count
+            chunk_size: rows per task
+            engine: 'sklearn' or 'compiled'
+        """
+        self.model_path = model_path
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.engine = engine
+
+        # The parent only aligns features and formats results
+        self.predictor = MalariaPredictor(model_path, engine=engine)
+        if self.predictor.trainer is None:
+            raise ValueError(f"Model not loaded from {model_path}. Please train the model first.")
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_init_worker,
+            initargs=(model_path, engine)
+        )
+
+    def score(self, input_data):
+        """
+        Score every row of a batch across the worker pool
+
+        Args:
+            input_data: DataFrame, 2D NumPy array or list of dicts with features
+
+        Returns:
+            DataFrame in input order, with the same columns as MalariaPredictor.predict_batch
+        """
+        features = self.predictor._align_features(input_data)
+        index = _input_index(input_data)
+        n_rows, n_features = features.shape
+        n_classes = len(self.predictor.trainer.model.classes_)
+        if n_rows == 0:
+            return self.predictor._format_batch(np.empty((0, n_classes)), index)
+
+        input_block = shared_memory.SharedMemory(create=True, size=n_rows * n_features * 4)
+        output_block = shared_memory.SharedMemory(create=True, size=n_rows * n_classes * 8)
+        try:
+            probability = self._score_shared(features, input_block, output_block, n_classes)
+        finally:
+            for block in (input_block, output_block):
+                block.close()
+                block.unlink()
+
+        return self.predictor._format_batch(probability, index)
+
+    def _score_shared(self, features, input_block, output_block, n_classes):
+        """Fill the shared input matrix, fan out row ranges and copy the probabilities back"""
+        n_rows, n_features = features.shape
+        shared_features = np.ndarray((n_rows, n_features), dtype=np.float32, buffer=input_block.buf)
+        shared_features[:] = features
+
+        futures = [
+            self._executor.submit(_score_range, input_block.name, output_block.name,
+                                  n_rows, n_features, n_classes,
+                                  start, min(start + self.chunk_size, n_rows))
+            for start in range(0, n_rows, self.chunk_size)
+        ]
+        for future in futures:
+            future.result()
+
+        return np.ndarray((n_rows, n_classes), dtype=np.float64, buffer=output_block.buf).copy()
+
+    def close(self):
+        """Shut down the worker processes"""
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
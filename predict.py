@@ -1,66 +1,561 @@
-import pandas as pd
+import os
+import time
+import weakref
+import itertools
+import threading
 import numpy as np
-import joblib
 import logging
-from model_trainer import MalariaModelTrainer
+from model_io import ModelBundle
+from forest_engine import CompiledForest
+from feature_schema import FeatureSchema
+from instrumentation import instrumentation
+from drift import DriftMonitor, shared_monitor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _predict_proba_array(model, features):
+    """
+    predict_proba on a matrix already aligned to the model's feature_names
+    
+    sklearn models fitted on a DataFrame get the matrix back under their own
+    column names, which FeatureSchema's order already matches, so they score
+    it without warning about unnamed input.
+    """
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None:
+        import pandas as pd
+        features = pd.DataFrame(features, columns=names, copy=False)
+    return model.predict_proba(features)
+
+# Version of every model a predictor has served, keyed on the model object so
+# predictors sharing a model agree; models attached in memory rather than
+# loaded from a file or registry get in-memory-<n>
+_model_versions = weakref.WeakKeyDictionary()
+_model_versions_lock = threading.Lock()
+_in_memory_versions = itertools.count(1)
+
+def _version_of(model, version=None):
+    """Return the version recorded for model, recording `version` (or a new in-memory one) first"""
+    with _model_versions_lock:
+        if version is not None:
+            _model_versions[model] = version
+        elif model not in _model_versions:
+            _model_versions[model] = f"in-memory-{next(_in_memory_versions)}"
+        return _model_versions[model]
+
+def _input_index(input_data):
+    """Keep a DataFrame's index on batch results; other inputs get a RangeIndex"""
+    return input_data.index if hasattr(input_data, 'columns') else None
+
 class MalariaPredictor:
     """Predictor for malaria outbreak risk"""
     
-    def __init__(self, model_path='malaria_model.pkl'):
-        self.trainer = MalariaModelTrainer()
+    def __init__(self, model_path='malaria_model.pkl', engine='sklearn', use_cache=False,
+                 result_cache=None, missing='zero', unknown_region='error', risk_surface=None,
+                 registry=None, refresh_interval=1.0, explanation_cache=None, monitor=None):
+        """
+        Args:
+            model_path: model file or mmap artifact directory saved by
+                MalariaModelTrainer, or None
+            engine: 'sklearn' or 'compiled' (flat-array NumPy forest)
+            use_cache: load the model through the process-wide model cache
+            result_cache: optional PredictionCache memoizing predict_risk results
+            missing: FeatureSchema policy for absent fields ('zero' or 'error')
+            unknown_region: FeatureSchema policy for unseen regions ('error' or 'ignore')
+            risk_surface: optional RiskSurface answering on-grid predict_risk
+                calls by lookup; used only while it matches the loaded model
+            registry: ModelRegistry to serve the active version of instead of
+                model_path; new versions are hot-swapped in (see refresh)
+            refresh_interval: seconds between checks of the registry pointer
+                made by incoming requests, or None to only swap on refresh()
+            explanation_cache: optional PredictionCache memoizing explain_risk results
+            monitor: optional DriftMonitor fed every scored feature matrix, or
+                True to use the process-wide shared_monitor for the model's
+                reference profile from the first prediction on; a hot-swapped
+                model brings its own profile
+        """
+        if engine not in ('sklearn', 'compiled'):
+            raise ValueError(f"Unknown inference engine: {engine}")
+        self.engine = engine
+        self.result_cache = result_cache
+        self.explanation_cache = explanation_cache
+        self.monitor = monitor
+        self._monitor_lock = threading.Lock()
+        self.schema_options = {'missing': missing, 'unknown_region': unknown_region}
+        self._compiled = weakref.WeakKeyDictionary()
+        self._schema = None
+        self.risk_surface = risk_surface
+        self._surface_check = None
+        
+        # Requests pin the current model on their thread (see trainer), so a
+        # hot swap never changes the model under an in-flight request
+        self._local = threading.local()
+        self._trainer = None
+        self.registry = registry
+        self.refresh_interval = refresh_interval
+        self._refresh_lock = threading.Lock()
+        self._pointer_token = None
+        self._next_check = 0.0
+        
+        if registry is not None:
+            self.refresh()
+            return
+        
+        # model_path=None creates an empty predictor; assign .trainer afterwards
+        if model_path is None:
+            return
+        
         try:
-            self.trainer.load_model(model_path)
+            version = f"{os.path.abspath(model_path)}@{os.stat(model_path).st_mtime_ns}"
+            self.trainer = ModelBundle.load(model_path, use_cache=use_cache)
+            _version_of(self.trainer.model, version)
             logger.info("Model loaded successfully!")
         except FileNotFoundError:
             logger.warning(f"Model file not found at {model_path}. Please train the model first.")
             self.trainer = None
     
-    def predict_risk(self, input_data):
+    @property
+    def trainer(self):
+        """Model bundle pinned by this thread's request, else the current one"""
+        pinned = getattr(self._local, 'trainer', None)
+        return self._trainer if pinned is None else pinned
+    
+    @trainer.setter
+    def trainer(self, trainer):
+        self._trainer = trainer
+    
+    def _pin(self):
+        """Pin the current model for this thread until _unpin; nested calls keep the outer pin"""
+        if getattr(self._local, 'trainer', None) is not None:
+            return False
+        if self.registry is not None and self.refresh_interval is not None:
+            self._maybe_refresh()
+        self._local.trainer = self._trainer
+        return True
+    
+    def _unpin(self, pinned):
+        if pinned:
+            self._local.trainer = None
+    
+    def _maybe_refresh(self):
+        """At most once per refresh_interval, start a background swap if the registry pointer moved"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.refresh_interval
+        if self.registry.pointer_token() != self._pointer_token and not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, daemon=True, name='model-refresh').start()
+    
+    def refresh(self):
         """
-        Predict malaria outbreak risk
+        Load the registry's active version and swap it in if it changed
         
-        Args:
-            input_data: dict or DataFrame with features
+        The new model is loaded and warmed up (feature schema, compiled
+        forest) while requests keep using the old one; the swap itself is a
+        single reference assignment, and requests already in flight finish
+        on the model they pinned.
         
         Returns:
-            dict with risk_level, probabilities, and confidence
+            True if a new version was swapped in
         """
+        with self._refresh_lock:
+            token = self.registry.pointer_token()
+            version = self.registry.current()
+            self._pointer_token = token
+            if version is None or (self._trainer is not None
+                                   and getattr(self._trainer, 'version', None) == version):
+                return False
+            
+            try:
+                bundle = self.registry.load(version)
+                _version_of(bundle.model, version)
+                self._local.trainer = bundle
+                try:
+                    self.schema
+                    if self.engine == 'compiled':
+                        self._compiled_forest()
+                finally:
+                    self._local.trainer = None
+            except Exception:
+                logger.exception(f"Could not load model version {version}; keeping the current model")
+                return False
+            
+            previous = getattr(self._trainer, 'version', None)
+            self._trainer = bundle
+            if isinstance(self.monitor, DriftMonitor) and bundle.reference_profile is not None:
+                if self.monitor.shared:
+                    # Predictors still pinned to the old model keep feeding its monitor
+                    self.monitor = shared_monitor(bundle.reference_profile)
+                else:
+                    self.monitor.set_profile(bundle.reference_profile)
+            logger.info(f"Swapped model version {previous} -> {version}")
+            return True
+    
+    def _check_model_loaded(self):
+        """Raise if no trained model is available"""
         if self.trainer is None or self.trainer.model is None:
             raise ValueError("Model not loaded. Please train the model first.")
+    
+    @property
+    def model_version(self):
+        """Identifier of the current model, used to key cached results and tag predictions"""
+        if self.trainer is None or self.trainer.model is None:
+            return None
+        return _version_of(self.trainer.model)
+    
+    def _compiled_forest(self):
+        """Return the flat-array forest, recompiling if the model was replaced"""
+        model = self.trainer.model
+        if isinstance(model, CompiledForest):
+            return model
+        # Keyed on the model, so requests still pinned to a swapped-out model
+        # keep their compiled copy
+        compiled = self._compiled.get(model)
+        if compiled is None:
+            compiled = self._compiled[model] = CompiledForest.from_sklearn(model)
+        return compiled
+    
+    def active_risk_surface(self):
+        """Return the risk surface if it was built from the current model, else None"""
+        surface, model = self.risk_surface, self.trainer.model
+        if self._surface_check is None or self._surface_check[0] is not surface \
+                or self._surface_check[1] is not model:
+            from risk_surface import forest_fingerprint
+            matches = (surface.feature_names == list(self.trainer.feature_names)
+                       and list(surface.classes) == [str(c) for c in model.classes_]
+                       and surface.fingerprint == forest_fingerprint(self._compiled_forest()))
+            if not matches:
+                logger.warning("Risk surface was built from a different model; scoring live")
+            self._surface_check = (surface, model, matches)
+        return surface if self._surface_check[2] else None
+    
+    def _observe(self, features, probability=None):
+        """Hand scored rows to the drift monitor, if any; only queues them"""
+        if self.monitor is None:
+            return
+        if self.monitor is True:
+            with self._monitor_lock:
+                if self.monitor is True:
+                    profile = getattr(self.trainer, 'reference_profile', None)
+                    if profile is None:
+                        logger.warning("Model has no reference profile; drift monitoring disabled")
+                    self.monitor = shared_monitor(profile) if profile is not None else None
+            if self.monitor is None:
+                return
+        self.monitor.observe(features, probability)
+    
+    def _predict_proba(self, features):
+        """Compute class probabilities with the configured inference engine"""
+        if self.engine == 'compiled':
+            return self._compiled_forest().predict_proba(features)
+        return _predict_proba_array(self.trainer.model, features)
+    
+    @property
+    def schema(self):
+        """FeatureSchema for the current model, rebuilt only if feature_names change"""
+        self._check_model_loaded()
+        feature_names = self.trainer.feature_names
+        if self._schema is None or self._schema[0] is not feature_names:
+            self._schema = (feature_names, FeatureSchema(feature_names, **self.schema_options))
+        return self._schema[1]
+    
+    def _align_features(self, input_data):
+        """
+        Encode input data into the training feature layout in one step
         
-        # Convert input to DataFrame if needed
-        if isinstance(input_data, dict):
-            input_df = pd.DataFrame([input_data])
-        else:
-            input_df = input_data
+        Args:
+            input_data: dict or list of dicts (raw with a 'region' name, or
+                with region_* columns), DataFrame, or 2D NumPy array whose
+                columns are already in feature_names order
         
-        # Ensure all required features are present
-        for feature in self.trainer.feature_names:
-            if feature not in input_df.columns:
-                input_df[feature] = 0
+        Returns:
+            float32 matrix with exactly the training columns
+        """
+        return self.schema.transform(input_data)
+    
+    def predict_risk(self, input_data, profile=False):
+        """
+        Predict malaria outbreak risk
         
-        # Reorder columns to match training data
-        input_df = input_df[self.trainer.feature_names]
+        Args:
+            input_data: dict (raw record with a 'region' name, or encoded
+                features) or DataFrame with features
+            profile: run this call under cProfile (see instrumentation.profiles)
         
-        # Make prediction
-        prediction = self.trainer.model.predict(input_df)[0]
-        probability = self.trainer.model.predict_proba(input_df)
+        Returns:
+            dict with risk_level, probabilities, confidence and model_version
+        """
+        pinned = self._pin()
+        try:
+            with instrumentation.profiled('predict_risk', force=profile), \
+                    instrumentation.span('predict_risk'):
+                return self._predict_risk(input_data)
+        finally:
+            self._unpin(pinned)
+    
+    def _predict_risk(self, input_data):
+        """predict_risk with a timing span around each stage"""
+        self._check_model_loaded()
+        instrumentation.inc('malaria_predictions_total', method='predict_risk')
+        
+        with instrumentation.span('predict_risk.align'):
+            features = self._align_features(input_data)
+        
+        surface = self.active_risk_surface() if self.risk_surface is not None else None
+        if surface is not None:
+            with instrumentation.span('predict_risk.surface'):
+                probability = surface.lookup(features[0])
+            if probability is not None:
+                instrumentation.inc('malaria_risk_surface_total', result='hit')
+                self._observe(features, probability)
+                return self._format_result(probability)
+            instrumentation.inc('malaria_risk_surface_total', result='miss')
+        
+        if self.result_cache is not None:
+            with instrumentation.span('predict_risk.cache'):
+                key = self.result_cache.make_key(features[0], self.model_version)
+                cached = self.result_cache.get(key)
+            if cached is not None:
+                instrumentation.inc('malaria_result_cache_total', result='hit')
+                self._observe(features)
+                return {**cached, 'probabilities': dict(cached['probabilities'])}
+            instrumentation.inc('malaria_result_cache_total', result='miss')
+        
+        # Single forest pass: the label is the argmax of the probabilities
+        with instrumentation.span('predict_risk.forest'):
+            probability = self._predict_proba(features[:1])[0]
+        self._observe(features, probability)
+        with instrumentation.span('predict_risk.format'):
+            result = self._format_result(probability)
+        
+        if self.result_cache is not None:
+            self.result_cache.put(key, {**result, 'probabilities': dict(result['probabilities'])})
         
-        risk_levels = self.trainer.risk_levels
+        return result
+    
+    def _ordered_levels(self):
+        """Return (level, column) pairs in risk_levels order using model.classes_"""
+        classes = list(self.trainer.model.classes_)
+        levels = [level for level in self.trainer.risk_levels if level in classes]
+        levels += [level for level in classes if level not in levels]
+        return [(level, classes.index(level)) for level in levels]
+    
+    def _format_result(self, probability):
+        """Build the prediction result dict from one row of class probabilities"""
+        classes = self.trainer.model.classes_
         
-        result = {
-            'risk_level': prediction,
+        return {
+            'risk_level': str(classes[int(np.argmax(probability))]),
             'probabilities': {
-                level: f"{prob:.3f}" for level, prob in zip(risk_levels, probability[0])
+                level: f"{probability[i]:.3f}" for level, i in self._ordered_levels()
             },
-            'confidence': max(probability[0])
+            'confidence': float(np.max(probability)),
+            'model_version': self.model_version
         }
+    
+    def predict_encoded(self, features):
+        """
+        Score already-encoded feature rows with one probability call
         
-        return result
+        Args:
+            features: float32 matrix from predictor.schema, one row per request
+        
+        Returns:
+            list of predict_risk-style result dicts, one per row
+        """
+        pinned = self._pin()
+        try:
+            self._check_model_loaded()
+            instrumentation.inc('malaria_predictions_total', len(features),
+                                method='predict_encoded')
+            with instrumentation.span('predict_encoded.forest'):
+                probability = self._predict_proba(features)
+            self._observe(features, probability)
+            with instrumentation.span('predict_encoded.format'):
+                return [self._format_result(row) for row in probability]
+        finally:
+            self._unpin(pinned)
+    
+    def predict_batch(self, input_data, chunk_size=10000):
+        """
+        Predict malaria outbreak risk for every row of a batch
+        
+        Features are aligned once for the whole batch, then each chunk is
+        scored with a single predict_proba call and the labels are taken
+        from the probabilities.
+        
+        Args:
+            input_data: DataFrame, 2D NumPy array or list of dicts with features
+            chunk_size: maximum number of rows per predict_proba call
+        
+        Returns:
+            DataFrame with risk_level, confidence, one probability column
+            per risk level (prob_Low, prob_Medium, prob_High) and model_version
+        """
+        pinned = self._pin()
+        try:
+            return self._predict_batch(input_data, chunk_size)
+        finally:
+            self._unpin(pinned)
+    
+    def _predict_batch(self, input_data, chunk_size):
+        """predict_batch on the pinned model"""
+        self._check_model_loaded()
+        
+        with instrumentation.span('predict_batch.align'):
+            features = self._align_features(input_data)
+        instrumentation.inc('malaria_predictions_total', len(features), method='predict_batch')
+        
+        with instrumentation.span('predict_batch.forest'):
+            probability = np.empty((len(features), len(self.trainer.model.classes_)))
+            for start in range(0, len(features), chunk_size):
+                stop = start + chunk_size
+                probability[start:stop] = self._predict_proba(features[start:stop])
+        self._observe(features, probability)
+        
+        with instrumentation.span('predict_batch.format'):
+            return self._format_batch(probability, _input_index(input_data))
+    
+    def predict_panel(self, rows, engine):
+        """
+        Predict risk for newly arrived panel months
+        
+        Args:
+            rows: raw region-month rows following the months engine has seen
+            engine: fitted PanelFeatureEngine the model was trained with; its
+                history is advanced past rows
+        
+        Returns:
+            predict_batch DataFrame indexed like rows
+        """
+        return self.predict_batch(engine.append(rows))
+    
+    def explain_batch(self, input_data, level=None, group_regions=False, chunk_size=10000):
+        """
+        Per-feature contributions to every prediction of a batch
+        
+        Each prediction is decomposed along its decision paths in the forest
+        (see CompiledForest.contributions): for every row, bias plus the
+        feature columns equals the probability of the explained level.
+        
+        Args:
+            input_data: DataFrame, 2D NumPy array or list of dicts with features
+            level: risk level to explain; None explains each row's predicted level
+            group_regions: sum the region one-hot columns into one 'region' column
+            chunk_size: maximum number of rows decomposed at a time
+        
+        Returns:
+            DataFrame with risk_level, the explained level, bias and one
+            contribution column per feature
+        """
+        pinned = self._pin()
+        try:
+            self._check_model_loaded()
+            with instrumentation.span('explain_batch.align'):
+                features = self._align_features(input_data)
+            instrumentation.inc('malaria_explanations_total', len(features), method='explain_batch')
+            with instrumentation.span('explain_batch.forest'):
+                return self._explain(features, level, group_regions, chunk_size,
+                                     _input_index(input_data))
+        finally:
+            self._unpin(pinned)
+    
+    def _explain(self, features, level, group_regions, chunk_size, index=None):
+        """explain_batch on already-encoded features and the pinned model"""
+        import pandas as pd
+        
+        forest = self._compiled_forest()
+        classes = list(forest.classes_)
+        if level is not None and level not in classes:
+            raise ValueError(f"Unknown risk level {level!r}; expected one of {classes}")
+        
+        n_rows = len(features)
+        predicted = np.empty(n_rows, dtype=np.intp)
+        explained = np.empty(n_rows, dtype=np.intp)
+        bias = np.empty(n_rows)
+        contributions = np.empty((n_rows, len(self.trainer.feature_names)))
+        for start in range(0, n_rows, chunk_size):
+            rows = np.arange(start, min(start + chunk_size, n_rows))
+            root, chunk = forest.contributions(features[rows])
+            predicted[rows] = (root + chunk.sum(axis=1)).argmax(axis=1)
+            explained[rows] = predicted[rows] if level is None else classes.index(level)
+            bias[rows] = root[explained[rows]]
+            contributions[rows] = chunk[np.arange(len(rows)), :, explained[rows]]
+        
+        columns = dict(zip(self.trainer.feature_names, contributions.T))
+        if group_regions and self.schema.regions:
+            region_columns = list(self.schema.region_columns.values())
+            for i in region_columns:
+                del columns[self.trainer.feature_names[i]]
+            columns['region'] = contributions[:, region_columns].sum(axis=1)
+        
+        return pd.DataFrame({
+            'risk_level': forest.classes_[predicted],
+            'level': forest.classes_[explained],
+            'bias': bias,
+            **columns
+        }, index=index)
+    
+    def explain_risk(self, input_data, level=None):
+        """
+        Explain one prediction as per-feature contributions
+        
+        Args:
+            input_data: dict (raw record with a 'region' name, or encoded
+                features) or one-row DataFrame
+            level: risk level to explain; None explains the predicted level
+        
+        Returns:
+            dict with risk_level, the explained level and its probability,
+            bias, contributions (feature -> contribution, largest magnitude
+            first, region columns summed into 'region') and model_version
+        """
+        pinned = self._pin()
+        try:
+            self._check_model_loaded()
+            instrumentation.inc('malaria_explanations_total', method='explain_risk')
+            features = self._align_features(input_data)
+            
+            if self.explanation_cache is not None:
+                key = self.explanation_cache.make_key(features[0], f"{self.model_version}/{level}")
+                cached = self.explanation_cache.get(key)
+                if cached is not None:
+                    return {**cached, 'contributions': dict(cached['contributions'])}
+            
+            with instrumentation.span('explain_risk.forest'):
+                row = self._explain(features[:1], level, group_regions=True, chunk_size=1).iloc[0]
+            contributions = row.drop(['risk_level', 'level', 'bias']).astype(float)
+            contributions = contributions.reindex(contributions.abs().sort_values(ascending=False).index)
+            result = {
+                'risk_level': str(row['risk_level']),
+                'level': str(row['level']),
+                'probability': float(row['bias'] + contributions.sum()),
+                'bias': float(row['bias']),
+                'contributions': contributions.to_dict(),
+                'model_version': self.model_version
+            }
+            
+            if self.explanation_cache is not None:
+                self.explanation_cache.put(key, {**result, 'contributions': dict(result['contributions'])})
+            return result
+        finally:
+            self._unpin(pinned)
+    
+    def _format_batch(self, probability, index=None):
+        """Build the batch result DataFrame from a matrix of class probabilities"""
+        import pandas as pd
+        
+        model = self.trainer.model
+        results = pd.DataFrame({
+            'risk_level': model.classes_[probability.argmax(axis=1)],
+            'confidence': probability.max(axis=1)
+        }, index=index)
+        for level, i in self._ordered_levels():
+            results[f'prob_{level}'] = probability[:, i]
+        results['model_version'] = pd.Categorical([self.model_version] * len(results))
+        
+        return results
     
     def get_risk_recommendations(self, risk_level):
         """Get recommendations based on risk level"""
@@ -0,0 +1,104 @@
+"""
+Memoization of prediction results for repeated feature vectors.
+
+Dashboard inputs are discrete sliders, so the same aligned feature vectors
+come back again and again across users. Results are cached under a hash of
+the (quantized) feature vector and the model version, with LRU eviction and
+an optional time-to-live.
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class PredictionCache:
+    """Thread-safe LRU/TTL cache of prediction results"""
+
+    def __init__(self, maxsize=4096, ttl=None, decimals=6, clock=time.monotonic):
+        """
+        Args:
+            maxsize: maximum number of cached results before LRU eviction
+            ttl: seconds a result stays valid, or None to keep it until evicted
+            decimals: feature values are rounded to this many decimals before
+                hashing so float noise (0.30000000000000004) maps to one key
+            clock: monotonic time source, replaceable in tests
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, features, model_version):
+        """Build a canonical key from an aligned feature vector and the model version"""
+        vector = np.asarray(features, dtype=np.float64).ravel()
+        if self.decimals is not None:
+            vector = np.round(vector, self.decimals)
+        # Normalise -0.0 so it hashes like 0.0
+        vector = vector + 0.0
+
+        digest = hashlib.blake2b(vector.tobytes(), digest_size=16)
+        digest.update(str(model_version).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# Shared by every Streamlit session in the process
+prediction_cache = PredictionCache(maxsize=4096, ttl=3600)
+explanation_cache = PredictionCache(maxsize=1024, ttl=3600)
@@ -0,0 +1,320 @@
+"""
+Precomputed risk surface: forest probabilities over a grid of inputs.
+
+The dashboard's inputs are bounded sliders, so most of the input space can
+be enumerated. build() scores the forest once over a grid of axes (e.g.
+region x month x temperature x rainfall), with every other feature held at
+a fixed value, and keeps the class probabilities in one dense array indexed
+by grid position. A lookup maps each axis value to its position with a dict
+and reads one row, so it costs the same for any grid size; points off the
+grid return None and are scored live by the predictor. The surface also
+slices straight into heatmaps without calling the model.
+
+Usage:
+    python risk_surface.py --model malaria_model.pkl --output risk_surface.npz
+"""
+import os
+import json
+import math
+import hashlib
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from forest_engine import CompiledForest, ARRAY_NAMES
+from feature_schema import FeatureSchema
+
+logger = logging.getLogger(__name__)
+
+SURFACE_FORMAT_VERSION = 1
+
+# Integer slider ranges of the dashboard (see MalariaPredictionApp.render_sidebar)
+DEFAULT_AXES = {
+    'region': None,  # every region the model was trained on
+    'month': list(range(1, 13)),
+    'avg_temperature': list(range(15, 41)),
+    'rainfall': list(range(0, 301))
+}
+
+# Dashboard slider defaults for the features that are not grid axes
+DEFAULT_FIXED = {
+    'humidity': 75,
+    'population_density': 200,
+    'healthcare_access': 0.5,
+    'historical_cases': 50
+}
+
+
+def forest_fingerprint(forest):
+    """Hash of a CompiledForest's node arrays and classes"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in ARRAY_NAMES:
+        digest.update(np.ascontiguousarray(getattr(forest, name)).tobytes())
+    digest.update(json.dumps([str(c) for c in forest.classes_]).encode())
+    return digest.hexdigest()
+
+
+def _layout(feature_names, axes, fixed):
+    """
+    Check that axes and fixed values cover every feature, and index them
+
+    Returns:
+        (fixed column indices, their float32 values, one (column(s),
+        value -> position dict) pair per axis)
+    """
+    schema = FeatureSchema(feature_names)
+    uncovered = [name for name, _ in schema.numeric_columns if name not in axes and name not in fixed]
+    if schema.regions and 'region' not in axes and 'region' not in fixed:
+        uncovered.append('region')
+    if uncovered:
+        raise ValueError(f"Features {uncovered} are neither grid axes nor fixed")
+
+    fixed_row = schema.transform_record({**fixed, 'region': fixed.get('region')})
+    fixed_columns = [i for name, i in schema.numeric_columns if name not in axes]
+    if 'region' not in axes:
+        fixed_columns += list(schema.region_columns.values())
+    fixed_columns = np.array(sorted(fixed_columns), dtype=np.intp)
+
+    # Positions are keyed on float32 values, exactly as FeatureSchema writes them
+    axis_index = []
+    for name, values in axes.items():
+        if name == 'region':
+            unknown = [value for value in values if value not in schema.region_columns]
+            if unknown:
+                raise ValueError(f"Unknown region(s) {unknown}; expected one of {schema.regions}")
+            columns = np.array(list(schema.region_columns.values()), dtype=np.intp)
+            axis_index.append((columns, {schema.region_columns[value]: i
+                                         for i, value in enumerate(values)}))
+        else:
+            axis_index.append((schema.index[name], {float(np.float32(value)): i
+                                                    for i, value in enumerate(values)}))
+    return fixed_columns, fixed_row[fixed_columns], axis_index
+
+
+class RiskSurface:
+    """Dense grid of class probabilities with O(1) lookups"""
+
+    def __init__(self, feature_names, axes, fixed, classes, probabilities, fingerprint=None):
+        """
+        Args:
+            feature_names: training columns in model order
+            axes: dict of grid axis -> list of values ('region' takes region names)
+            fixed: dict of value for every feature that is not an axis
+            classes: model classes, in probability column order
+            probabilities: array of shape (*axis lengths, n_classes)
+            fingerprint: forest_fingerprint of the model that was scored
+        """
+        self.feature_names = list(feature_names)
+        self.axes = {name: list(values) for name, values in axes.items()}
+        self.fixed = dict(fixed)
+        self.classes = np.asarray(classes)
+        self.probabilities = probabilities
+        self.fingerprint = fingerprint
+
+        expected = tuple(len(values) for values in self.axes.values()) + (len(self.classes),)
+        if probabilities.shape != expected:
+            raise ValueError(f"probabilities have shape {probabilities.shape}, expected {expected}")
+        self._prepare()
+
+    def _prepare(self):
+        """Build the per-axis position lookups and the fixed part of the feature row"""
+        self._fixed_columns, self._fixed_values, self._axis_index = _layout(
+            self.feature_names, self.axes, self.fixed)
+
+    @property
+    def shape(self):
+        return self.probabilities.shape[:-1]
+
+    @property
+    def n_points(self):
+        return math.prod(self.shape)
+
+    @classmethod
+    def build(cls, model, feature_names, axes=None, fixed=None, chunk_size=65536):
+        """
+        Score a model over every point of a grid
+
+        Args:
+            model: fitted RandomForestClassifier or CompiledForest
+            feature_names: training columns in model order
+            axes: dict of axis -> values, defaults to DEFAULT_AXES; a None
+                value for 'region' means every trained region
+            fixed: values of the non-axis features, defaults to DEFAULT_FIXED
+            chunk_size: grid points scored per predict_proba call
+        """
+        forest = model if isinstance(model, CompiledForest) else CompiledForest.from_sklearn(model)
+        schema = FeatureSchema(feature_names)
+        axes = dict(DEFAULT_AXES if axes is None else axes)
+        if 'region' in axes and axes['region'] is None:
+            axes['region'] = schema.regions
+        fixed = {name: value for name, value in (DEFAULT_FIXED if fixed is None else fixed).items()
+                 if name not in axes}
+
+        # Validates the axes and fixed values before any scoring
+        fixed_columns, fixed_values, axis_index = _layout(feature_names, axes, fixed)
+
+        shape = tuple(len(values) for values in axes.values())
+        n_points = math.prod(shape)
+        base_row = np.zeros(len(feature_names), dtype=np.float32)
+        base_row[fixed_columns] = fixed_values
+        axis_values = [np.asarray([schema.region_columns[v] for v in values], dtype=np.intp)
+                       if name == 'region' else np.asarray(values, dtype=np.float32)
+                       for name, values in axes.items()]
+
+        probabilities = np.empty((n_points, len(forest.classes_)), dtype=np.float32)
+        for start in range(0, n_points, chunk_size):
+            flat = np.arange(start, min(start + chunk_size, n_points))
+            matrix = np.tile(base_row, (len(flat), 1))
+            for name, values, (column, _), position in zip(
+                    axes, axis_values, axis_index, np.unravel_index(flat, shape)):
+                if name == 'region':
+                    matrix[np.arange(len(flat)), values[position]] = 1
+                else:
+                    matrix[:, column] = values[position]
+            probabilities[flat] = forest.predict_proba(matrix)
+
+        logger.info(f"Scored {n_points} grid points over {list(axes)}")
+        return cls(feature_names, axes, fixed, forest.classes_,
+                   probabilities.reshape(shape + (len(forest.classes_),)),
+                   fingerprint=forest_fingerprint(forest))
+
+    def position(self, row):
+        """Grid position of an encoded float32 feature row, or None if it is off the grid"""
+        if not np.array_equal(row[self._fixed_columns], self._fixed_values):
+            return None
+        position = []
+        for column, positions in self._axis_index:
+            if isinstance(column, np.ndarray):
+                # Region axis: exactly one one-hot column set to 1
+                hot = np.flatnonzero(row[column])
+                if len(hot) != 1 or row[column[hot[0]]] != 1:
+                    return None
+                index = positions.get(int(column[hot[0]]))
+            else:
+                index = positions.get(float(row[column]))
+            if index is None:
+                return None
+            position.append(index)
+        return tuple(position)
+
+    def lookup(self, row):
+        """Class probabilities for an encoded feature row, or None if it is off the grid"""
+        position = self.position(row)
+        if position is None:
+            return None
+        return self.probabilities[position]
+
+    def heatmap(self, x, y, level=None, **at):
+        """
+        Two-dimensional slice of the surface, without any model calls
+
+        Args:
+            x, y: axis names for the columns and rows
+            level: class whose probability to show; None gives the predicted class
+            **at: grid value of every other axis, e.g. region='Region_A', month=6
+
+        Returns:
+            DataFrame indexed by the y values with one column per x value
+        """
+        missing = [name for name in self.axes if name not in (x, y) and name not in at]
+        if missing:
+            raise ValueError(f"Values needed for axes {missing}")
+
+        index = []
+        for name, values in self.axes.items():
+            if name in (x, y):
+                index.append(slice(None))
+            elif at[name] in values:
+                index.append(values.index(at[name]))
+            else:
+                raise ValueError(f"{name}={at[name]!r} is not on the grid")
+        grid = self.probabilities[tuple(index)]
+
+        if level is None:
+            grid = self.classes[grid.argmax(axis=-1)]
+        else:
+            grid = grid[..., list(self.classes).index(level)]
+        # Remaining axes keep their order in self.axes
+        if list(self.axes).index(x) < list(self.axes).index(y):
+            grid = grid.T
+
+        return pd.DataFrame(grid, index=pd.Index(self.axes[y], name=y),
+                            columns=pd.Index(self.axes[x], name=x))
+
+    def save(self, path):
+        """Write the surface to a compressed .npz through a temporary file"""
+        metadata = {
+            'format_version': SURFACE_FORMAT_VERSION,
+            'feature_names': self.feature_names,
+            'axes': self.axes,
+            'fixed': self.fixed,
+            'classes': [str(c) for c in self.classes],
+            'fingerprint': self.fingerprint
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, probabilities=self.probabilities,
+                                metadata=np.array(json.dumps(metadata, default=int)))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {self.n_points}-point risk surface to {path}")
+
+    @classmethod
+    def load(cls, path):
+        """Read a surface written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            probabilities = data['probabilities']
+        if metadata.get('format_version') != SURFACE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported risk surface format: {metadata.get('format_version')}")
+        return cls(metadata['feature_names'], metadata['axes'], metadata['fixed'],
+                   metadata['classes'], probabilities, fingerprint=metadata['fingerprint'])
+
+
+def _parse_range(text):
+    """'15:40' or '0:300:5' (inclusive) -> list of values"""
+    parts = [float(part) for part in text.split(':')]
+    start, stop, step = parts[0], parts[1], parts[2] if len(parts) > 2 else 1
+    values = np.arange(start, stop + step / 2, step)
+    return [int(v) if float(v).is_integer() else float(v) for v in values]
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    from model_io import ModelBundle
+
+    parser = argparse.ArgumentParser(description="Precompute the dashboard risk surface")
+    parser.add_argument('--model', default='malaria_model.pkl')
+    parser.add_argument('--output', default='risk_surface.npz')
+    parser.add_argument('--axis', action='append', default=[], metavar='NAME=START:STOP[:STEP]',
+                        help="grid axis replacing the defaults, repeatable "
+                             "(region takes a comma-separated list or 'all')")
+    parser.add_argument('--fixed', action='append', default=[], metavar='NAME=VALUE',
+                        help="value of a non-axis feature")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    axes = None
+    if args.axis:
+        axes = {}
+        for spec in args.axis:
+            name, _, values = spec.partition('=')
+            if name == 'region':
+                axes[name] = None if values == 'all' else values.split(',')
+            else:
+                axes[name] = _parse_range(values)
+    fixed = dict(DEFAULT_FIXED)
+    for spec in args.fixed:
+        name, _, value = spec.partition('=')
+        fixed[name] = value if name == 'region' else float(value)
+
+    bundle = ModelBundle.load(args.model)
+    surface = RiskSurface.build(bundle.model, bundle.feature_names, axes=axes, fixed=fixed)
+    surface.save(args.output)
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"Risk surface: {surface.n_points} points over {list(surface.axes)} "
+          f"({size_kb:.0f} KB) -> {args.output}")
+    return surface
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Scenario and sensitivity sweeps for what-if analysis.
+
+A sweep takes baseline records (one dashboard record or a whole region
+table) and a perturbation spec per feature: a Grid or Range of changes, or a
+Normal/Uniform Monte Carlo distribution. Grid specs are crossed into a
+Cartesian product and every grid point gets n_draws joint Monte Carlo draws,
+giving one scenario per (grid point, draw). Every scenario is applied to
+every baseline row, so the sweep is one large virtual batch of
+n_scenarios x n_rows feature rows.
+
+The batch is never materialized. Workers build each chunk of rows from the
+encoded baseline matrix and the scenario table, score it with one
+predict_proba call and fold the probabilities straight into per-scenario and
+per-row sums with np.bincount, so memory stays bounded by the chunk size.
+Chunks are spread across a process pool. Results are returned as
+DataFrames of risk-shift statistics that the dashboard renders without
+further model calls.
+"""
+import os
+import itertools
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from predict import _predict_proba_array
+
+logger = logging.getLogger(__name__)
+
+MODES = ('absolute', 'relative', 'set')
+
+# Physical limits that perturbed values are clipped to
+FEATURE_BOUNDS = {
+    'rainfall': (0, None),
+    'humidity': (0, 100),
+    'healthcare_access': (0, 1),
+    'population_density': (0, None),
+    'historical_cases': (0, None)
+}
+
+# Per-worker state of a process pool, set up once by _init_worker
+_worker_state = None
+
+
+class Grid:
+    """Fixed list of changes to a feature, crossed with the other grid specs"""
+
+    random = False
+
+    def __init__(self, values, mode='absolute'):
+        """
+        Args:
+            values: changes to apply
+            mode: 'absolute' adds each value, 'relative' scales by (1 + value)
+                (0.2 = +20%), 'set' replaces the feature with the value
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown perturbation mode: {mode}")
+        self.values = np.asarray(values, dtype=np.float64)
+        self.mode = mode
+
+    def __repr__(self):
+        return f"Grid({self.values.tolist()}, mode={self.mode!r})"
+
+
+def Range(start, stop, num=11, mode='absolute'):
+    """Grid of num evenly spaced changes from start to stop inclusive"""
+    return Grid(np.linspace(start, stop, num), mode=mode)
+
+
+class Normal:
+    """Monte Carlo change drawn from a normal distribution"""
+
+    random = True
+
+    def __init__(self, mean=0.0, std=1.0, mode='absolute'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown perturbation mode: {mode}")
+        self.mean, self.std, self.mode = mean, std, mode
+
+    def sample(self, rng, n):
+        return rng.normal(self.mean, self.std, n)
+
+    def __repr__(self):
+        return f"Normal({self.mean}, {self.std}, mode={self.mode!r})"
+
+
+class Uniform:
+    """Monte Carlo change drawn uniformly from [low, high)"""
+
+    random = True
+
+    def __init__(self, low, high, mode='absolute'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown perturbation mode: {mode}")
+        self.low, self.high, self.mode = low, high, mode
+
+    def sample(self, rng, n):
+        return rng.uniform(self.low, self.high, n)
+
+    def __repr__(self):
+        return f"Uniform({self.low}, {self.high}, mode={self.mode!r})"
+
+
+def expand_scenarios(perturbations, n_draws=100, seed=42):
+    """
+    Table of scenarios, one row per (grid point, Monte Carlo draw)
+
+    Args:
+        perturbations: dict of feature -> Grid/Range/Normal/Uniform
+        n_draws: draws per grid point for the Monte Carlo specs (ignored
+            when every spec is a grid)
+        seed: seed of the Monte Carlo draws
+
+    Returns:
+        DataFrame with one column of changes per perturbed feature
+    """
+    grid = {name: spec for name, spec in perturbations.items() if not spec.random}
+    random = {name: spec for name, spec in perturbations.items() if spec.random}
+
+    points = list(itertools.product(*(spec.values for spec in grid.values())))
+    n_draws = n_draws if random else 1
+    scenarios = pd.DataFrame(np.repeat(np.array(points, dtype=np.float64).reshape(len(points), -1),
+                                       n_draws, axis=0), columns=list(grid))
+
+    rng = np.random.default_rng(seed)
+    for name, spec in random.items():
+        scenarios[name] = spec.sample(rng, len(scenarios))
+    if random:
+        scenarios['draw'] = np.tile(np.arange(n_draws), len(points))
+    return scenarios
+
+
+def apply_changes(features, columns, modes, changes, bounds):
+    """
+    Apply one scenario's changes to each row in place
+
+    Args:
+        features: float32 matrix of encoded rows
+        columns: feature column of each perturbed feature
+        modes: MODES entry per perturbed feature
+        changes: array (n_rows, n_perturbed) of the change for each row
+        bounds: (low, high) per perturbed feature, None for unbounded
+    """
+    for k, (column, mode, (low, high)) in enumerate(zip(columns, modes, bounds)):
+        if mode == 'absolute':
+            values = features[:, column] + changes[:, k]
+        elif mode == 'relative':
+            values = features[:, column] * (1 + changes[:, k])
+        else:
+            values = changes[:, k]
+        features[:, column] = np.clip(values, low, high)
+    return features
+
+
+def _init_worker(model, *state):
+    """Pool initializer; the model is this worker's own unpickled copy"""
+    global _worker_state
+    if hasattr(model, 'n_jobs'):
+        # One process per core already; don't let each worker spawn its own joblib threads
+        model.n_jobs = 1
+    _worker_state = (model, *state)
+
+
+def _score_chunk(bounds_of_chunk):
+    """Score a chunk against the state _init_worker set up in this pool worker"""
+    return _score_chunk_with(_worker_state, bounds_of_chunk)
+
+
+def _score_chunk_with(state, bounds_of_chunk):
+    """Score flat rows [start, stop) of the virtual batch and fold them into partial sums"""
+    model, base, columns, modes, changes, bounds, base_codes, ranks = state
+    start, stop = bounds_of_chunk
+    n_rows, n_classes = len(base), len(ranks)
+
+    flat = np.arange(start, stop)
+    scenario, row = np.divmod(flat, n_rows)
+    features = apply_changes(base[row], columns, modes, changes[scenario], bounds)
+    # A chunk covers a contiguous run of scenarios; only those are returned
+    first = scenario[0]
+    scenario = scenario - first
+    n_scenarios = scenario[-1] + 1
+    probability = _predict_proba_array(model, features)
+    predicted = probability.argmax(axis=1)
+    escalated = ranks[predicted] > ranks[base_codes[row]]
+    deescalated = ranks[predicted] < ranks[base_codes[row]]
+
+    def sums(index, size, weights):
+        return np.bincount(index, weights=weights, minlength=size)
+
+    return first, {
+        'scenario_probability': np.stack([sums(scenario, n_scenarios, probability[:, c])
+                                          for c in range(n_classes)], axis=1),
+        'scenario_predicted': np.bincount(scenario * n_classes + predicted,
+                                          minlength=n_scenarios * n_classes
+                                          ).reshape(n_scenarios, n_classes),
+        'scenario_escalated': sums(scenario, n_scenarios, escalated),
+        'scenario_deescalated': sums(scenario, n_scenarios, deescalated),
+        'row_probability': np.stack([sums(row, n_rows, probability[:, c])
+                                     for c in range(n_classes)], axis=1),
+        'row_escalated': sums(row, n_rows, escalated),
+        'row_deescalated': sums(row, n_rows, deescalated)
+    }
+
+
+class ScenarioEngine:
+    """Sweeps perturbation scenarios over baseline records with a process pool"""
+
+    def __init__(self, predictor, n_jobs=1, chunk_size=50000):
+        """
+        Args:
+            predictor: loaded MalariaPredictor; its engine scores the sweep
+            n_jobs: worker processes, 1 scores in this process and -1 uses all CPUs
+            chunk_size: rows of the virtual batch per predict_proba call
+        """
+        self.predictor = predictor
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else n_jobs
+        self.chunk_size = chunk_size
+
+    def run(self, baseline, perturbations, n_draws=100, seed=42):
+        """
+        Score every scenario against every baseline row
+
+        Args:
+            baseline: dict, list of dicts or DataFrame of raw records
+            perturbations: dict of feature -> Grid/Range/Normal/Uniform
+            n_draws: Monte Carlo draws per grid point
+            seed: seed of the Monte Carlo draws
+
+        Returns:
+            dict with 'levels' (risk levels in order), 'baseline' (predicted
+            level and probabilities per row), 'scenarios' (the changes plus,
+            averaged over the rows, prob_<level>, shift_<level> against the
+            baseline, the share of rows predicted at each level and the
+            escalated/deescalated shares), 'rows' (the same shifts per
+            baseline row, averaged over the scenarios) and 'summary' (the
+            shifts per grid point with Monte Carlo percentiles)
+        """
+        predictor = self.predictor
+        pinned = predictor._pin()
+        try:
+            predictor._check_model_loaded()
+            return self._run(baseline, perturbations, n_draws, seed)
+        finally:
+            predictor._unpin(pinned)
+
+    def _run(self, baseline, perturbations, n_draws, seed):
+        """run() on the pinned model"""
+        predictor = self.predictor
+        schema = predictor.schema
+        numeric = dict(schema.numeric_columns)
+        unknown = [name for name in perturbations if name not in numeric]
+        if unknown:
+            raise ValueError(f"Cannot perturb {unknown}; expected numeric features of the model")
+
+        records = [baseline] if isinstance(baseline, dict) else baseline
+        base = predictor._align_features(records)
+        index = records.index if hasattr(records, 'columns') else None
+        scenarios = expand_scenarios(perturbations, n_draws, seed)
+        names = list(perturbations)
+        changes = scenarios[names].to_numpy(dtype=np.float64)
+        columns = [numeric[name] for name in names]
+        modes = [perturbations[name].mode for name in names]
+        bounds = [FEATURE_BOUNDS.get(name, (None, None)) for name in names]
+
+        model = (predictor._compiled_forest() if predictor.engine == 'compiled'
+                 else predictor.trainer.model)
+        levels = predictor._ordered_levels()
+        ranks = np.empty(len(levels), dtype=np.intp)
+        for rank, (_, column) in enumerate(levels):
+            ranks[column] = rank
+        base_probability = _predict_proba_array(model, base)
+        base_codes = base_probability.argmax(axis=1)
+
+        n_total = len(scenarios) * len(base)
+        chunks = [(start, min(start + self.chunk_size, n_total))
+                  for start in range(0, n_total, self.chunk_size)]
+        initargs = (model, base, columns, modes, changes, bounds, base_codes, ranks)
+        if self.n_jobs == 1 or len(chunks) == 1:
+            # The live model and this module are shared with other sessions, so the
+            # state travels with each call instead of through _worker_state
+            totals = self._sum(map(functools.partial(_score_chunk_with, initargs), chunks),
+                               len(scenarios), len(base), len(ranks))
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                totals = self._sum(executor.map(_score_chunk, chunks),
+                                   len(scenarios), len(base), len(ranks))
+        logger.info(f"Scored {len(scenarios)} scenarios x {len(base)} rows in {len(chunks)} chunks")
+
+        grid = [name for name in names if not perturbations[name].random]
+        return self._format(predictor, levels, scenarios, grid, index, base_probability, totals)
+
+    @staticmethod
+    def _sum(parts, n_scenarios, n_rows, n_classes):
+        """Add up the workers' partial sums as they arrive"""
+        totals = {
+            'scenario_probability': np.zeros((n_scenarios, n_classes)),
+            'scenario_predicted': np.zeros((n_scenarios, n_classes)),
+            'scenario_escalated': np.zeros(n_scenarios),
+            'scenario_deescalated': np.zeros(n_scenarios),
+            'row_probability': np.zeros((n_rows, n_classes)),
+            'row_escalated': np.zeros(n_rows),
+            'row_deescalated': np.zeros(n_rows)
+        }
+        for first, part in parts:
+            for name, value in part.items():
+                if name.startswith('scenario_'):
+                    totals[name][first:first + len(value)] += value
+                else:
+                    totals[name] += value
+        return totals
+
+    @staticmethod
+    def _format(predictor, levels, scenarios, grid, index, base_probability, totals):
+        """Turn the summed counts into DataFrames of risk-shift statistics"""
+        n_scenarios, n_rows = len(scenarios), len(base_probability)
+        classes = predictor.trainer.model.classes_
+        baseline = pd.DataFrame({'risk_level': classes[base_probability.argmax(axis=1)]}, index=index)
+
+        scenario_stats = scenarios.copy()
+        rows = pd.DataFrame(index=baseline.index)
+        for level, i in levels:
+            baseline[f'prob_{level}'] = base_probability[:, i]
+        for level, i in levels:
+            scenario_stats[f'prob_{level}'] = totals['scenario_probability'][:, i] / n_rows
+            scenario_stats[f'shift_{level}'] = (scenario_stats[f'prob_{level}']
+                                                - base_probability[:, i].mean())
+        for level, i in levels:
+            scenario_stats[f'share_{level}'] = totals['scenario_predicted'][:, i] / n_rows
+        scenario_stats['escalated'] = totals['scenario_escalated'] / n_rows
+        scenario_stats['deescalated'] = totals['scenario_deescalated'] / n_rows
+        for level, i in levels:
+            rows[f'prob_{level}'] = totals['row_probability'][:, i] / n_scenarios
+            rows[f'shift_{level}'] = rows[f'prob_{level}'].to_numpy() - base_probability[:, i]
+        rows['escalated'] = totals['row_escalated'] / n_scenarios
+        rows['deescalated'] = totals['row_deescalated'] / n_scenarios
+
+        return {
+            'levels': [level for level, _ in levels],
+            'baseline': baseline,
+            'scenarios': scenario_stats,
+            'rows': rows,
+            'summary': summarize(scenario_stats, [level for level, _ in levels], grid)
+        }
+
+
+def summarize(scenarios, levels, grid, percentiles=(5, 95)):
+    """
+    Risk shifts per grid point, with Monte Carlo percentiles across draws
+
+    Args:
+        scenarios: 'scenarios' DataFrame of ScenarioEngine.run
+        levels: risk levels in order
+        grid: columns of the grid specs
+        percentiles: percentiles of each shift across the draws of a grid point
+
+    Returns:
+        DataFrame indexed by the grid columns (one 'all' row if there are none)
+    """
+    statistics = [f'shift_{level}' for level in levels] + ['escalated', 'deescalated']
+    keys = list(grid) if grid else pd.Series('all', index=scenarios.index, name='scenarios')
+    groups = scenarios.groupby(keys, sort=False)[statistics]
+
+    summary = groups.mean()
+    if 'draw' in scenarios.columns:
+        for q in percentiles:
+            summary = summary.join(groups.quantile(q / 100).add_suffix(f'_p{q}'))
+    return summary
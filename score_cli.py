@@ -0,0 +1,100 @@
+"""
+Streaming batch scorer for large CSV/Parquet files of raw region/climate records.
+
+Reads the input in fixed-size chunks, encodes each chunk with the model's
+FeatureSchema (the same region one-hot encoding as
+MalariaDataLoader.preprocess_data), scores it with MalariaPredictor.predict_batch
+and appends the results to the output file, so memory stays bounded by the
+chunk size rather than the file size.
+
+Usage:
+    python score_cli.py records.csv scored.csv --chunk-size 50000
+    python score_cli.py records.parquet scored.parquet --model malaria_model
+"""
+import sys
+import time
+import logging
+import argparse
+import resource
+import pandas as pd
+from predict import MalariaPredictor
+from chunked_io import iter_chunks, ChunkWriter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def score_file(input_path, output_path, predictor, chunk_size=50000):
+    """
+    Score a file of raw records chunk by chunk
+
+    Args:
+        input_path: CSV or Parquet file with raw records (region, climate fields, ...)
+        output_path: CSV or Parquet file receiving the input columns plus predictions
+        predictor: loaded MalariaPredictor
+        chunk_size: rows read, scored and written at a time
+
+    Returns:
+        dict with rows, chunks, seconds, rows_per_sec and peak_rss_mb
+    """
+    schema = predictor.schema
+    rows = chunks = 0
+    start = time.perf_counter()
+
+    with ChunkWriter(output_path) as writer:
+        for chunk in iter_chunks(input_path, chunk_size):
+            features = schema.transform_frame(chunk)
+            predictions = predictor.predict_batch(features, chunk_size=chunk_size)
+            writer.write(pd.concat([chunk.reset_index(drop=True),
+                                    predictions.reset_index(drop=True)], axis=1))
+            rows += len(chunk)
+            chunks += 1
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'chunks': chunks,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Score malaria outbreak risk for a CSV/Parquet file")
+    parser.add_argument('input', help="CSV or Parquet file of raw records")
+    parser.add_argument('output', help="CSV or Parquet file to write results to")
+    parser.add_argument('--model', default='malaria_model.pkl',
+                        help="model pickle or mmap artifact directory")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="rows per chunk")
+    parser.add_argument('--engine', choices=['sklearn', 'compiled'], default='sklearn',
+                        help="inference engine")
+    parser.add_argument('--missing', choices=['zero', 'error'], default='zero',
+                        help="how to handle absent or empty feature values")
+    parser.add_argument('--unknown-region', choices=['error', 'ignore'], default='error',
+                        help="how to handle regions the model was not trained on")
+    args = parser.parse_args(argv)
+
+    predictor = MalariaPredictor(args.model, engine=args.engine, missing=args.missing,
+                                 unknown_region=args.unknown_region)
+    if predictor.trainer is None:
+        parser.error(f"could not load model from {args.model}")
+
+    stats = score_file(args.input, args.output, predictor, chunk_size=args.chunk_size)
+
+    print(f"\n✅ Scored {stats['rows']:,} rows in {stats['chunks']} chunks "
+          f"({stats['seconds']:.1f}s, {stats['rows_per_sec']:,.0f} rows/sec)")
+    print(f"Peak RSS: {stats['peak_rss_mb']:.1f} MB")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Async HTTP scoring service with micro-batching.
+
+Runs next to the Streamlit UI so other systems can reach the model over
+HTTP. Concurrent requests are collected into micro-batches (bounded by a
+maximum batch size and a maximum wait), and each batch is scored with one
+probability call in a thread pool so the event loop never blocks.
+
+Endpoints:
+    POST /predict  JSON record, or a JSON list of records
+    GET  /metrics  latency percentiles and batch-size histogram
+    GET  /metrics/prometheus  instrumentation spans and counters (Prometheus text)
+    GET  /drift    latest input/prediction drift scores (with --monitor)
+    GET  /health   liveness check
+
+Usage:
+    python scoring_service.py --port 8080 --max-batch-size 64 --max-wait-ms 5
+    python scoring_service.py --registry model_registry
+"""
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from predict import MalariaPredictor
+from model_registry import ModelRegistry
+from instrumentation import instrumentation
+from drift import DriftMonitor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class ServiceMetrics:
+    """Request latency and batch size statistics"""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_records = 0
+
+    def record_latency(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_records += size
+        # Power-of-two buckets: 1, 2, 4, 8, ...
+        self.batch_sizes[1 << (size - 1).bit_length()] += 1
+
+    def snapshot(self):
+        """Return the metrics as a JSON-serializable dict"""
+        latencies_ms = np.asarray(self.latencies) * 1000
+        percentiles = {}
+        if len(latencies_ms):
+            percentiles = {f'p{q}_ms': float(np.percentile(latencies_ms, q)) for q in (50, 90, 99)}
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'batches': self.batches,
+            'mean_batch_size': self.batched_records / self.batches if self.batches else 0.0,
+            'latency': percentiles,
+            'batch_size_histogram': {f'<={size}': count
+                                     for size, count in sorted(self.batch_sizes.items())}
+        }
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches scored with one probability call"""
+
+    def __init__(self, predictor, max_batch_size=64, max_wait_ms=5.0, n_threads=2,
+                 metrics=None):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServiceMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=n_threads,
+                                            thread_name_prefix='scoring')
+        self._queue = None
+        self._arrived = None
+        self._task = None
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._arrived = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and the scoring threads"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, record):
+        """
+        Score one raw record
+
+        The record is encoded immediately, so a bad request fails on its own
+        instead of failing the whole batch it would have joined.
+        """
+        row = self.predictor.schema.transform_record(record)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        self._arrived.set()
+        return await future
+
+    async def _collect(self):
+        """Wait for one request, then gather more until the batch is full or the wait expires"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while True:
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                return batch
+
+            # Waiting on an Event rather than queue.get() means a timeout can
+            # never swallow a request
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _score(self, features):
+        """Score one batch on a scoring thread, under cProfile if sampled"""
+        with instrumentation.profiled('micro_batch'):
+            return self.predictor.predict_encoded(features)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            features = np.vstack([row for row, _ in batch])
+            self.metrics.record_batch(len(batch))
+            try:
+                results = await loop.run_in_executor(self._executor, self._score, features)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ScoringService:
+    """Minimal asyncio HTTP/1.1 server in front of a MicroBatcher"""
+
+    def __init__(self, predictor, max_batch_size=64, max_wait_ms=5.0, n_threads=2):
+        self.predictor = predictor
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(predictor, max_batch_size, max_wait_ms, n_threads,
+                                    metrics=self.metrics)
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start listening; port=0 picks a free port"""
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Scoring service listening on http://{host}:{self.port}")
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def predict(self, payload):
+        """Score one record or a list of records, adding recommendations"""
+        records = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(record, dict) for record in records):
+            raise ValueError("Expected a JSON object or a list of JSON objects")
+
+        results = await asyncio.gather(*(self.batcher.submit(record) for record in records))
+        for result in results:
+            result['recommendations'] = self.predictor.get_risk_recommendations(result['risk_level'])
+        return results if isinstance(payload, list) else results[0]
+
+    def drift(self):
+        """Latest scored drift window of the predictor's monitor, as JSON"""
+        monitor = self.predictor.monitor
+        if not isinstance(monitor, DriftMonitor):
+            return {'enabled': False}
+        response = {'enabled': True, 'dropped': monitor.dropped, 'window': None}
+        if monitor.history:
+            window = monitor.history[-1]
+            response['window'] = {
+                'time': window['time'],
+                'n': window['n'],
+                'scores': json.loads(window['scores'].to_json(orient='index'))
+            }
+        return response
+
+    async def _route(self, method, path, body):
+        """Return (status, response object) for one request"""
+        if path == '/health':
+            return 200, {'status': 'ok', 'model_version': self.predictor.model_version}
+        if path == '/metrics':
+            return 200, self.metrics.snapshot()
+        if path == '/metrics/prometheus':
+            return 200, instrumentation.export_prometheus()
+        if path == '/drift':
+            return 200, self.drift()
+        if path != '/predict':
+            return 404, {'error': f"Unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST /predict"}
+
+        start = time.perf_counter()
+        try:
+            with instrumentation.span('http.predict'):
+                response = await self.predict(json.loads(body or b'null'))
+        except (ValueError, TypeError) as e:
+            self.metrics.errors += 1
+            instrumentation.inc('malaria_http_requests_total', status=400)
+            return 400, {'error': str(e)}
+        self.metrics.record_latency(time.perf_counter() - start)
+        instrumentation.inc('malaria_http_requests_total', status=200)
+        return 200, response
+
+    async def _handle_connection(self, reader, writer):
+        """Serve keep-alive HTTP/1.1 requests on one connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    status, response = await self._route(method, path.split('?')[0], body)
+                except Exception as e:
+                    logger.exception("Scoring request failed")
+                    self.metrics.errors += 1
+                    status, response = 500, {'error': str(e)}
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version == 'HTTP/1.1')
+                if isinstance(response, str):
+                    payload, content_type = response.encode(), 'text/plain; version=0.0.4'
+                else:
+                    payload, content_type = json.dumps(response).encode(), 'application/json'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(args):
+    if args.registry:
+        predictor = MalariaPredictor(engine=args.engine, registry=ModelRegistry(args.registry),
+                                     monitor=args.monitor or None)
+    else:
+        predictor = MalariaPredictor(args.model, engine=args.engine, monitor=args.monitor or None)
+    if predictor.trainer is None:
+        raise SystemExit(f"Could not load model from {args.registry or args.model}")
+
+    service = ScoringService(predictor, args.max_batch_size, args.max_wait_ms, args.threads)
+    await service.start(args.host, args.port)
+    await service.serve_forever()
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP scoring service")
+    parser.add_argument('--model', default='malaria_model.pkl',
+                        help="model pickle or mmap artifact directory")
+    parser.add_argument('--registry', default=None,
+                        help="serve the active version of a model registry, hot-swapping "
+                             "new versions (overrides --model)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=2, help="scoring threads")
+    parser.add_argument('--engine', choices=['sklearn', 'compiled'], default='compiled',
+                        help="inference engine")
+    parser.add_argument('--monitor', action='store_true',
+                        help="track input and prediction drift against the model's "
+                             "reference profile (GET /drift)")
+    parser.add_argument('--instrument', action='store_true',
+                        help="record timing spans for /metrics/prometheus")
+    parser.add_argument('--profile-rate', type=float, default=None,
+                        help="fraction of batches to run under cProfile")
+    parser.add_argument('--profile-dir', default=None, help="directory for .prof files")
+    args = parser.parse_args(argv)
+
+    if args.instrument or args.profile_rate:
+        instrumentation.configure(enabled=True, profile_rate=args.profile_rate,
+                                  profile_dir=args.profile_dir)
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,34 @@
+import os
+import sys
+import json
+import asyncio
+import subprocess
+import tempfile
+import time
+import threading
 import unittest
 import pandas as pd
 import numpy as np
-from data_loader import MalariaDataLoader
-from model_trainer import MalariaModelTrainer
-from predict import MalariaPredictor
+from sklearn.model_selection import ParameterGrid
+from data_loader import MalariaDataLoader, PanelFeatureEngine, compact_dtypes, memory_mb
+from model_trainer import MalariaModelTrainer, _compression_stats
+from predict import MalariaPredictor, _predict_proba_array
+from forest_engine import CompiledForest, load_compiled_forest, load_forest_arrays
+from model_cache import ModelCache, model_cache
+from prediction_cache import PredictionCache
+from score_cli import score_file
+from parallel_scoring import ParallelScorer
+from feature_schema import FeatureSchema
+from scoring_service import ScoringService
+from load_test import HttpConnection, run_load_test, SAMPLE_RECORD
+from tuning import SuccessiveHalvingSearch
+from benchmark import build_predictor, run_suite, compare_to_baseline
+from instrumentation import instrumentation, MetricsRegistry
+from evaluation import evaluate_model, evaluate_predictions
+from risk_surface import RiskSurface
+from model_registry import ModelRegistry
+from scenarios import ScenarioEngine, Grid, Range, Normal, Uniform, expand_scenarios
+from drift import DriftMonitor, DriftProfile, psi, shared_monitor
 
 class TestMalariaPredictionSystem(unittest.TestCase):
     """Comprehensive tests for the malaria prediction system"""
@@ -64,39 +89,1488 @@ class TestMalariaPredictionSystem(unittest.TestCase):
         self.assertIn('confidence', result)
         self.assertIn(result['risk_level'], ['Low', 'Medium', 'High'])
 
-def run_bias_audit():
-    """Audit model for potential biases"""
-    print("🔍 Running Bias Audit...")
-    
-    loader = MalariaDataLoader()
-    data = loader.generate_sample_data(1000)
-    
-    # Check distribution across regions
-    region_risk = pd.crosstab(data['region'], data['outbreak_risk'], normalize='index')
-    print("\nRisk Distribution by Region:")
-    print(region_risk)
-    
-    # Check for fairness in predictions
-    features, target = loader.preprocess_data()
-    X_train, X_test, y_train, y_test = loader.train_test_split()
+        # Probabilities are labelled via model.classes_ (alphabetical in sklearn)
+        # but reported in risk_levels order
+        model = self.model_trainer.model
+        proba = model.predict_proba(test_input)[0]
+        self.assertEqual(list(result['probabilities']), ['Low', 'Medium', 'High'])
+        for i, level in enumerate(model.classes_):
+            self.assertEqual(result['probabilities'][level], f"{proba[i]:.3f}")
+        self.assertEqual(result['risk_level'], model.predict(test_input)[0])
+
+    def test_batch_prediction(self):
+        """Test batch prediction from DataFrame, array and list of dicts"""
+        self.data_loader.generate_sample_data(200)
+        features, target = self.data_loader.preprocess_data()
+        X_train, X_test, y_train, y_test = self.data_loader.train_test_split()
+        self.model_trainer.train_model(X_train, y_train)
+
+        predictor = MalariaPredictor()
+        predictor.trainer = self.model_trainer
+
+        results = predictor.predict_batch(X_test, chunk_size=7)
+
+        self.assertEqual(len(results), len(X_test))
+        self.assertTrue(results['risk_level'].isin(['Low', 'Medium', 'High']).all())
+        np.testing.assert_array_equal(results['risk_level'].values,
+                                      self.model_trainer.model.predict(X_test))
+
+        # All input forms give the same scores
+        from_array = predictor.predict_batch(X_test.to_numpy(dtype=float))
+        from_records = predictor.predict_batch(X_test.to_dict('records'))
+        np.testing.assert_allclose(from_array['prob_High'].values, results['prob_High'].values)
+        np.testing.assert_allclose(from_records['prob_High'].values, results['prob_High'].values)
+
+        # Missing columns are filled and the caller's frame is left untouched
+        partial = X_test.drop(columns=['month'])
+        predictor.predict_batch(partial)
+        self.assertNotIn('month', partial.columns)
+
+    def test_inference_imports_stay_light(self):
+        """Importing predict must not pull in training or plotting libraries"""
+        code = ("import sys, predict; "
+                "print(' '.join(m for m in ('pandas', 'sklearn', 'matplotlib', 'seaborn') "
+                "if m in sys.modules))")
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                   text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(completed.stdout.split(), [])
+
+class TestFeatureSchema(unittest.TestCase):
+    """Tests for the precompiled raw-record to feature-row mapping"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        cls.raw = loader.generate_sample_data(100)
+        cls.features, target = loader.preprocess_data()
+        cls.schema = FeatureSchema(cls.features.columns)
+
+    def test_matches_preprocess_data(self):
+        """Raw and pre-encoded inputs in every form give the preprocess_data matrix"""
+        expected = self.features.to_numpy(dtype=np.float32)
+        for data in (self.raw, self.features,
+                     self.raw.to_dict('records'), self.features.to_dict('records')):
+            matrix = self.schema.transform(data)
+            self.assertEqual(matrix.dtype, np.float32)
+            np.testing.assert_array_equal(matrix, expected)
+
+    def test_preallocated_row(self):
+        """transform_record writes into the buffer it is given"""
+        row = np.full(self.schema.n_features, 7, dtype=np.float32)
+        result = self.schema.transform_record(self.raw.iloc[0].to_dict(), out=row)
+        self.assertIs(result, row)
+        np.testing.assert_array_equal(row, self.features.iloc[0].to_numpy(dtype=np.float32))
+
+    def test_unknown_region_policy(self):
+        """Unknown regions raise by default and encode as all zeros when ignored"""
+        record = dict(self.raw.iloc[0].to_dict(), region='Region_Z')
+        with self.assertRaises(ValueError):
+            self.schema.transform_record(record)
+        with self.assertRaises(ValueError):
+            self.schema.transform_frame(pd.DataFrame([record]))
+
+        lenient = FeatureSchema(self.features.columns, unknown_region='ignore')
+        row = lenient.transform_record(record)
+        self.assertEqual(row[list(lenient.region_columns.values())].sum(), 0)
+
+    def test_missing_policy(self):
+        """Missing fields are zero-filled by default or rejected when strict"""
+        record = self.raw.iloc[0].to_dict()
+        del record['rainfall']
+        row = self.schema.transform_record(record)
+        self.assertEqual(row[self.schema.index['rainfall']], 0)
+
+        strict = FeatureSchema(self.features.columns, missing='error')
+        with self.assertRaisesRegex(ValueError, 'rainfall'):
+            strict.transform_record(record)
+        frame = self.raw.copy()
+        frame.loc[3, 'humidity'] = np.nan
+        with self.assertRaisesRegex(ValueError, 'humidity'):
+            strict.transform_frame(frame)
+
+class TestCompiledForest(unittest.TestCase):
+    """Parity tests for the flat-array forest engine against sklearn"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(300)
+        loader.preprocess_data()
+        X_train, cls.X_test, y_train, y_test = loader.train_test_split()
+        cls.trainer = MalariaModelTrainer()
+        cls.trainer.train_model(X_train, y_train, n_estimators=25)
+        cls.forest = CompiledForest.from_sklearn(cls.trainer.model)
+
+    def test_probability_parity(self):
+        """Compiled probabilities match predict_proba on held-out data"""
+        np.testing.assert_allclose(self.forest.predict_proba(self.X_test),
+                                   self.trainer.model.predict_proba(self.X_test),
+                                   atol=1e-9)
+        np.testing.assert_array_equal(self.forest.predict(self.X_test),
+                                      self.trainer.model.predict(self.X_test))
+
+    def test_probability_parity_off_distribution(self):
+        """Parity holds for extreme inputs and threshold ties"""
+        rng = np.random.default_rng(0)
+        X = rng.normal(0, 500, size=(500, len(self.trainer.feature_names)))
+        # Put some values exactly on split thresholds
+        tree = self.trainer.model.estimators_[0].tree_
+        split = tree.feature[0]
+        X[:50, split] = tree.threshold[0]
+        X_df = pd.DataFrame(X, columns=self.trainer.feature_names)
+
+        np.testing.assert_allclose(self.forest.predict_proba(X),
+                                   self.trainer.model.predict_proba(X_df),
+                                   atol=1e-9)
+
+    def test_chunked_scoring(self):
+        """Chunk boundaries do not change the result"""
+        small_chunks = CompiledForest.from_sklearn(self.trainer.model, chunk_size=7)
+        np.testing.assert_allclose(small_chunks.predict_proba(self.X_test),
+                                   self.forest.predict_proba(self.X_test))
+
+    def test_load_from_saved_model(self):
+        """A model saved by the trainer compiles straight from disk"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.pkl')
+            self.trainer.save_model(path)
+            forest, feature_names, risk_levels = load_compiled_forest(path)
+
+        self.assertEqual(feature_names, self.trainer.feature_names)
+        np.testing.assert_allclose(forest.predict_proba(self.X_test),
+                                   self.trainer.model.predict_proba(self.X_test),
+                                   atol=1e-9)
+
+    def test_predictor_compiled_engine(self):
+        """MalariaPredictor gives the same answers with either engine"""
+        sklearn_predictor = MalariaPredictor(model_path=None)
+        sklearn_predictor.trainer = self.trainer
+        compiled_predictor = MalariaPredictor(model_path=None, engine='compiled')
+        compiled_predictor.trainer = self.trainer
+
+        expected = sklearn_predictor.predict_batch(self.X_test)
+        actual = compiled_predictor.predict_batch(self.X_test)
+        pd.testing.assert_frame_equal(actual, expected, atol=1e-9)
+
+        row = self.X_test.iloc[0:1]
+        self.assertEqual(compiled_predictor.predict_risk(row),
+                         sklearn_predictor.predict_risk(row))
+
+class TestMmapArtifact(unittest.TestCase):
+    """Tests for the memory-mappable model artifact format"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(200)
+        loader.preprocess_data()
+        X_train, cls.X_test, y_train, y_test = loader.train_test_split()
+        cls.trainer = MalariaModelTrainer()
+        cls.trainer.train_model(X_train, y_train, n_estimators=10)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'model')
+        self.trainer.save_model(self.path, format='mmap')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_is_memory_mapped(self):
+        """Arrays load as read-only memory maps and score like the original model"""
+        forest, manifest = load_forest_arrays(self.path)
+
+        self.assertIsInstance(forest.value, np.memmap)
+        self.assertFalse(forest.value.flags.writeable)
+        # The derived lookup tables are mapped too, not rebuilt on this process's heap
+        self.assertIsInstance(forest._children, np.memmap)
+        self.assertIsInstance(forest._threshold32, np.memmap)
+        self.assertEqual(manifest['feature_names'], self.trainer.feature_names)
+        self.assertEqual(manifest['classes'], list(self.trainer.model.classes_))
+        np.testing.assert_allclose(forest.predict_proba(self.X_test),
+                                   self.trainer.model.predict_proba(self.X_test),
+                                   atol=1e-9)
+
+    def test_predictor_loads_artifact(self):
+        """MalariaPredictor accepts an artifact directory as model_path"""
+        predictor = MalariaPredictor(model_path=self.path, use_cache=True)
+        reference = MalariaPredictor(model_path=None)
+        reference.trainer = self.trainer
+
+        row = self.X_test.iloc[0].to_dict()
+        result, expected = predictor.predict_risk(row), reference.predict_risk(row)
+        # Results name the model they came from: the artifact's path and mtime
+        self.assertTrue(result.pop('model_version').startswith(os.path.abspath(self.path)))
+        expected.pop('model_version')
+        self.assertEqual(result, expected)
+
+    def test_corrupt_artifact_is_rejected(self):
+        """Checksums are verified before the arrays are mapped"""
+        with open(os.path.join(self.path, 'threshold.npy'), 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+
+        with self.assertRaises(ValueError):
+            load_forest_arrays(self.path)
+
+    def test_unknown_format_version_is_rejected(self):
+        """Artifacts from a newer format are not silently misread"""
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['format_version'] = 99
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+        with self.assertRaises(ValueError):
+            load_forest_arrays(self.path)
+
+    def test_version_1_artifact_rebuilds_lookup_tables(self):
+        """Artifacts written before the lookup tables were stored still load and score the same"""
+        expected, _ = load_forest_arrays(self.path)
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['format_version'] = 1
+        for name in ('children', 'threshold32'):
+            os.remove(os.path.join(self.path, manifest['arrays'].pop(name)['file']))
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+        forest, _ = load_forest_arrays(self.path)
+        self.assertNotIsInstance(forest._children, np.memmap)
+        np.testing.assert_array_equal(forest._children, expected._children)
+        np.testing.assert_array_equal(forest._threshold32, expected._threshold32)
+        np.testing.assert_array_equal(forest.predict_proba(self.X_test),
+                                      expected.predict_proba(self.X_test))
+
+class TestModelCache(unittest.TestCase):
+    """Tests for the process-wide model cache"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(200)
+        loader.preprocess_data()
+        X_train, X_test, y_train, y_test = loader.train_test_split()
+        cls.trainer = MalariaModelTrainer()
+        cls.trainer.train_model(X_train, y_train, n_estimators=10)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'model.pkl')
+        self.trainer.save_model(self.path)
+        self.cache = ModelCache()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_loads_once_across_threads(self):
+        """Concurrent lookups share a single load"""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get(self.path)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.cache.stats()['load_count'], 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_reloads_when_file_changes(self):
+        """A newer modification time triggers a reload"""
+        first = self.cache.get(self.path)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = self.cache.get(self.path)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(self.cache.stats()['load_count'], 2)
+
+    def test_missing_file(self):
+        """Missing files raise FileNotFoundError like joblib.load"""
+        with self.assertRaises(FileNotFoundError):
+            self.cache.get(os.path.join(self.tmp.name, 'missing.pkl'))
+
+class TestPredictionCache(unittest.TestCase):
+    """Tests for the LRU/TTL prediction result cache"""
+
+    def test_lru_eviction_and_counters(self):
+        """The least recently used entry is evicted first"""
+        cache = PredictionCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        """Entries expire after ttl seconds"""
+        now = [0.0]
+        cache = PredictionCache(ttl=10, clock=lambda: now[0])
+        cache.put('a', 1)
+        now[0] = 9.9
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 10.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_key_canonicalization(self):
+        """Float noise shares a key, a different model version does not"""
+        cache = PredictionCache()
+        key = cache.make_key([0.1 + 0.2, 1, 0], 'v1')
+        self.assertEqual(key, cache.make_key(np.array([0.3, 1.0, -0.0]), 'v1'))
+        self.assertNotEqual(key, cache.make_key([0.3, 1, 0], 'v2'))
+
+    def test_predictor_uses_cache(self):
+        """Repeated inputs are served from the cache and results are not shared"""
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(200)
+        loader.preprocess_data()
+        X_train, X_test, y_train, y_test = loader.train_test_split()
+        trainer = MalariaModelTrainer()
+        trainer.train_model(X_train, y_train, n_estimators=10)
+
+        cache = PredictionCache()
+        predictor = MalariaPredictor(model_path=None, result_cache=cache)
+        predictor.trainer = trainer
+        record = X_test.iloc[0].to_dict()
+
+        first = predictor.predict_risk(record)
+        first['probabilities']['High'] = 'mutated'
+        second = predictor.predict_risk(record)
+
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertNotEqual(second['probabilities']['High'], 'mutated')
+
+        # Swapping the model changes the version and bypasses old entries
+        retrained = MalariaModelTrainer()
+        retrained.train_model(X_train, y_train, n_estimators=5)
+        predictor.trainer = retrained
+        predictor.predict_risk(record)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+class TestScoreCli(unittest.TestCase):
+    """Tests for the streaming chunked scorer"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        cls.raw = loader.generate_sample_data(300)
+        features, target = loader.preprocess_data()
+        X_train, X_test, y_train, y_test = loader.train_test_split()
+        trainer = MalariaModelTrainer()
+        trainer.train_model(X_train, y_train, n_estimators=10)
+
+        cls.predictor = MalariaPredictor(model_path=None)
+        cls.predictor.trainer = trainer
+        cls.expected = cls.predictor.predict_batch(features)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _score(self, extension):
+        input_path = os.path.join(self.tmp.name, f'records.{extension}')
+        output_path = os.path.join(self.tmp.name, f'scored.{extension}')
+        if extension == 'csv':
+            self.raw.to_csv(input_path, index=False)
+        else:
+            self.raw.astype({'outbreak_risk': str}).to_parquet(input_path, index=False)
+
+        stats = score_file(input_path, output_path, self.predictor, chunk_size=37)
+        scored = (pd.read_csv(output_path) if extension == 'csv'
+                  else pd.read_parquet(output_path))
+        return stats, scored
+
+    def test_csv_matches_in_memory_scoring(self):
+        """Chunked CSV scoring gives the same results as one in-memory batch"""
+        stats, scored = self._score('csv')
+
+        self.assertEqual(stats['rows'], len(self.raw))
+        self.assertEqual(stats['chunks'], 9)
+        self.assertGreater(stats['peak_rss_mb'], 0)
+        self.assertEqual(list(scored['region']), list(self.raw['region']))
+        np.testing.assert_array_equal(scored['risk_level'], self.expected['risk_level'])
+        np.testing.assert_allclose(scored['prob_High'], self.expected['prob_High'])
+
+    def test_parquet_matches_in_memory_scoring(self):
+        """Chunked Parquet scoring gives the same results as one in-memory batch"""
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        stats, scored = self._score('parquet')
+
+        self.assertEqual(stats['rows'], len(self.raw))
+        np.testing.assert_array_equal(scored['risk_level'], self.expected['risk_level'])
+        np.testing.assert_allclose(scored['prob_High'], self.expected['prob_High'])
+
+class TestParallelScorer(unittest.TestCase):
+    """Tests for multi-process batch scoring"""
+
+    def test_matches_single_process_in_order(self):
+        """Results from the pool come back complete and in input order"""
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(300)
+        features, target = loader.preprocess_data()
+        X_train, X_test, y_train, y_test = loader.train_test_split()
+        trainer = MalariaModelTrainer()
+        trainer.train_model(X_train, y_train, n_estimators=10)
+
+        predictor = MalariaPredictor(model_path=None)
+        predictor.trainer = trainer
+        expected = predictor.predict_batch(features)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model')
+            trainer.save_model(path, format='mmap')
+            with ParallelScorer(path, n_workers=2, chunk_size=17) as scorer:
+                results = scorer.score(features)
+                # A second batch reuses the same workers
+                repeat = scorer.score(features.iloc[:40])
+
+        # The pool tags rows with the artifact's version, the in-memory model with its own
+        self.assertTrue(results['model_version'].str.startswith(path).all())
+        expected = expected.drop(columns='model_version')
+        pd.testing.assert_frame_equal(results.drop(columns='model_version'), expected, atol=1e-9)
+        pd.testing.assert_frame_equal(repeat.drop(columns='model_version'), expected.iloc[:40],
+                                      atol=1e-9)
+
+class TestScoringService(unittest.TestCase):
+    """Tests for the micro-batching HTTP scoring service"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(200)
+        loader.preprocess_data()
+        X_train, X_test, y_train, y_test = loader.train_test_split()
+        trainer = MalariaModelTrainer()
+        trainer.train_model(X_train, y_train, n_estimators=10)
+        cls.predictor = MalariaPredictor(model_path=None, engine='compiled')
+        cls.predictor.trainer = trainer
+
+    async def _exercise_service(self):
+        service = await ScoringService(self.predictor, max_batch_size=16,
+                                       max_wait_ms=20).start(port=0)
+        try:
+            load = await run_load_test(port=service.port, n_requests=200, concurrency=20)
+
+            connection = HttpConnection('127.0.0.1', service.port)
+            single = await connection.request('POST', '/predict', SAMPLE_RECORD)
+            many = await connection.request('POST', '/predict', [SAMPLE_RECORD] * 3)
+            bad = await connection.request('POST', '/predict',
+                                           dict(SAMPLE_RECORD, region='Region_Z'))
+            health = await connection.request('GET', '/health')
+            prometheus = await connection.request('GET', '/metrics/prometheus')
+            await connection.close()
+        finally:
+            await service.stop()
+        return load, single, many, bad, health, prometheus
+
+    def test_micro_batched_predictions(self):
+        """Concurrent requests are batched and each gets its own full result"""
+        load, single, many, bad, health, prometheus = asyncio.run(self._exercise_service())
+
+        self.assertEqual(load['errors'], 0)
+        self.assertEqual(load['requests'], 200)
+        self.assertGreater(load['service']['mean_batch_size'], 1)
+        self.assertIn('p99_ms', load['service']['latency'])
+
+        status, result = single
+        self.assertEqual(status, 200)
+        self.assertEqual(result['risk_level'], self.predictor.predict_risk(SAMPLE_RECORD)['risk_level'])
+        self.assertEqual(result['recommendations'],
+                         self.predictor.get_risk_recommendations(result['risk_level']))
+        self.assertEqual(many[0], 200)
+        self.assertEqual(len(many[1]), 3)
+        self.assertEqual(bad[0], 400)
+        self.assertEqual(health[0], 200)
+        self.assertEqual(prometheus[0], 200)
+        self.assertIsInstance(prometheus[1], str)
+
+class TestStreamingDataGenerator(unittest.TestCase):
+    """Tests for the chunked, reproducible synthetic data stream"""
+
+    def test_reproducible_across_workers(self):
+        """The same seed gives the same rows whether chunks are made serially or in parallel"""
+        loader = MalariaDataLoader()
+        serial = pd.concat(loader.generate_sample_chunks(2500, chunk_size=1000,
+                                                         calibration_size=20000))
+        parallel = pd.concat(loader.generate_sample_chunks(2500, chunk_size=1000,
+                                                           calibration_size=20000, n_jobs=2))
+
+        self.assertEqual(len(serial), 2500)
+        pd.testing.assert_frame_equal(serial, parallel)
+        self.assertEqual(list(serial.columns), list(loader.generate_sample_data(10).columns))
+
+    def test_calibrated_classes_are_balanced(self):
+        """Calibrated thresholds give roughly 33/34/33 class shares"""
+        loader = MalariaDataLoader()
+        data = pd.concat(loader.generate_sample_chunks(30000, chunk_size=7000,
+                                                       calibration_size=200000))
+        shares = data['outbreak_risk'].value_counts(normalize=True)
+        np.testing.assert_allclose(shares[['Low', 'Medium', 'High']], [0.33, 0.34, 0.33],
+                                   atol=0.02)
+
+    def test_stream_to_file(self):
+        """Chunks are streamed to disk and the summary counts every row"""
+        loader = MalariaDataLoader()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'samples.csv')
+            summary = loader.stream_sample_data(path, 2500, chunk_size=1000,
+                                                calibration_size=20000)
+            written = pd.read_csv(path)
+
+        self.assertEqual(summary['rows'], 2500)
+        self.assertEqual(summary['chunks'], 3)
+        self.assertEqual(sum(summary['risk_distribution'].values()), 2500)
+        self.assertEqual(written['outbreak_risk'].value_counts().to_dict(),
+                         summary['risk_distribution'])
+
+
+class TestCompactData(unittest.TestCase):
+    """Tests for the compact dtype mode of MalariaDataLoader"""
+
+    def test_compact_features_match_standard(self):
+        """Compact mode encodes the same values and columns in a fraction of the memory"""
+        standard = MalariaDataLoader()
+        standard.generate_sample_data(2000)
+        features, target = standard.preprocess_data()
+
+        compact = MalariaDataLoader(compact=True)
+        compact.generate_sample_data(2000)
+        compact_features, compact_target = compact.preprocess_data()
+
+        self.assertEqual(list(compact_features.columns), list(features.columns))
+        np.testing.assert_array_equal(compact_features.to_numpy(np.float32),
+                                      features.to_numpy(np.float32))
+        self.assertTrue((compact_target == target).all())
+        self.assertEqual(compact.data['region'].dtype, 'category')
+        self.assertEqual(compact_features['month'].dtype, np.int8)
+        self.assertGreater(compact.memory_report['reduction'], 2.5)
+        self.assertLess(memory_mb(compact_features), memory_mb(features) / 2)
+
+    def test_out_of_range_values_keep_wide_dtype(self):
+        """Integer columns only narrow when every value fits"""
+        frame = pd.DataFrame({'historical_cases': [1, 40000], 'month': [1, 12],
+                              'region': ['Region_A', 'Region_B']})
+        compact = compact_dtypes(frame)
+        self.assertEqual(compact['historical_cases'].dtype, np.int64)
+        self.assertEqual(compact['month'].dtype, np.int8)
+
+class TestIncrementalTraining(unittest.TestCase):
+    """Tests for chunk-by-chunk forest training"""
+
+    def test_trees_grow_per_chunk(self):
+        """Each chunk adds its trees and the result scores through MalariaPredictor"""
+        loader = MalariaDataLoader(compact=True)
+        chunks = loader.generate_sample_chunks(3000, chunk_size=1000, calibration_size=20000)
+        trainer = MalariaModelTrainer()
+        trainer.train_incremental(loader.preprocess_chunks(chunks), trees_per_chunk=4)
+
+        self.assertEqual(len(trainer.model.estimators_), 12)
+        self.assertEqual(trainer.feature_names,
+                         ['avg_temperature', 'rainfall', 'humidity', 'population_density',
+                          'healthcare_access', 'historical_cases', 'month',
+                          'region_Region_A', 'region_Region_B', 'region_Region_C'])
+
+        predictor = MalariaPredictor(model_path=None)
+        predictor.trainer = trainer
+        result = predictor.predict_risk(SAMPLE_RECORD)
+        self.assertIn(result['risk_level'], ['Low', 'Medium', 'High'])
+
+    def test_chunk_missing_a_class_is_rejected(self):
+        """A chunk without every risk class would corrupt the forest's classes_"""
+        loader = MalariaDataLoader()
+        frame = next(loader.generate_sample_chunks(600, chunk_size=600, calibration_size=20000))
+        chunks = [frame.iloc[:300], frame[frame['outbreak_risk'] != 'High']]
+        trainer = MalariaModelTrainer()
+        with self.assertRaises(ValueError):
+            trainer.train_incremental(loader.preprocess_chunks(chunks), trees_per_chunk=2)
+
+class TestSuccessiveHalvingSearch(unittest.TestCase):
+    """Tests for the parallel hyperparameter search"""
+
+    def test_search_ranks_and_caches(self):
+        """Candidates are halved each round and a rerun is served from the fold cache"""
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(600)
+        features, target = loader.preprocess_data()
+        grid = {'n_estimators': [5, 10], 'max_depth': [3, 8]}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            search = SuccessiveHalvingSearch(grid, factor=2, n_splits=2, min_samples=50,
+                                             n_workers=2, cache_dir=tmp)
+            leaderboard = search.fit(features, target)
+            self.assertEqual([r['n_candidates'] for r in search.rounds_], [4, 2, 1])
+            self.assertEqual(search.cache.misses, 14)
+
+            rerun = SuccessiveHalvingSearch(grid, factor=2, n_splits=2, min_samples=50,
+                                            n_workers=2, cache_dir=tmp)
+            pd.testing.assert_frame_equal(rerun.fit(features, target), leaderboard)
+            self.assertEqual((rerun.cache.hits, rerun.cache.misses), (14, 0))
+
+        self.assertEqual(list(leaderboard['rank']), [1, 2, 3, 4])
+        for column in ('accuracy', 'f1_score', 'fit_seconds', 'predict_ms', 'model_kb'):
+            self.assertIn(column, leaderboard.columns)
+        self.assertIn(search.best_params_, list(ParameterGrid(grid)))
+        self.assertEqual(search.train_best(features, target).model.n_estimators,
+                         search.best_params_['n_estimators'])
+
+class TestModelCompression(unittest.TestCase):
+    """Tests for forest pruning and distillation"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(1500)
+        loader.preprocess_data()
+        cls.X_train, cls.X_val, cls.y_train, cls.y_val = loader.train_test_split()
+
+    def test_subset_matches_sklearn(self):
+        """A tree subset scores like the same trees in sklearn, and depth cuts drop nodes"""
+        trainer = MalariaModelTrainer()
+        model = trainer.train_model(self.X_train, self.y_train, n_estimators=20)
+        forest = CompiledForest.from_sklearn(model)
+        features = self.X_val.to_numpy(dtype=np.float32)
+
+        trees = [4, 0, 9]
+        expected = np.mean([model.estimators_[t].predict_proba(features) for t in trees], axis=0)
+        np.testing.assert_allclose(forest.subset(trees).predict_proba(features), expected)
+
+        cut = forest.subset(max_depth=3)
+        self.assertLess(cut.n_nodes, forest.n_nodes)
+        self.assertEqual(cut.max_depth, 3)
+        np.testing.assert_allclose(cut.predict_proba(features),
+                                   forest.value[forest.apply(features, depth=3)].mean(axis=1))
+
+    def test_compressed_model_saves_and_loads(self):
+        """The selected variant stays within tolerance and loads through MalariaPredictor"""
+        trainer = MalariaModelTrainer()
+        trainer.train_model(self.X_train, self.y_train, n_estimators=30)
+        result = trainer.compress_model(self.X_val, self.y_val, f1_tolerance=0.02,
+                                        distill='tree', X_train=self.X_train)
+
+        report = result['report']
+        self.assertEqual(list(report.index), ['original', 'pruned', 'distilled_tree'])
+        selected = report.loc[result['selected']]
+        self.assertTrue(selected['within_tolerance'])
+        self.assertGreaterEqual(selected['f1_score'], result['baseline_f1'] - 0.02 - 1e-9)
+        self.assertEqual(selected['n_nodes'],
+                         report[report['within_tolerance'] & report['servable']]['n_nodes'].min())
+        if result['selected'] != 'original':
+            self.assertLess(selected['n_nodes'], report.loc['original', 'n_nodes'])
+            # The drift baseline is recaptured from the served model
+            reference = trainer.reference_profile.reference
+            self.assertEqual(reference.n, len(self.X_val))
+            features = self.X_val.to_numpy(dtype=np.float32)
+            np.testing.assert_array_equal(
+                reference.classes,
+                np.bincount(trainer.model.predict_proba(features).argmax(axis=1), minlength=3))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for path, format in ((os.path.join(tmp, 'small.pkl'), 'pickle'),
+                                 (os.path.join(tmp, 'small'), 'mmap')):
+                trainer.save_model(path, format=format)
+                for engine in ('sklearn', 'compiled'):
+                    predictor = MalariaPredictor(path, engine=engine)
+                    result = predictor.predict_risk(SAMPLE_RECORD)
+                    self.assertIn(result['risk_level'], ['Low', 'Medium', 'High'])
+            importances = trainer.plot_feature_importance(filepath=os.path.join(tmp, 'fi.png'))
+            self.assertAlmostEqual(importances.sum(), 1.0)
+
+    def test_unpruned_forest_is_kept(self):
+        """A compiled copy with every node measures like the sklearn forest and doesn't replace it"""
+        trainer = MalariaModelTrainer()
+        model = trainer.train_model(self.X_train, self.y_train, n_estimators=10)
+        original = _compression_stats(model, self.X_val, self.y_val, repeats=1)
+        compiled = _compression_stats(CompiledForest.from_sklearn(model), self.X_val, self.y_val,
+                                      repeats=1)
+        for column in ('n_nodes', 'size_kb', 'f1_score'):
+            self.assertEqual(original[column], compiled[column])
+
+        # No cut can stay within a negative tolerance, so only the original qualifies
+        result = trainer.compress_model(self.X_val, self.y_val, f1_tolerance=-1.0, verbose=False)
+        self.assertEqual(result['selected'], 'original')
+        self.assertIs(trainer.model, model)
+
+    def test_gbm_student_is_never_selected(self):
+        """A gradient-boosting student is reported but not picked, and verbose=False stays quiet"""
+        import io
+        from contextlib import redirect_stdout
+        trainer = MalariaModelTrainer()
+        trainer.train_model(self.X_train, self.y_train, n_estimators=10)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            result = trainer.compress_model(self.X_val, self.y_val, f1_tolerance=1.0,
+                                            distill='gbm', X_train=self.X_train, verbose=False)
+
+        self.assertEqual(output.getvalue(), '')
+        self.assertFalse(result['report'].loc['distilled_gbm', 'servable'])
+        self.assertNotEqual(result['selected'], 'distilled_gbm')
+        with tempfile.TemporaryDirectory() as tmp:
+            trainer.save_model(os.path.join(tmp, 'small'), format='mmap')
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """Tests for the end-to-end benchmark harness"""
+
+    def test_suite_round_trips_and_flags_regressions(self):
+        """Suite results serialize to JSON and a slower stage is flagged against the baseline"""
+        suite = run_suite(n_samples=600, batch_sizes=(50,), repeats=1, train_repeats=1)
+        baseline = json.loads(json.dumps(suite))
+        self.assertEqual(list(baseline['results']),
+                         ['generate_sample_data', 'preprocess_data', 'train_model', 'save_model',
+                          'load_model', 'predict_risk_1', 'predict_batch_50'])
+        for stats in baseline['results'].values():
+            for metric in ('p50_ms', 'rows_per_sec', 'peak_mb'):
+                self.assertGreaterEqual(stats[metric], 0)
+
+        self.assertFalse(any(row['regressed'] for row in compare_to_baseline(suite, baseline)))
+
+        slower = json.loads(json.dumps(suite))
+        slower['results']['train_model']['p50_ms'] *= 2
+        regressed = [(row['stage'], row['metric'])
+                     for row in compare_to_baseline(slower, baseline, threshold=0.5)
+                     if row['regressed']]
+        self.assertEqual(regressed, [('train_model', 'p50_ms')])
+
+class TestInstrumentation(unittest.TestCase):
+    """Tests for timing spans, Prometheus export and profiling hooks"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.predictor, _ = build_predictor(300)
+
+    def tearDown(self):
+        instrumentation.configure(enabled=False, profile_rate=0.0)
+        instrumentation.profile_dir = None
+        instrumentation.clear()
+
+    def test_disabled_records_nothing(self):
+        """With instrumentation off, predictions leave the registry empty"""
+        instrumentation.configure(enabled=False)
+        instrumentation.clear()
+        self.predictor.predict_risk(SAMPLE_RECORD)
+        self.assertEqual(instrumentation.snapshot(), {'counters': {}, 'histograms': {}})
+
+    def test_spans_export_as_prometheus(self):
+        """Each predict_risk stage gets a histogram with cumulative buckets"""
+        instrumentation.configure(enabled=True)
+        for _ in range(3):
+            self.predictor.predict_risk(SAMPLE_RECORD)
+
+        histograms = instrumentation.snapshot()['histograms']
+        for stage in ('predict_risk', 'predict_risk.align', 'predict_risk.forest',
+                      'predict_risk.format'):
+            self.assertEqual(histograms[f'malaria_span_seconds{{span="{stage}"}}']['count'], 3)
+
+        text = instrumentation.export_prometheus()
+        self.assertIn('malaria_predictions_total{method="predict_risk"} 3', text)
+        self.assertIn('# TYPE malaria_span_seconds histogram', text)
+        buckets = [int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+                   if line.startswith('malaria_span_seconds_bucket{span="predict_risk",')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 3)
+
+    def test_registry_bucket_boundaries(self):
+        """Values equal to a bucket bound fall in that bucket (le is inclusive)"""
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        for value in (0.1, 0.5, 2.0):
+            registry.observe('latency', value)
+        text = registry.export_prometheus()
+        self.assertIn('latency_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_bucket{le="+Inf"} 3', text)
+        self.assertIn('latency_count 3', text)
+
+    def test_profiling_per_request_and_sampled(self):
+        """profile=True profiles one call; profile_rate=1 profiles every call"""
+        instrumentation.configure(enabled=False)
+        self.predictor.predict_risk(SAMPLE_RECORD, profile=True)
+        self.assertEqual(len(instrumentation.profiles), 1)
+        self.assertIn('predict_risk', instrumentation.profiles[-1]['summary'])
+
+        self.predictor.predict_risk(SAMPLE_RECORD)
+        self.assertEqual(len(instrumentation.profiles), 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            instrumentation.configure(enabled=True, profile_rate=1.0, profile_dir=tmp)
+            self.predictor.predict_risk(SAMPLE_RECORD)
+            self.assertEqual(len(instrumentation.profiles), 2)
+            self.assertTrue(os.path.exists(instrumentation.profiles[-1]['path']))
+
+    def test_failed_profile_export_releases_lock(self):
+        """An error while recording a profile doesn't stop later profiling"""
+        with tempfile.TemporaryDirectory() as tmp:
+            # A file where the profile directory should be makes the dump fail
+            blocked = os.path.join(tmp, 'profiles')
+            open(blocked, 'w').close()
+            instrumentation.configure(enabled=True, profile_rate=1.0, profile_dir=blocked)
+            with self.assertRaises(OSError):
+                self.predictor.predict_risk(SAMPLE_RECORD)
+
+        self.assertFalse(instrumentation._profile_lock.locked())
+        instrumentation.profile_dir = None
+        self.predictor.predict_risk(SAMPLE_RECORD, profile=True)
+        self.assertIn('predict_risk', instrumentation.profiles[-1]['summary'])
+
+class TestEvaluationEngine(unittest.TestCase):
+    """Tests for the vectorized evaluation and bias audit engine"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(1500)
+        loader.preprocess_data()
+        X_train, cls.X_test, y_train, cls.y_test = loader.train_test_split()
+        cls.trainer = MalariaModelTrainer()
+        cls.trainer.train_model(X_train, y_train, n_estimators=30)
+
+    def test_matches_sklearn_metrics(self):
+        """Overall and per-region metrics equal sklearn's on the same predictions"""
+        from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
+        results = evaluate_model(self.trainer.model, self.X_test, self.y_test)
+        y_pred = results['predictions']
+        overall = results['overall']
+        self.assertAlmostEqual(overall['accuracy'], accuracy_score(self.y_test, y_pred))
+        self.assertAlmostEqual(overall['f1_score'],
+                               f1_score(self.y_test, y_pred, average='weighted'))
+        self.assertAlmostEqual(overall['f1_macro'], f1_score(self.y_test, y_pred, average='macro'))
+        np.testing.assert_array_equal(overall['confusion_matrix'],
+                                      confusion_matrix(self.y_test, y_pred))
+
+        regions = results['groups']['region']
+        self.assertEqual(regions['n'].sum(), len(self.y_test))
+        for region, row in regions.iterrows():
+            mask = (self.X_test[f'region_{region}'] == 1).to_numpy()
+            self.assertAlmostEqual(row['f1_score'], f1_score(self.y_test[mask], y_pred[mask],
+                                                             average='weighted'))
+            np.testing.assert_array_equal(results['confusion_matrices']['region'][region],
+                                          confusion_matrix(self.y_test[mask], y_pred[mask],
+                                                           labels=results['classes']))
+        self.assertEqual(sorted(results['groups']['month'].index),
+                         sorted(self.X_test['month'].unique()))
+
+    def test_trainer_evaluate_model_keeps_result_keys(self):
+        """The trainer's evaluate_model still returns its original keys"""
+        results = self.trainer.evaluate_model(self.X_test, self.y_test, group_by=('region',),
+                                              verbose=False)
+        for key in ('accuracy', 'f1_score', 'confusion_matrix', 'predictions'):
+            self.assertIn(key, results)
+        self.assertIn('region', results['groups'])
+
+    def test_bootstrap_intervals_are_reproducible_across_workers(self):
+        """Intervals bracket the point estimate and don't depend on the worker count"""
+        y_true = np.asarray(self.y_test)
+        y_pred = self.trainer.model.predict(self.X_test)
+        groups = {'half': (np.arange(len(y_true)) % 2, ['even', 'odd'])}
+        serial = evaluate_predictions(y_true, y_pred, groups=groups, n_bootstrap=40, n_jobs=1)
+        parallel = evaluate_predictions(y_true, y_pred, groups=groups, n_bootstrap=40, n_jobs=2)
+
+        pd.testing.assert_frame_equal(serial['groups']['half'], parallel['groups']['half'])
+        table = serial['groups']['half']
+        for metric in ('accuracy', 'f1_score'):
+            self.assertTrue((table[f'{metric}_low'] <= table[metric]).all())
+            self.assertTrue((table[metric] <= table[f'{metric}_high']).all())
+        low, high = serial['overall']['intervals']['accuracy']
+        self.assertLess(low, serial['overall']['accuracy'])
+        self.assertGreater(high, serial['overall']['accuracy'])
+
+class TestRiskSurface(unittest.TestCase):
+    """Tests for the precomputed risk-surface lookup table"""
+
+    AXES = {'region': None, 'month': [1, 6, 12], 'avg_temperature': list(range(25, 31)),
+            'rainfall': list(range(0, 301, 50))}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.live, _ = build_predictor(300)
+        trainer = cls.live.trainer
+        cls.surface = RiskSurface.build(trainer.model, trainer.feature_names, axes=cls.AXES)
+        cls.record = dict(SAMPLE_RECORD, humidity=75, population_density=200,
+                          healthcare_access=0.5, historical_cases=50, month=6,
+                          avg_temperature=28, rainfall=100)
+
+    def _predictor(self, surface):
+        predictor = MalariaPredictor(model_path=None, risk_surface=surface)
+        predictor.trainer = self.live.trainer
+        return predictor
+
+    def tearDown(self):
+        instrumentation.configure(enabled=False)
+        instrumentation.clear()
+
+    def test_lookup_matches_live_inference(self):
+        """On-grid points are answered from the table with the live model's result"""
+        self.assertEqual(self.surface.shape, (3, 3, 6, 7))
+        predictor = self._predictor(self.surface)
+        instrumentation.configure(enabled=True)
+        for region in self.surface.axes['region']:
+            for rainfall in (0, 150, 300):
+                record = dict(self.record, region=region, rainfall=rainfall)
+                result = predictor.predict_risk(record)
+                expected = self.live.predict_risk(record)
+                self.assertEqual(result['risk_level'], expected['risk_level'])
+                self.assertEqual(result['probabilities'], expected['probabilities'])
+                self.assertAlmostEqual(result['confidence'], expected['confidence'], places=6)
+        counters = instrumentation.snapshot()['counters']
+        self.assertEqual(counters['malaria_risk_surface_total{result="hit"}'], 9)
+
+    def test_off_grid_and_stale_surface_fall_back(self):
+        """Off-grid inputs and surfaces of another model are scored live"""
+        predictor = self._predictor(self.surface)
+        for record in (dict(self.record, rainfall=125), dict(self.record, humidity=80),
+                       dict(self.record, month=7)):
+            self.assertIsNone(self.surface.lookup(predictor.schema.transform(record)[0]))
+            self.assertEqual(predictor.predict_risk(record), self.live.predict_risk(record))
+
+        other, _ = build_predictor(200)
+        stale = self._predictor(self.surface)
+        stale.trainer = other.trainer
+        self.assertIsNone(stale.active_risk_surface())
+        self.assertEqual(stale.predict_risk(self.record), other.predict_risk(self.record))
+
+    def test_save_load_and_heatmap(self):
+        """A saved surface reloads intact and heatmaps slice the stored probabilities"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'surface.npz')
+            self.surface.save(path)
+            loaded = RiskSurface.load(path)
+        np.testing.assert_array_equal(loaded.probabilities, self.surface.probabilities)
+        self.assertEqual(loaded.axes, self.surface.axes)
+        self.assertIsNotNone(self._predictor(loaded).active_risk_surface())
+
+        grid = loaded.heatmap('rainfall', 'avg_temperature', level='High',
+                              region='Region_B', month=6)
+        self.assertEqual(grid.shape, (6, 7))
+        row = self.live.schema.transform(dict(self.record, region='Region_B', rainfall=250,
+                                              avg_temperature=27))[0]
+        high = list(loaded.classes).index('High')
+        self.assertEqual(grid.loc[27, 250], loaded.lookup(row)[high])
+        with self.assertRaises(ValueError):
+            loaded.heatmap('rainfall', 'avg_temperature', region='Region_B', month=7)
+
+class TestPanelFeatures(unittest.TestCase):
+    """Tests for the time-series panel feature engine"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loader = MalariaDataLoader()
+        cls.panel = cls.loader.generate_panel_data(n_years=6)
+
+    def test_matches_grouped_pandas(self):
+        """Lags and rolling means equal per-region groupby shift/rolling"""
+        features = PanelFeatureEngine().transform(self.panel.sample(frac=1, random_state=0))
+        ordered = self.panel.sort_values(['region', 'date'])
+        groups = ordered.groupby('region')
+        expected = {
+            'cases_lag_12': groups['cases'].shift(12),
+            'rainfall_lag_2': groups['rainfall'].shift(2),
+            'rainfall_mean_6': groups['rainfall'].transform(lambda s: s.rolling(6).mean()),
+            'cases_mean_3': groups['cases'].transform(lambda s: s.shift(1).rolling(3).mean())
+        }
+        for name, values in expected.items():
+            np.testing.assert_allclose(features.loc[ordered.index, name], values, rtol=1e-5)
+        self.assertTrue(features[['month_sin', 'month_cos']].abs().le(1).all().all())
+
+        with self.assertRaises(ValueError):
+            PanelFeatureEngine().transform(self.panel.drop(index=self.panel.index[5]))
+
+    def test_missing_value_stays_in_its_region(self):
+        """A missing reading only affects windows in its own region that contain it"""
+        panel = self.panel.copy()
+        gap = panel.index[(panel['region'] == 'Region_A')][20]
+        panel.loc[gap, 'rainfall'] = np.nan
+        features = PanelFeatureEngine().transform(panel)
+        clean = PanelFeatureEngine().transform(self.panel)
+
+        other = panel['region'] != 'Region_A'
+        pd.testing.assert_frame_equal(features[other], clean[other])
+        ordered = panel.sort_values(['region', 'date'])
+        expected = ordered.groupby('region')['rainfall'].transform(
+            lambda s: s.rolling(6, min_periods=1).mean().mask(np.arange(len(s)) < 5))
+        np.testing.assert_allclose(features.loc[ordered.index, 'rainfall_mean_6'], expected,
+                                   rtol=1e-5)
+        self.assertEqual(features['rainfall_mean_3'].isna().sum(),
+                         clean['rainfall_mean_3'].isna().sum())
+
+    def test_append_matches_full_recompute(self):
+        """Featurizing new months from the kept history equals recomputing the panel"""
+        full = PanelFeatureEngine().transform(self.panel)
+        engine = PanelFeatureEngine()
+        history = self.panel['date'] < '2015-01-01'
+        engine.fit_transform(self.panel[history])
+        self.assertEqual(len(engine.history), 3 * engine.max_lookback)
+
+        for date in sorted(self.panel.loc[~history, 'date'].unique()):
+            rows = self.panel[self.panel['date'] == date]
+            pd.testing.assert_frame_equal(engine.append(rows), full.loc[rows.index])
+        with self.assertRaises(ValueError):
+            engine.append(rows)
+
+    def test_trainer_and_predictor_consume_features(self):
+        """Panel features train a model and new months score through predict_panel"""
+        loader = MalariaDataLoader()
+        panel = loader.generate_panel_data(n_years=6)
+        history = panel[panel['date'] < '2015-06-01']
+        loader.data = history
+        features, target = loader.preprocess_panel()
+        self.assertFalse(features.isna().any().any())
+        X_train, X_test, y_train, y_test = loader.train_test_split(time_ordered=True)
+        self.assertLess(loader.dates[X_train.index].max(), loader.dates[X_test.index].min())
+
+        trainer = MalariaModelTrainer()
+        trainer.train_model(X_train, y_train, n_estimators=20)
+        predictor = MalariaPredictor(model_path=None)
+        predictor.trainer = trainer
+
+        rows = panel[panel['date'] == '2015-06-01']
+        results = predictor.predict_panel(rows, loader.feature_engine)
+        self.assertEqual(list(results.index), list(rows.index))
+        self.assertTrue(results['risk_level'].isin(['Low', 'Medium', 'High']).all())
+
+class TestModelRegistry(unittest.TestCase):
+    """Tests for versioned publish, rollback and predictor hot-swap"""
+
+    @classmethod
+    def setUpClass(cls):
+        loader = MalariaDataLoader()
+        loader.generate_sample_data(300)
+        loader.preprocess_data()
+        X_train, cls.X_test, y_train, _ = loader.train_test_split()
+        cls.trainers = []
+        for seed in (1, 2):
+            trainer = MalariaModelTrainer()
+            trainer.train_model(X_train, y_train, n_estimators=10, random_state=seed)
+            cls.trainers.append(trainer)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(os.path.join(self.tmp.name, 'registry'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_activate_and_rollback(self):
+        """Versions are immutable directories; CURRENT moves on publish and rollback"""
+        self.assertIsNone(self.registry.current())
+        first = self.registry.publish(self.trainers[0], metrics={'f1_score': 0.9})
+        second = self.registry.publish(self.trainers[1], format='mmap')
+        self.assertEqual((first, second), ('v0001', 'v0002'))
+        self.assertEqual(self.registry.current(), 'v0002')
+        self.assertEqual(self.registry.metadata(second)['parent'], 'v0001')
+        self.assertEqual(self.registry.metadata(first)['metrics'], {'f1_score': 0.9})
+        self.assertEqual(sorted(os.listdir(self.registry.root)),
+                         ['CURRENT', 'history.jsonl', 'versions'])
+
+        self.assertEqual(self.registry.rollback(), 'v0001')
+        with self.assertRaises(ValueError):
+            self.registry.rollback()
+        self.assertEqual([entry['action'] for entry in self.registry.history()],
+                         ['publish', 'activate', 'publish', 'activate', 'rollback'])
+        bundle = self.registry.load()
+        self.assertEqual(bundle.version, 'v0001')
+        self.assertEqual(bundle.feature_names, self.trainers[0].feature_names)
+
+    def test_predictor_hot_swaps_and_tags_results(self):
+        """refresh() swaps to the active version; results and cache keys follow it"""
+        self.registry.publish(self.trainers[0])
+        cache = PredictionCache()
+        predictor = MalariaPredictor(registry=self.registry, refresh_interval=None,
+                                     result_cache=cache)
+        row = self.X_test.iloc[0].to_dict()
+        self.assertEqual(predictor.predict_risk(row)['model_version'], 'v0001')
+
+        self.registry.publish(self.trainers[1])
+        self.assertEqual(predictor.predict_risk(row)['model_version'], 'v0001')
+        self.assertTrue(predictor.refresh())
+        self.assertFalse(predictor.refresh())
+        result = predictor.predict_risk(row)
+        self.assertEqual(result['model_version'], 'v0002')
+        self.assertEqual(cache.misses, 2)
+        batch = predictor.predict_batch(self.X_test)
+        self.assertEqual(set(batch['model_version']), {'v0002'})
+
+        self.registry.rollback()
+        predictor.refresh()
+        self.assertEqual(predictor.predict_risk(row)['model_version'], 'v0001')
+        # Rolled-back version reuses its cached results
+        self.assertEqual(cache.hits, 2)
+
+    def test_swaps_do_not_grow_model_cache(self):
+        """Swapped-out versions are not pinned in the process-wide model cache"""
+        self.registry.publish(self.trainers[0])
+        predictor = MalariaPredictor(registry=self.registry, refresh_interval=None)
+        cached = model_cache.stats()['cached_models']
+        for i in range(4):
+            self.registry.publish(self.trainers[i % 2])
+            self.assertTrue(predictor.refresh())
+        self.assertEqual(predictor.model_version, 'v0005')
+        self.assertEqual(model_cache.stats()['cached_models'], cached)
+
+    def test_swap_keeps_shared_monitors_per_model(self):
+        """A predictor that swaps moves to the new model's monitor; one still on the old keeps its own"""
+        monitors = [shared_monitor(trainer.reference_profile, interval=None)
+                    for trainer in self.trainers]
+        self.assertIsNot(monitors[0], monitors[1])
+        self.registry.publish(self.trainers[0])
+        swapping, pinned = (MalariaPredictor(registry=self.registry, refresh_interval=None,
+                                             monitor=True) for _ in range(2))
+        row = self.X_test.iloc[0].to_dict()
+        for predictor in (swapping, pinned):
+            predictor.predict_risk(row)
+            self.assertIs(predictor.monitor, monitors[0])
+
+        self.registry.publish(self.trainers[1])
+        self.assertTrue(swapping.refresh())
+        self.assertIs(swapping.monitor, monitors[1])
+        self.assertIs(pinned.monitor, monitors[0])
+        self.assertIs(monitors[0].profile, self.trainers[0].reference_profile)
+
+    def test_background_swap_under_concurrent_load(self):
+        """Requests keep being served while a new version is swapped in behind them"""
+        self.registry.publish(self.trainers[0])
+        predictor = MalariaPredictor(registry=self.registry, refresh_interval=0.0)
+        batch = self.X_test.iloc[:20]
+        errors, versions, stop = [], set(), threading.Event()
+
+        def serve():
+            while not stop.is_set():
+                try:
+                    results = predictor.predict_batch(batch)
+                    self.assertEqual(results['model_version'].nunique(), 1)
+                    versions.add(results['model_version'].iloc[0])
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=serve) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.registry.publish(self.trainers[1])
+        deadline = time.monotonic() + 10
+        while 'v0002' not in versions and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(predictor.model_version, 'v0002')
+        self.assertLessEqual(versions, {'v0001', 'v0002'})
+        self.assertIn('v0002', versions)
+
+class TestPredictionExplanations(unittest.TestCase):
+    """Tests for per-prediction decision-path contributions"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.predictor, cls.X = build_predictor(300)
+
+    def _naive_contributions(self, features):
+        """Walk each tree's decision path row by row"""
+        model = self.predictor.trainer.model
+        result = np.zeros((len(features), model.n_features_in_, len(model.classes_)))
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :] / tree.value[:, 0, :].sum(axis=1, keepdims=True)
+            path = estimator.decision_path(features)
+            for i in range(len(features)):
+                nodes = path.indices[path.indptr[i]:path.indptr[i + 1]]
+                for parent, child in zip(nodes[:-1], nodes[1:]):
+                    result[i, tree.feature[parent]] += value[child] - value[parent]
+        return result / len(model.estimators_)
+
+    def test_contributions_match_decision_paths(self):
+        """Vectorized contributions equal the per-row path walk and add up to predict_proba"""
+        features = self.predictor.schema.transform(self.X)
+        forest = CompiledForest.from_sklearn(self.predictor.trainer.model)
+        bias, contributions = forest.contributions(features)
+
+        np.testing.assert_allclose(contributions[:20], self._naive_contributions(features[:20]),
+                                   atol=1e-9)
+        np.testing.assert_allclose(bias + contributions.sum(axis=1),
+                                   _predict_proba_array(self.predictor.trainer.model, features), atol=1e-9)
+
+    def test_explain_batch(self):
+        """Bias plus the feature columns give the probability of the explained level"""
+        batch = self.predictor.predict_batch(self.X)
+        explained = self.predictor.explain_batch(self.X, chunk_size=64)
+        features = explained.drop(columns=['risk_level', 'level', 'bias'])
+        self.assertEqual(list(features.columns), list(self.predictor.trainer.feature_names))
+        pd.testing.assert_series_equal(explained['risk_level'], batch['risk_level'],
+                                       check_dtype=False)
+        np.testing.assert_allclose(explained['bias'] + features.sum(axis=1),
+                                   batch['confidence'], atol=1e-9)
+
+        high = self.predictor.explain_batch(self.X, level='High', group_regions=True)
+        self.assertIn('region', high.columns)
+        self.assertFalse(any(column.startswith('region_') for column in high.columns))
+        np.testing.assert_allclose(high.drop(columns=['risk_level', 'level']).sum(axis=1),
+                                   batch['prob_High'], atol=1e-9)
+        with self.assertRaises(ValueError):
+            self.predictor.explain_batch(self.X, level='Severe')
+
+    def test_explain_risk_is_cached(self):
+        """Repeated dashboard inputs are explained from the cache"""
+        predictor = MalariaPredictor(model_path=None, explanation_cache=PredictionCache())
+        predictor.trainer = self.predictor.trainer
+        first = predictor.explain_risk(SAMPLE_RECORD)
+        second = predictor.explain_risk(dict(SAMPLE_RECORD))
+
+        self.assertEqual(first, second)
+        self.assertEqual(predictor.explanation_cache.stats()['hits'], 1)
+        self.assertEqual(first['risk_level'], predictor.predict_risk(SAMPLE_RECORD)['risk_level'])
+        self.assertAlmostEqual(first['probability'],
+                               first['bias'] + sum(first['contributions'].values()))
+        magnitudes = [abs(value) for value in first['contributions'].values()]
+        self.assertEqual(magnitudes, sorted(magnitudes, reverse=True))
+        self.assertEqual(predictor.explain_risk(SAMPLE_RECORD, level='Low')['level'], 'Low')
+
+    def test_plot_feature_importance_path(self):
+        """The importance plot is written where the caller asks"""
+        with tempfile.TemporaryDirectory() as tmp:
+            filepath = os.path.join(tmp, 'importance.png')
+            self.predictor.trainer.plot_feature_importance(top_n=100, filepath=filepath)
+            self.assertTrue(os.path.exists(filepath))
+
+class TestScenarioEngine(unittest.TestCase):
+    """Tests for the what-if scenario sweep engine"""
+
+    PERTURBATIONS = {
+        'rainfall': Range(-0.2, 0.2, 3, mode='relative'),
+        'avg_temperature': Grid([-2, 2]),
+        'humidity': Normal(0, 5),
+        'healthcare_access': Uniform(-0.2, 0.2)
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.predictor, X = build_predictor(300)
+        cls.baseline = X.iloc[:40]
+
+    def _perturbed(self, scenario):
+        """Baseline with one scenario applied by hand"""
+        frame = self.baseline.copy()
+        frame['rainfall'] = (frame['rainfall'] * (1 + scenario['rainfall'])).clip(0)
+        frame['avg_temperature'] += scenario['avg_temperature']
+        frame['humidity'] = (frame['humidity'] + scenario['humidity']).clip(0, 100)
+        frame['healthcare_access'] = (frame['healthcare_access']
+                                      + scenario['healthcare_access']).clip(0, 1)
+        return frame
+
+    def test_expand_scenarios(self):
+        """Grid specs are crossed and every grid point gets n_draws joint draws"""
+        scenarios = expand_scenarios(self.PERTURBATIONS, n_draws=5, seed=1)
+        self.assertEqual(len(scenarios), 3 * 2 * 5)
+        self.assertEqual(scenarios.groupby(['rainfall', 'avg_temperature']).size().tolist(), [5] * 6)
+        pd.testing.assert_frame_equal(scenarios, expand_scenarios(self.PERTURBATIONS, n_draws=5, seed=1))
+        self.assertEqual(len(expand_scenarios({'rainfall': Range(0, 1, 4)}, n_draws=5)), 4)
+
+    def test_sweep_matches_batch_predictions(self):
+        """Chunked statistics equal scoring each scenario's batch separately"""
+        result = ScenarioEngine(self.predictor, chunk_size=70).run(
+            self.baseline, self.PERTURBATIONS, n_draws=4)
+        scenarios = result['scenarios']
+        baseline = self.predictor.predict_batch(self.baseline)
+        self.assertEqual(result['levels'], ['Low', 'Medium', 'High'])
+        pd.testing.assert_series_equal(result['baseline']['risk_level'], baseline['risk_level'],
+                                       check_dtype=False)
+
+        rank = {'Low': 0, 'Medium': 1, 'High': 2}
+        base_rank = baseline['risk_level'].astype(str).map(rank)
+        probabilities = []
+        for i in (0, 7, len(scenarios) - 1):
+            batch = self.predictor.predict_batch(self._perturbed(scenarios.iloc[i]))
+            self.assertAlmostEqual(scenarios['prob_High'].iloc[i], batch['prob_High'].mean())
+            self.assertAlmostEqual(scenarios['shift_High'].iloc[i],
+                                   batch['prob_High'].mean() - baseline['prob_High'].mean())
+            self.assertAlmostEqual(scenarios['escalated'].iloc[i],
+                                   (batch['risk_level'].astype(str).map(rank) > base_rank).mean())
+        for _, scenario in scenarios.iterrows():
+            probabilities.append(self.predictor.predict_batch(self._perturbed(scenario))['prob_High'])
+        np.testing.assert_allclose(result['rows']['prob_High'],
+                                   pd.concat(probabilities, axis=1).mean(axis=1), atol=1e-9)
+
+        summary = result['summary']
+        self.assertEqual(summary.index.names, ['rainfall', 'avg_temperature'])
+        self.assertEqual(len(summary), 6)
+        self.assertTrue((summary['shift_High_p5'] <= summary['shift_High_p95']).all())
+
+    def test_process_pool_matches_in_process(self):
+        """Workers return the same statistics as the in-process sweep"""
+        record = dict(SAMPLE_RECORD)
+        serial = ScenarioEngine(self.predictor, chunk_size=16).run(record, self.PERTURBATIONS, n_draws=8)
+        with self.assertRaises(ValueError):
+            ScenarioEngine(self.predictor).run(record, {'region_Region_A': Grid([1])})
+        parallel = ScenarioEngine(self.predictor, n_jobs=2, chunk_size=16).run(
+            record, self.PERTURBATIONS, n_draws=8)
+        self.assertEqual(self.predictor.trainer.model.n_jobs, -1)
+        pd.testing.assert_frame_equal(serial['scenarios'], parallel['scenarios'])
+        pd.testing.assert_frame_equal(serial['summary'], parallel['summary'])
+
+    def test_concurrent_in_process_sweeps(self):
+        """Sessions sweeping different baselines at once each get their own totals"""
+        baselines = [self.baseline.iloc[:20], self.baseline.iloc[20:]]
+        engine = ScenarioEngine(self.predictor, chunk_size=8)
+        expected = [engine.run(baseline, self.PERTURBATIONS, n_draws=3)['scenarios']
+                    for baseline in baselines]
+        mismatches = []
+
+        def sweep(i):
+            for _ in range(5):
+                result = engine.run(baselines[i], self.PERTURBATIONS, n_draws=3)['scenarios']
+                if not result.equals(expected[i]):
+                    mismatches.append(i)
+
+        threads = [threading.Thread(target=sweep, args=(i % 2,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(mismatches, [])
+
+class TestDriftMonitoring(unittest.TestCase):
+    """Tests for streaming drift sketches and the predictor's monitor hook"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.predictor, cls.X = build_predictor(600)
+        cls.profile = cls.predictor.trainer.reference_profile
+
+    def _monitored(self, **options):
+        predictor = MalariaPredictor(model_path=None)
+        predictor.trainer = self.predictor.trainer
+        predictor.monitor = DriftMonitor(self.profile, interval=None, min_samples=50, **options)
+        return predictor
+
+    def test_sketches_are_mergeable_and_fixed_size(self):
+        """Counts from separate chunks merge into the counts of the whole batch"""
+        features = self.predictor.schema.transform(self.X)
+        probability = _predict_proba_array(self.predictor.trainer.model, features)
+        whole = self.profile.new_sketch().update(features, probability)
+        merged = self.profile.new_sketch().update(features[:50], probability[:50])
+        merged.merge(self.profile.new_sketch().update(features[50:], probability[50:]))
+
+        for (name, expected), (_, actual) in zip(whole.signals(), merged.signals()):
+            np.testing.assert_array_equal(expected, actual, err_msg=name)
+        self.assertEqual(whole.n, len(features))
+        self.assertEqual(whole.features['rainfall'].shape, (len(self.profile.edges['rainfall']) + 1,))
+        self.assertEqual(whole.regions.sum(), len(features))
+
+        restored = DriftProfile.from_dict(json.loads(json.dumps(self.profile.to_dict())))
+        np.testing.assert_array_equal(restored.reference.classes, self.profile.reference.classes)
+        self.assertEqual(psi([10, 20, 30], [1, 2, 3]), 0.0)
+
+    def test_detects_shifted_inputs(self):
+        """Held-out traffic is stable; shifted climate inputs are flagged"""
+        predictor = self._monitored()
+        self.assertIsNone(predictor.monitor.check())
+        predictor.predict_batch(self.X)
+        stable = predictor.monitor.check()
+        self.assertFalse(stable['drifted'].any(), stable)
+        self.assertEqual(stable.loc['rainfall', 'n'], len(self.X))
+
+        shifted = self.X.copy()
+        shifted['rainfall'] *= 2
+        shifted['avg_temperature'] += 4
+        predictor.predict_batch(shifted)
+        drifted = predictor.monitor.check()
+        self.assertTrue(drifted.loc[['rainfall', 'avg_temperature'], 'drifted'].all())
+        self.assertFalse(drifted.loc['region', 'drifted'])
+        self.assertIs(predictor.monitor.report(), drifted)
+        self.assertEqual(len(predictor.monitor.history), 2)
+
+    def test_predictor_hook_and_saved_profile(self):
+        """Every entry point feeds the monitor, and the profile travels with the model file"""
+        predictor = self._monitored(max_pending=3)
+        predictor.predict_risk(SAMPLE_RECORD)
+        predictor.predict_encoded(predictor.schema.transform([SAMPLE_RECORD] * 2))
+        predictor.predict_batch(self.X.iloc[:5])
+        predictor.predict_batch(self.X.iloc[:5])
+        self.assertEqual(predictor.monitor.dropped, 1)
+        self.assertEqual(predictor.monitor.check(force=True).loc['month', 'n'], 12)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for format, name in (('pickle', 'model.pkl'), ('mmap', 'model')):
+                path = os.path.join(tmp, name)
+                self.predictor.trainer.save_model(path, format=format)
+                loaded = MalariaPredictor(path, monitor=True)
+                loaded.predict_risk(SAMPLE_RECORD)
+                self.assertIsInstance(loaded.monitor, DriftMonitor)
+                self.assertEqual(loaded.monitor.profile.to_dict(), self.profile.to_dict())
+
+    def test_predictors_share_one_monitor(self):
+        """Many predictors (e.g. Streamlit reruns) feed one monitor and one thread"""
+        reloaded = DriftProfile.from_dict(self.profile.to_dict())
+        monitor = shared_monitor(self.profile, interval=3600)
+        self.assertIs(shared_monitor(reloaded), monitor)
+        monitor.check(force=True)
+        n_threads = sum(thread.name == 'drift-monitor' for thread in threading.enumerate())
+
+        predictors = []
+        for _ in range(5):
+            predictor = MalariaPredictor(model_path=None, monitor=True)
+            predictor.trainer = self.predictor.trainer
+            predictors.append(predictor)
+        threads = [threading.Thread(target=predictor.predict_risk, args=(SAMPLE_RECORD,))
+                   for predictor in predictors for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(all(predictor.monitor is monitor for predictor in predictors))
+        self.assertEqual(sum(thread.name == 'drift-monitor' for thread in threading.enumerate()),
+                         n_threads)
+        self.assertEqual(monitor.check(force=True).loc['month', 'n'], 10)
+
+def run_bias_audit(trainer=None, X_test=None, y_test=None, n_bootstrap=200, n_jobs=-1):
+    """
+    Audit model for potential biases
     
-    trainer = MalariaModelTrainer()
-    trainer.train_model(X_train, y_train)
+    Pass a fitted trainer and its test set to audit an existing model;
+    otherwise a model is trained on fresh sample data. The test set is
+    scored once and per-region/month metrics with bootstrap confidence
+    intervals come from the evaluation engine.
+    """
+    print("🔍 Running Bias Audit...")
     
-    # Predict on test set
-    y_pred = trainer.model.predict(X_test)
+    if trainer is None or X_test is None:
+        loader = MalariaDataLoader()
+        data = loader.generate_sample_data(1000)
+        
+        # Check distribution across regions
+        region_risk = pd.crosstab(data['region'], data['outbreak_risk'], normalize='index')
+        print("\nRisk Distribution by Region:")
+        print(region_risk)
+        
+        loader.preprocess_data()
+        X_train, X_test, y_train, y_test = loader.train_test_split()
+        if trainer is None:
+            trainer = MalariaModelTrainer()
+            trainer.train_model(X_train, y_train)
     
-    # Convert to DataFrame for analysis
-    results_df = X_test.copy()
-    results_df['actual'] = y_test.values
-    results_df['predicted'] = y_pred
+    results = evaluate_model(trainer.model, X_test, y_test, group_by=('region', 'month'),
+                             n_bootstrap=n_bootstrap, n_jobs=n_jobs)
     
-    print("\nAccuracy by Region Type:")
-    for region_col in [col for col in X_test.columns if col.startswith('region_')]:
-        region_mask = X_test[region_col] == 1
-        if region_mask.any():
-            region_accuracy = (y_pred[region_mask] == y_test[region_mask]).mean()
-            print(f"{region_col}: {region_accuracy:.3f}")
+    for name, table in results['groups'].items():
+        print(f"\nAccuracy and F1 by {name.title()} ({n_bootstrap} bootstrap replicates):")
+        print(table.to_string(float_format=lambda v: f"{v:.3f}"))
+    return results
 
 if __name__ == '__main__':
     # Run unit tests
@@ -0,0 +1,312 @@
+"""
+Parallel successive-halving search over Random Forest hyperparameters.
+
+Every candidate in a parameter grid is cross-validated on a small sample
+of each training fold. Only the best 1/factor of the candidates move on to
+the next round, which uses factor times more rows, until the survivors are
+trained on the full folds. Candidate/fold fits run in a process pool, and
+each result is cached on disk under a key built from the data fingerprint,
+the parameters, the fold and the sample size, so a rerun skips finished
+work.
+
+Usage:
+    python tuning.py --samples 5000 --workers 4
+"""
+import os
+import json
+import math
+import time
+import pickle
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.metrics import accuracy_score, f1_score
+from model_trainer import MalariaModelTrainer
+from data_loader import MalariaDataLoader
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, 14, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4]
+}
+
+SCORING = ('f1_score', 'accuracy')
+
+# Per-worker state, set up once by _init_worker
+_worker_data = None
+
+
+def data_fingerprint(X, y):
+    """Hash of the feature columns, feature values and labels"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(list(map(str, X.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False)
+                  .to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FoldCache:
+    """One JSON file per finished candidate/fold evaluation"""
+
+    def __init__(self, directory='.tuning_cache'):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(fingerprint, params, fold, n_splits, n_samples, random_state):
+        payload = json.dumps([fingerprint, params, fold, n_splits, n_samples, random_state],
+                             sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached result, or None"""
+        try:
+            with open(self._path(key)) as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result through a temporary file, so readers never see half a file"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+
+def _init_worker(X, y, folds):
+    """Receive the data and fold indices once per worker process"""
+    global _worker_data
+    _worker_data = (X, np.asarray(y), folds)
+
+
+def _evaluate(params, fold, n_samples, random_state, latency_repeats=20):
+    """Fit one candidate on the first n_samples rows of a training fold and score it"""
+    X, y, folds = _worker_data
+    train_index, test_index = folds[fold]
+    train_index = train_index[:n_samples]
+    X_train, y_train = X.iloc[train_index], y[train_index]
+    X_test, y_test = X.iloc[test_index], y[test_index]
+
+    trainer = MalariaModelTrainer()
+    start = time.perf_counter()
+    # One process per core already; don't let each fit spawn its own joblib threads
+    trainer.train_model(X_train, y_train, random_state=random_state, n_jobs=1,
+                        capture_profile=False, **params)
+    fit_seconds = time.perf_counter() - start
+
+    y_pred = trainer.model.predict(X_test)
+
+    row = X_test.iloc[:1]
+    timings = []
+    for _ in range(latency_repeats):
+        start = time.perf_counter()
+        trainer.model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'f1_score': float(f1_score(y_test, y_pred, average='weighted')),
+        'fit_seconds': fit_seconds,
+        'predict_ms': float(np.median(timings)) * 1000,
+        'model_kb': len(pickle.dumps(trainer.model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024
+    }
+
+
+def _evaluate_args(args):
+    """ProcessPoolExecutor.map helper"""
+    return _evaluate(*args)
+
+
+class SuccessiveHalvingSearch:
+    """Successive-halving hyperparameter search for MalariaModelTrainer"""
+
+    def __init__(self, param_grid=None, factor=3, n_splits=3, min_samples=100,
+                 scoring='f1_score', n_workers=None, cache_dir='.tuning_cache',
+                 random_state=42):
+        """
+        Args:
+            param_grid: dict of RandomForestClassifier parameter lists
+                (overrides of model_trainer.FOREST_PARAMS, plus n_estimators)
+            factor: keep the best 1/factor candidates and grow the sample
+                factor times each round
+            n_splits: stratified cross-validation folds
+            min_samples: fewest training rows per fold in the first round;
+                fewer rounds are run if the grid would need smaller samples
+            scoring: 'f1_score' (weighted) or 'accuracy', used for ranking
+            n_workers: worker processes, defaults to the CPU count
+            cache_dir: directory of cached fold results, or None to disable
+            random_state: seed for the folds and the forests
+        """
+        if scoring not in SCORING:
+            raise ValueError(f"scoring must be one of {SCORING}")
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+
+        self.param_grid = param_grid or DEFAULT_PARAM_GRID
+        self.factor = factor
+        self.n_splits = n_splits
+        self.min_samples = min_samples
+        self.scoring = scoring
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.cache = FoldCache(cache_dir) if cache_dir else None
+        self.random_state = random_state
+
+        self.leaderboard_ = None
+        self.best_params_ = None
+        self.rounds_ = []
+
+    def _schedule(self, n_candidates, max_samples):
+        """Training rows per fold for each round, ending at max_samples"""
+        n_rounds = math.ceil(math.log(n_candidates, self.factor)) + 1 if n_candidates > 1 else 1
+        if max_samples > self.min_samples:
+            n_rounds = min(n_rounds,
+                           int(math.log(max_samples / self.min_samples, self.factor)) + 1)
+        else:
+            n_rounds = 1
+        return [max(max_samples // self.factor ** (n_rounds - 1 - r), 1) for r in range(n_rounds)]
+
+    def fit(self, X, y):
+        """
+        Run the search
+
+        Args:
+            X: feature DataFrame, as from MalariaDataLoader.preprocess_data
+            y: risk labels
+
+        Returns:
+            leaderboard DataFrame, best candidate first
+        """
+        candidates = list(ParameterGrid(self.param_grid))
+        folds = list(StratifiedKFold(self.n_splits, shuffle=True,
+                                     random_state=self.random_state).split(X, y))
+        # Shuffle each training fold once so any prefix is a random sample
+        rng = np.random.default_rng(self.random_state)
+        folds = [(rng.permutation(train), test) for train, test in folds]
+        max_samples = min(len(train) for train, _ in folds)
+        fingerprint = data_fingerprint(X, y)
+
+        schedule = self._schedule(len(candidates), max_samples)
+        logger.info(f"Searching {len(candidates)} candidates over {len(schedule)} rounds "
+                    f"({schedule} rows per fold)")
+
+        results = {}
+        survivors = list(range(len(candidates)))
+        self.rounds_ = []
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_worker,
+                                 initargs=(X, y, folds)) as executor:
+            for round_index, n_samples in enumerate(schedule):
+                scores = self._run_round(executor, candidates, survivors, n_samples,
+                                         fingerprint)
+                for candidate, summary in scores.items():
+                    results[candidate] = dict(summary, round=round_index, n_samples=n_samples)
+                self.rounds_.append({'n_samples': n_samples, 'n_candidates': len(survivors)})
+
+                if round_index < len(schedule) - 1:
+                    ranked = sorted(survivors, key=lambda c: scores[c][self.scoring],
+                                    reverse=True)
+                    survivors = ranked[:max(math.ceil(len(survivors) / self.factor), 1)]
+                    logger.info(f"Round {round_index}: {len(ranked)} candidates on {n_samples} "
+                                f"rows, {len(survivors)} advance")
+
+        self.leaderboard_ = self._leaderboard(candidates, results)
+        self.best_params_ = candidates[int(self.leaderboard_.iloc[0]['candidate'])]
+        if self.cache is not None:
+            logger.info(f"Fold cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        return self.leaderboard_
+
+    def _run_round(self, executor, candidates, survivors, n_samples, fingerprint):
+        """Cross-validate the surviving candidates, reusing cached folds"""
+        tasks, keys, fold_results = [], [], {}
+        for candidate in survivors:
+            for fold in range(self.n_splits):
+                key = None
+                if self.cache is not None:
+                    key = FoldCache.make_key(fingerprint, candidates[candidate], fold,
+                                             self.n_splits, n_samples, self.random_state)
+                    cached = self.cache.get(key)
+                    if cached is not None:
+                        fold_results.setdefault(candidate, []).append(cached)
+                        continue
+                tasks.append((candidate, fold))
+                keys.append(key)
+
+        args = [(candidates[candidate], fold, n_samples, self.random_state)
+                for candidate, fold in tasks]
+        for (candidate, _), key, result in zip(tasks, keys,
+                                               executor.map(_evaluate_args, args)):
+            if key is not None:
+                self.cache.put(key, result)
+            fold_results.setdefault(candidate, []).append(result)
+
+        return {
+            candidate: {metric: float(np.mean([r[metric] for r in fold_results[candidate]]))
+                        for metric in fold_results[candidate][0]}
+            for candidate in survivors
+        }
+
+    def _leaderboard(self, candidates, results):
+        """Rank candidates by the furthest round reached, then by score"""
+        rows = [dict(candidate=candidate, **candidates[candidate], **summary)
+                for candidate, summary in results.items()]
+        leaderboard = pd.DataFrame(rows).sort_values(['round', self.scoring],
+                                                     ascending=False, ignore_index=True)
+        leaderboard.insert(0, 'rank', range(1, len(leaderboard) + 1))
+        return leaderboard
+
+    def train_best(self, X, y, trainer=None):
+        """Fit a MalariaModelTrainer on all of X with the best parameters"""
+        if self.best_params_ is None:
+            raise ValueError("Search not run. Call fit() first.")
+        trainer = trainer or MalariaModelTrainer()
+        trainer.train_model(X, y, random_state=self.random_state, **self.best_params_)
+        return trainer
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Successive-halving forest hyperparameter search")
+    parser.add_argument('--samples', type=int, default=5000, help="synthetic samples")
+    parser.add_argument('--factor', type=int, default=3)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default='.tuning_cache')
+    parser.add_argument('--scoring', choices=SCORING, default='f1_score')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    loader = MalariaDataLoader()
+    loader.generate_sample_data(args.samples)
+    features, target = loader.preprocess_data()
+
+    search = SuccessiveHalvingSearch(factor=args.factor, n_splits=args.folds,
+                                     scoring=args.scoring, n_workers=args.workers,
+                                     cache_dir=args.cache_dir)
+    leaderboard = search.fit(features, target)
+
+    with pd.option_context('display.width', 160, 'display.max_columns', None):
+        print("\n🏆 Leaderboard:")
+        print(leaderboard.head(15).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"\nBest parameters: {search.best_params_}")
+    return search
+
+
+if __name__ == "__main__":
+    main()